@@ -1,8 +1,10 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, g
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, jsonify, Response, stream_with_context, get_template_attribute, has_request_context
 # Try to load flask_mysqldb dynamically (avoids static analyzer unresolved-import errors);
 # if not available, fall back to a PyMySQL-based compatibility wrapper.
 import importlib
-import importlib.util     
+import importlib.util
+import threading
+import time
 
 
 _flask_mysqldb_spec = importlib.util.find_spec('flask_mysqldb')
@@ -15,175 +17,3258 @@ else:
     import pymysql
     import pymysql.cursors
 
+    class PoolTimeout(Exception):
+        """Raised when no pooled connection becomes free within the checkout timeout."""
+
+    class PooledConnection:
+        """Thin proxy around a PyMySQL connection; close() hands it back to the pool."""
+        def __init__(self, pool, raw):
+            self._pool = pool
+            self._raw = raw
+
+        replica = None  # name of the replica this came from; None for the primary
+
+        def close(self):
+            if self._raw is not None:
+                raw, self._raw = self._raw, None
+                self._pool.release(raw)
+
+        def __getattr__(self, name):
+            if self._raw is None:
+                raise pymysql.err.InterfaceError("Connection already returned to the pool.")
+            return getattr(self._raw, name)
+
+    class ConnectionPool:
+        """Bounded, thread-safe pool of PyMySQL connections (one per worker process)."""
+        def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, recycle=300, ping=True):
+            self._connect = connect
+            self.min_size = max(0, int(min_size))
+            self.max_size = max(1, int(max_size))
+            self.timeout = float(timeout)
+            self.recycle = float(recycle)
+            self.ping = bool(ping)
+            self._idle = []  # (raw connection, time returned)
+            self._size = 0
+            self._warmed = False
+            self._cond = threading.Condition()
+            self._stats = {'checkouts': 0, 'waits': 0, 'timeouts': 0, 'created': 0,
+                           'recycled': 0, 'ping_failures': 0, 'reset_failures': 0, 'wait_time': 0.0}
+
+        def _new_raw(self):
+            raw = self._connect()
+            with self._cond:
+                self._stats['created'] += 1
+            return raw
+
+        def _discard(self, raw):
+            try:
+                raw.close()
+            except Exception:
+                pass
+
+        def _warm(self):
+            # Pre-open min_size connections on first use rather than at import time,
+            # so a forked gunicorn worker never inherits sockets from its parent.
+            with self._cond:
+                if self._warmed:
+                    return
+                self._warmed = True
+                missing = max(0, self.min_size - self._size)
+                self._size += missing
+            for _ in range(missing):
+                try:
+                    raw = self._new_raw()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                    continue
+                with self._cond:
+                    self._idle.append((raw, time.monotonic()))
+                    self._cond.notify()
+
+        def acquire(self):
+            self._warm()
+            started = time.monotonic()
+            deadline = started + self.timeout
+            raw, returned_at = None, None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        raw, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(f"No database connection available within {self.timeout}s.")
+                    self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                self._stats['checkouts'] += 1
+                self._stats['wait_time'] += time.monotonic() - started
+
+            try:
+                if raw is None:
+                    raw = self._new_raw()
+                elif time.monotonic() - returned_at > self.recycle:
+                    self._discard(raw)
+                    with self._cond:
+                        self._stats['recycled'] += 1
+                    raw = self._new_raw()
+                elif self.ping:
+                    try:
+                        raw.ping(reconnect=False)
+                    except Exception:
+                        self._discard(raw)
+                        with self._cond:
+                            self._stats['ping_failures'] += 1
+                        raw = self._new_raw()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            return PooledConnection(self, raw)
+
+        def release(self, raw):
+            """Rolls back any open transaction and returns the connection to the idle list."""
+            try:
+                raw.rollback()
+            except Exception:
+                self._discard(raw)
+                with self._cond:
+                    self._stats['reset_failures'] += 1
+                    self._size -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+
+        def close(self):
+            with self._cond:
+                idle, self._idle = self._idle, []
+                self._size -= len(idle)
+                self._warmed = False
+            for raw, _ in idle:
+                self._discard(raw)
+
+        def stats(self):
+            with self._cond:
+                stats = dict(self._stats)
+                stats.update(size=self._size, idle=len(self._idle), in_use=self._size - len(self._idle),
+                             min_size=self.min_size, max_size=self.max_size)
+            return stats
+
+    class ReplicaEndpoint:
+        """One read replica: its own connection pool plus a health/lag check that a background
+        thread repeats every check_interval seconds. Requests only read the cached result, so
+        a slow or hung replica never delays them."""
+        def __init__(self, name, pool, check_interval, max_lag):
+            self.name = name
+            self.pool = pool
+            self.check_interval = float(check_interval)
+            self.max_lag = float(max_lag)
+            self.healthy = False
+            self.lag = None
+            self.error = 'not checked yet'
+            self._lock = threading.Lock()
+            self._probe = None
+            self._stop = threading.Event()
+
+        def _replication_lag(self):
+            """Seconds behind the primary, or raises if the server is not replicating."""
+            conn = self.pool.acquire()
+            try:
+                cursor = conn.cursor()
+                try:
+                    try:
+                        cursor.execute("SHOW REPLICA STATUS")
+                    except pymysql.err.MySQLError:
+                        cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22
+                    status = cursor.fetchone()
+                finally:
+                    cursor.close()
+            finally:
+                conn.close()
+            if not status:
+                raise RuntimeError("not configured as a replica")
+            lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+            if lag is None:
+                raise RuntimeError("replication is stopped")
+            return float(lag)
+
+        def check(self):
+            """Probes the replica once and caches the result."""
+            try:
+                lag = self._replication_lag()
+                error = f"lag {lag:.0f}s over {self.max_lag:.0f}s" if lag > self.max_lag else None
+            except Exception as e:
+                lag, error = None, str(e)
+            self.lag, self.error, self.healthy = lag, error, error is None
+            return self.healthy
+
+        def _run_probe(self):
+            while not self._stop.is_set():
+                self.check()
+                self._stop.wait(self.check_interval)
+
+        def start_probe(self):
+            """Starts the probe thread if it isn't running (lazily, so it starts in the worker
+            process rather than in a pre-fork parent)."""
+            with self._lock:
+                if self._probe is None or not self._probe.is_alive():
+                    self._stop.clear()
+                    self._probe = threading.Thread(target=self._run_probe, name=f'replica-probe-{self.name}',
+                                                   daemon=True)
+                    self._probe.start()
+
+        def stop_probe(self):
+            self._stop.set()
+
+        def is_available(self):
+            """The last probe's verdict; never touches the network (unchecked counts as unavailable)."""
+            if self._probe is None:
+                self.start_probe()
+            return self.healthy
+
+        def mark_failed(self, error):
+            """Takes the replica out of rotation until the probe next finds it healthy."""
+            self.healthy, self.error = False, str(error)
+
+        def stats(self):
+            return {'name': self.name, 'healthy': self.healthy, 'lag': self.lag, 'error': self.error,
+                    **self.pool.stats()}
+
     class MySQL:
         def __init__(self, app=None):
+            self.pool = None
+            self.replicas = []
             if app:
                 self.init_app(app)
 
         def init_app(self, app):
             self.app = app
+            cfg = app.config
+            self.pool = self._make_pool(self._connect)
+            self.replicas = []
+            for spec in cfg.get('MYSQL_REPLICAS') or ():
+                settings = spec if isinstance(spec, dict) else dict(zip(('host', 'port'), str(spec).split(':', 1)))
+                name = f"{settings['host']}:{settings.get('port', cfg.get('MYSQL_PORT', 3306))}"
+                self.replicas.append(ReplicaEndpoint(
+                    name, self._make_pool(lambda settings=settings: self._connect(settings)),
+                    cfg.get('MYSQL_REPLICA_CHECK_INTERVAL', 5.0), cfg.get('MYSQL_REPLICA_MAX_LAG', 2.0)))
+            self._next_replica = 0
+            self._replica_lock = threading.Lock()
 
-        @property
-        def connection(self):
+        def _make_pool(self, connect):
+            cfg = self.app.config
+            return ConnectionPool(
+                connect,
+                min_size=cfg.get('MYSQL_POOL_MIN_SIZE', 1),
+                max_size=cfg.get('MYSQL_POOL_MAX_SIZE', 10),
+                timeout=cfg.get('MYSQL_POOL_TIMEOUT', 5.0),
+                recycle=cfg.get('MYSQL_POOL_RECYCLE', 300),
+                ping=cfg.get('MYSQL_POOL_PING', True),
+            )
+
+        def _connect(self, replica=None):
+            """Opens a primary connection, or a read-only one to `replica` (host/port/user/password
+            settings, each defaulting to the primary's)."""
             cfg = getattr(self, 'app', None).config if getattr(self, 'app', None) else {}
+            replica = replica or {}
             conn = pymysql.connect(
-                host=cfg.get('MYSQL_HOST', '127.0.0.1'),
-                user=cfg.get('MYSQL_USER', None),
-                password=cfg.get('MYSQL_PASSWORD', None),
+                host=replica.get('host', cfg.get('MYSQL_HOST', '127.0.0.1')),
+                port=int(replica.get('port', cfg.get('MYSQL_PORT', 3306))),
+                user=replica.get('user', cfg.get('MYSQL_USER', None)),
+                password=replica.get('password', cfg.get('MYSQL_PASSWORD', None)),
                 db=cfg.get('MYSQL_DB', None),
                 cursorclass=pymysql.cursors.DictCursor,
-                autocommit=cfg.get('MYSQL_AUTOCOMMIT', False)
+                autocommit=cfg.get('MYSQL_AUTOCOMMIT', False),
+                init_command="SET SESSION TRANSACTION READ ONLY" if replica else None,
             )
             return conn
 
-from datetime import datetime, timedelta
-from functools import wraps
+        @property
+        def connection(self):
+            # Each read checks a connection out of the pool; close() returns it.
+            return self.pool.acquire()
+
+        def replica_connection(self):
+            """A pooled connection to the next healthy replica (round-robin), or None when
+            none is configured or available, in which case the caller uses the primary."""
+            if not self.replicas:
+                return None
+            with self._replica_lock:
+                start = self._next_replica
+                self._next_replica = (start + 1) % len(self.replicas)
+            for i in range(len(self.replicas)):
+                replica = self.replicas[(start + i) % len(self.replicas)]
+                if not replica.is_available():
+                    continue
+                try:
+                    conn = replica.pool.acquire()
+                except Exception as e:
+                    replica.mark_failed(e)
+                    continue
+                conn.replica = replica.name
+                return conn
+            return None
+
+        def replica_stats(self):
+            return [replica.stats() for replica in self.replicas]
+
+from datetime import date, datetime, timedelta, timezone
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+import asyncio
+import bisect
+import cProfile
+import csv
+import hmac
+import io
+import json
+import pstats
+import queue
+import random
+import re
+
+import click
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# --- Configuration ---
+app = Flask(__name__)
+# IMPORTANT: Use a complex key in production!
+app.config['SECRET_KEY'] = 'a_very_secure_secret_for_flask_sessions' 
+
+# MySQL Database Configuration (!!! REPLACE WITH YOUR CREDENTIALS !!!)
+app.config['MYSQL_HOST'] = '127.0.0.1' 
+app.config['MYSQL_USER'] = 'root'
+app.config['MYSQL_PASSWORD'] = '2468@Sneha' 
+app.config['MYSQL_DB'] = 'blood_donation_db' 
+app.config['MYSQL_CURSORCLASS'] = 'DictCursor' 
+
+app.config['MYSQL_AUTOCOMMIT'] = False 
+
+# Connection pool sizing (PyMySQL fallback only). Size per gunicorn worker:
+# total connections = workers * MYSQL_POOL_MAX_SIZE must stay under max_connections.
+app.config['MYSQL_POOL_MIN_SIZE'] = 1
+app.config['MYSQL_POOL_MAX_SIZE'] = 10
+app.config['MYSQL_POOL_TIMEOUT'] = 5.0   # seconds to wait for a free connection
+app.config['MYSQL_POOL_RECYCLE'] = 300   # reopen connections idle longer than this (seconds)
+app.config['MYSQL_POOL_PING'] = True     # liveness ping on checkout
+
+# Read replicas (PyMySQL fallback only), e.g. ['10.0.0.12', '10.0.0.13:3307'] or dicts with
+# host/port/user/password. Plain SELECTs in GET requests go to a healthy replica; writes,
+# locking reads, POSTs and a user's requests for MYSQL_PRIMARY_PIN_SECONDS after they commit a
+# write use the primary. A replica more than MYSQL_REPLICA_MAX_LAG seconds behind, or whose
+# replication is stopped, is skipped until a later check; a background thread per replica checks
+# every MYSQL_REPLICA_CHECK_INTERVAL s, so requests never wait on it.
+app.config['MYSQL_REPLICAS'] = []
+app.config['MYSQL_REPLICA_MAX_LAG'] = 2.0
+app.config['MYSQL_REPLICA_CHECK_INTERVAL'] = 5.0
+app.config['MYSQL_PRIMARY_PIN_SECONDS'] = 5.0
+
+# Caches (stock summary, logged-in user profiles). Set CACHE_REDIS_URL to share them between
+# workers (requires the optional 'redis' package); otherwise each worker caches in-process.
+app.config['CACHE_REDIS_URL'] = None
+app.config['CACHE_MAX_ENTRIES'] = 10000  # in-process backend only; least recently used entries go first
+app.config['STOCK_CACHE_TTL'] = 30  # seconds; upper bound on staleness across workers
+app.config['USER_CACHE_TTL'] = 60
+
+# Live updates (Server-Sent Events at /events). Each open stream holds a worker thread, so run
+# gunicorn with threaded or gevent workers. Set EVENTS_REDIS_URL to fan events out to every
+# worker (requires the optional 'redis' package); otherwise only the committing worker's clients see them.
+app.config['EVENTS_REDIS_URL'] = None
+app.config['SSE_KEEPALIVE'] = 15          # seconds between keepalive comments on idle streams
+app.config['SSE_QUEUE_SIZE'] = 100        # undelivered events per client before it is disconnected
+app.config['SSE_MAX_SUBSCRIBERS'] = 500   # open streams per worker
+
+# Password hashing (werkzeug format, e.g. 'scrypt' or 'pbkdf2:sha256:600000'). Hashing and
+# verification run on a bounded per-worker thread pool: the KDFs release the GIL, and the pool
+# caps how many run at once (scrypt uses ~32MB each). Legacy plaintext rows and hashes made with
+# an older method are rehashed on the user's next successful login.
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+app.config['PASSWORD_HASH_WORKERS'] = 4
+app.config['PASSWORD_HASH_TIMEOUT'] = 10.0  # seconds a login waits for a pool slot and the KDF
+
+# Async read path (optional 'aiomysql' and 'asgiref' packages). When enabled, the homepage stock,
+# recipient dashboard and admin dashboard reads run as coroutines on a per-worker aiomysql pool,
+# with the admin dashboard's independent queries in flight at the same time. This only overlaps
+# one view's queries: views are still sync and each request holds a worker thread (under
+# `asgi_app` too, which runs them in asgiref's thread pool), so concurrent requests stay bounded
+# by the thread count. Writes, logins, every other route, and requests pinned to the primary
+# after a write (MYSQL_PRIMARY_PIN_SECONDS) stay on the sync path.
+app.config['ASYNC_READS'] = False
+app.config['ASYNC_POOL_MAX_SIZE'] = 10   # per worker, on top of MYSQL_POOL_MAX_SIZE
+
+# Unit inventory: each donation becomes a batch that expires UNIT_SHELF_LIFE_DAYS after collection,
+# approvals take the first-expiring units, and lapsed batches are swept once a day by a background
+# thread in each worker or by `flask expire-stock` from cron. BloodStock.AvailableUnits is their total.
+app.config['UNIT_SHELF_LIFE_DAYS'] = 42
+app.config['INVENTORY_INDEX_TTL'] = 300   # seconds; per-worker batch index is reloaded at least this often
+app.config['INVENTORY_AUTO_SWEEP'] = True
+app.config['INVENTORY_SWEEP_INTERVAL'] = 3600   # seconds between the sweep thread's checks for a new day
+
+# Stock forecasting: per-group daily inflow/outflow rates over these rolling windows (days)
+# project days-to-stockout; rebuilt from the database at most every FORECAST_TTL seconds and kept
+# current in between from committed stock changes.
+app.config['FORECAST_WINDOWS'] = (7, 30, 90)
+app.config['FORECAST_TTL'] = 3600
+app.config['FORECAST_ALERT_DAYS'] = 7   # flag groups projected to run out sooner than this
+
+# Donor matching index: per-worker, rebuilt from the Donor table at most this often (seconds)
+app.config['MATCH_INDEX_TTL'] = 300
+
+# Donor recall: a background thread in each worker checks this often (seconds) whether today's
+# recall lists (donors whose 90-day wait ends today) have been sent; RecallRun makes sure only
+# one worker sends them. Lists are stored in RecallEntry (shown at /admin/recalls) and pushed to
+# admins' /events streams in batches, scarcest group first.
+app.config['RECALL_SCHEDULER'] = True
+app.config['RECALL_INTERVAL'] = 900
+app.config['RECALL_BATCH_SIZE'] = 50
+
+# Observability: per-request DB metrics in headers/logs, Prometheus text at /metrics.
+app.config['METRICS_TOKEN'] = None        # if set, /metrics requires 'Authorization: Bearer <token>'
+app.config['SLOW_REQUEST_DB_MS'] = 200    # log a warning when a request spends longer than this in MySQL
+app.config['PROFILE_SAMPLE_RATE'] = 0.0   # fraction of requests run under cProfile (0 disables)
+
+# Rows per transaction for bulk donation imports (CLI and admin upload)
+app.config['IMPORT_CHUNK_SIZE'] = 500
+
+# Apply pending schema migrations (indexes, new tables/columns) on each worker's first request
+app.config['AUTO_MIGRATE'] = True
+
+# Rows per page for each admin dashboard section (keyset-paginated)
+app.config['ADMIN_PAGE_SIZES'] = {'pending': 25, 'approved': 25, 'donors': 50, 'recipients': 50}
+
+# Rendered admin dashboard sections, cached per worker and keyed by the data versions they
+# were built from (LRU, bounded by entry count and total size)
+app.config['FRAGMENT_CACHE_ENABLED'] = True
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = 512
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = 8 * 1024 * 1024
+
+mysql = MySQL(app)
+
+# --- Blood Stock Cache ---
+class InProcessCacheBackend:
+    """Per-worker cache storage: bounded LRU of (value, expiry), guarded by a lock."""
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+class RedisCacheBackend:
+    """Cache storage shared by all workers through Redis (values stored as JSON)."""
+    def __init__(self, url):
+        redis = importlib.import_module('redis')
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(key, json.dumps(value, default=str), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+STOCK_LEVELS_SQL = "SELECT BloodGroup, AvailableUnits FROM BloodStock"
+
+class StockCache:
+    """Caches the BloodStock summary; invalidated after update_blood_stock() runs, TTL as a fallback."""
+    KEY = 'bloodbank:stock'
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_stock_levels(self, cursor):
+        """Returns [{'BloodGroup', 'AvailableUnits'}, ...], querying only on a cache miss."""
+        levels = self.backend.get(self.KEY)
+        if levels is not None:
+            self._count('hits')
+            return [dict(row) for row in levels]
+        self._count('misses')
+        # Shared by every user for `ttl` seconds, so never filled from a lagging replica
+        cursor.execute(PRIMARY_READ + STOCK_LEVELS_SQL)
+        levels = [{'BloodGroup': row['BloodGroup'], 'AvailableUnits': row['AvailableUnits']} for row in cursor.fetchall()]
+        self.backend.set(self.KEY, levels, self.ttl)
+        return [dict(row) for row in levels]
+
+    async def get_stock_levels_async(self, db):
+        """get_stock_levels() for the async read path; `db` is an AsyncMySQL."""
+        levels = self.backend.get(self.KEY)
+        if levels is not None:
+            self._count('hits')
+            return [dict(row) for row in levels]
+        self._count('misses')
+        rows = await db.fetchall(STOCK_LEVELS_SQL)
+        levels = [{'BloodGroup': row['BloodGroup'], 'AvailableUnits': row['AvailableUnits']} for row in rows]
+        self.backend.set(self.KEY, levels, self.ttl)
+        return [dict(row) for row in levels]
+
+    def invalidate(self):
+        self.backend.delete(self.KEY)
+        self._count('invalidations')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+class UserProfileCache:
+    """Caches the logged-in user's profile row by (role, id); invalidated on profile writes."""
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def _key(role, user_id):
+        return f'bloodbank:user:{role}:{user_id}'
+
+    def get(self, role, user_id):
+        user = self.backend.get(self._key(role, user_id))
+        self._count('hits' if user is not None else 'misses')
+        return dict(user) if user is not None else None
+
+    def set(self, role, user_id, user):
+        self.backend.set(self._key(role, user_id), dict(user), self.ttl)
+
+    def invalidate(self, role, user_id):
+        self.backend.delete(self._key(role, user_id))
+        self._count('invalidations')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+def create_cache_backend(config):
+    url = config.get('CACHE_REDIS_URL')
+    if url and importlib.util.find_spec('redis') is not None:
+        return RedisCacheBackend(url)
+    return InProcessCacheBackend(config.get('CACHE_MAX_ENTRIES', 10000))
+
+cache_backend = create_cache_backend(app.config)
+stock_cache = StockCache(cache_backend, app.config['STOCK_CACHE_TTL'])
+user_cache = UserProfileCache(cache_backend, app.config['USER_CACHE_TTL'])
+
+# --- Live Events ---
+class InProcessEventBackend:
+    """Delivers published events straight to this worker's subscribers."""
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, event):
+        self._deliver(event)
+
+class RedisEventBackend:
+    """Relays events through a Redis pub/sub channel so every worker's subscribers receive them."""
+    CHANNEL = 'bloodbank:events'
+
+    def __init__(self, url):
+        redis = importlib.import_module('redis')
+        self._client = redis.Redis.from_url(url)
+
+    def start(self, deliver):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.CHANNEL: lambda message: deliver(json.loads(message['data']))})
+        pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def publish(self, event):
+        self._client.publish(self.CHANNEL, json.dumps(event, default=str))
+
+class EventSubscription:
+    """One open /events stream: a bounded queue plus the filter deciding what it receives."""
+    def __init__(self, accept, queue_size):
+        self.accept = accept
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+class EventBroker:
+    """Fans committed stock/request events out to the open /events streams.
+
+    Views queue events with queue_event(); they are published only when the request's
+    transaction commits (see LazyConnection), so clients never see rolled-back changes.
+    """
+    def __init__(self, backend, queue_size=100, max_subscribers=500):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._listeners = []
+        self._next_id = 0
+        self._stats = {'published': 0, 'delivered': 0, 'dropped_subscribers': 0}
+        backend.start(self._fan_out)
+
+    def subscribe(self, accept):
+        """Returns a new EventSubscription, or None when this worker is at max_subscribers."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = EventSubscription(accept, self.queue_size)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def add_listener(self, callback):
+        """Calls callback(event) for every event this worker receives (in-process consumers)."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def publish(self, events):
+        for event in events:
+            self.backend.publish(event)
+        with self._lock:
+            self._stats['published'] += len(events)
+
+    def _fan_out(self, event):
+        with self._lock:
+            self._next_id += 1
+            event_id = self._next_id
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                app.logger.warning("Event listener failed on %s: %s", event, e)
+        delivered = 0
+        for subscription in subscribers:
+            if subscription.overflowed or not subscription.accept(event):
+                continue
+            try:
+                subscription.queue.put_nowait((event_id, event))
+                delivered += 1
+            except queue.Full:
+                # Too slow to keep up: end its stream. The browser reconnects and, on the
+                # stream's 'open' event, refetches /api/stock and /api/requests to catch up
+                subscription.overflowed = True
+                with self._lock:
+                    self._stats['dropped_subscribers'] += 1
+        with self._lock:
+            self._stats['delivered'] += delivered
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'subscribers': len(self._subscribers)}
+
+def create_event_broker(config):
+    url = config.get('EVENTS_REDIS_URL')
+    if url and importlib.util.find_spec('redis') is not None:
+        backend = RedisEventBackend(url)
+    else:
+        backend = InProcessEventBackend()
+    return EventBroker(backend, config.get('SSE_QUEUE_SIZE', 100), config.get('SSE_MAX_SUBSCRIBERS', 500))
+
+event_broker = create_event_broker(app.config)
+
+def queue_event(event_type, **data):
+    """Records an event to publish when the request's transaction commits."""
+    g.setdefault('pending_events', []).append({'type': event_type, **data})
+
+def after_commit(callback):
+    """Runs callback() once the request's transaction commits (dropped on rollback)."""
+    g.setdefault('after_commit', []).append(callback)
+
+def queue_request_event(req_id, recipient_id, status):
+    queue_event('request', id=req_id, recipient_id=recipient_id, status=status)
+
+# --- Password Hashing ---
+def is_password_hash(stored):
+    """True for werkzeug 'method$salt$hash' values; anything else is a legacy plaintext password."""
+    parts = (stored or '').split('$')
+    return len(parts) == 3 and parts[0].split(':')[0] in ('scrypt', 'pbkdf2')
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded thread pool (one per worker process)."""
+    def __init__(self, method='scrypt', workers=4, timeout=10.0):
+        self.method = method
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._prefix = None
+        self._lock = threading.Lock()
+        self._stats = {'hashes': 0, 'verifications': 0, 'legacy_verifications': 0, 'rehashes': 0,
+                       'wait_seconds': 0.0, 'kdf_seconds': 0.0}
+
+    def _run(self, fn, *args):
+        submitted = time.perf_counter()
+        def timed():
+            started = time.perf_counter()
+            return started, fn(*args), time.perf_counter() - started
+        started, result, kdf_seconds = self._executor.submit(timed).result(timeout=self.timeout)
+        with self._lock:
+            self._stats['wait_seconds'] += started - submitted
+            self._stats['kdf_seconds'] += kdf_seconds
+        return result
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    @property
+    def current_prefix(self):
+        """The 'method:params' part of hashes made with the configured method."""
+        if self._prefix is None:
+            self._prefix = self._run(generate_password_hash, '', self.method).split('$', 1)[0]
+        return self._prefix
+
+    def hash(self, password):
+        self._count('hashes')
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored, password):
+        """Returns (matches, needs_rehash) for a stored hash or legacy plaintext value."""
+        if not is_password_hash(stored):
+            self._count('legacy_verifications')
+            matches = hmac.compare_digest((stored or '').encode(), (password or '').encode())
+            return matches, matches
+        self._count('verifications')
+        matches = self._run(check_password_hash, stored, password)
+        return matches, matches and stored.split('$', 1)[0] != self.current_prefix
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+password_hasher = PasswordHasher(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_WORKERS'],
+                                 app.config['PASSWORD_HASH_TIMEOUT'])
+
+# (table, id column, login column) per role
+CREDENTIAL_TABLES = {
+    'donor': ('Donor', 'DonorID', 'Email'),
+    'recipient': ('Recipient', 'RecipientID', 'Email'),
+    'admin': ('AdminLogin', 'AdminID', 'Username'),
+}
+
+def _credential_sql(role):
+    table, id_column, login_column = CREDENTIAL_TABLES[role]
+    return f"SELECT {id_column}, Password FROM {table} WHERE {login_column} = %s"
+
+def authenticate(role, login, password, cursor, conn):
+    """Checks credentials with a single lookup. Returns (user_id or None, account_exists).
+
+    A legacy plaintext (or outdated) password is replaced by a fresh hash after it matches;
+    if that write fails the login still succeeds and the next one retries it.
+    """
+    table, id_column, login_column = CREDENTIAL_TABLES[role]
+    cursor.execute(_credential_sql(role), [login])
+    row = cursor.fetchone()
+    if row is None:
+        return None, False
+    matches, needs_rehash = password_hasher.verify(row['Password'], password)
+    if not matches:
+        return None, True
+    if needs_rehash:
+        try:
+            # Conditional on the old value, so a concurrent password change is never overwritten
+            cursor.execute(f"UPDATE {table} SET Password = %s WHERE {id_column} = %s AND Password = %s",
+                           [password_hasher.hash(password), row[id_column], row['Password']])
+            conn.commit()
+            password_hasher._count('rehashes')
+        except Exception as e:
+            conn.rollback()
+            app.logger.warning("Password rehash for %s %s failed: %s", role, row[id_column], e)
+    return row[id_column], True
+
+# --- Decorators and Utility Functions ---
+
+def login_required(role):
+    """A decorator to restrict access to certain roles."""
+    def wrapper(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not g.user or g.role != role:
+                flash(f"Access Denied. Please log in as a {role.capitalize()}.", 'danger')
+                return redirect(url_for(role + '_page', view='login'))
+            return f(*args, **kwargs)
+        return decorated_function
+    return wrapper
+
+class DatabaseUnavailable(Exception):
+    """Raised when the lazily opened request connection cannot be established."""
+
+# Per-worker counters for how many requests actually needed a database connection
+db_request_stats = {'requests': 0, 'connections_opened': 0, 'replica_connections_opened': 0, 'replica_fallbacks': 0}
+db_request_stats_lock = threading.Lock()
+
+READ_STATEMENT = re.compile(r'\s*(SELECT|SHOW)\b', re.I)
+LOCKING_STATEMENT = re.compile(r'\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b|\b(GET|RELEASE)_LOCK\s*\(', re.I)
+
+# Prefix for reads that must see the latest commit even in a GET (e.g. refilling a shared cache)
+PRIMARY_READ = '/* primary */ '
+
+def is_plain_read(statement):
+    """True for a SELECT/SHOW that takes no locks, i.e. one a replica can answer."""
+    return bool(READ_STATEMENT.match(statement)) and not LOCKING_STATEMENT.search(statement)
+
+def reads_pinned_to_primary():
+    """True if this request's reads must see the primary: not a GET/HEAD, or within
+    MYSQL_PRIMARY_PIN_SECONDS of the user's last committed write (read-your-writes)."""
+    return request.method not in ('GET', 'HEAD') or session.get('db_primary_until', 0) > time.time()
+
+class LazyConnection:
+    """Request connection that is only checked out on first real use.
+
+    commit()/rollback()/close() are no-ops until then, so views can keep their usual
+    transaction handling while requests that never query never touch MySQL. Plain reads in a
+    GET/HEAD request may be served by a replica until the primary is first used (see LazyCursor).
+    """
+    def __init__(self, connect, connect_replica=None):
+        self._connect = connect
+        self._conn = None
+        self._connect_replica = connect_replica
+        self._replica = None
+        self._replica_checked = False
+        self.wrote = False
+
+    def _open(self):
+        if self._conn is None:
+            try:
+                self._conn = self._connect()
+            except Exception as e:
+                message = f"Database connection failed. Check your MySQL settings. Error: {e}"
+                # Once per page shown, even if the fallback redirect fails to connect again
+                if has_request_context() and ('danger', message) not in session.get('_flashes', []):
+                    flash(message, 'danger')
+                raise DatabaseUnavailable(str(e)) from e
+            g.db_connections_opened = g.get('db_connections_opened', 0) + 1
+            with db_request_stats_lock:
+                db_request_stats['connections_opened'] += 1
+        return self._conn
+
+    def _open_replica(self):
+        """The request's replica connection, or None if this request must (or will) use the primary."""
+        if not self._replica_checked:
+            self._replica_checked = True
+            if self._connect_replica is not None and not reads_pinned_to_primary():
+                self._replica = self._connect_replica()
+                with db_request_stats_lock:
+                    db_request_stats['replica_connections_opened' if self._replica else 'replica_fallbacks'] += 1
+                if self._replica is not None:
+                    g.db_replica = self._replica.replica
+        return self._replica
+
+    def cursor(self):
+        return LazyCursor(self)
+
+    def commit(self):
+        if self._conn is not None:
+            if 'report_deltas' in g or 'dirty_versions' in g or 'pending_events' in g:
+                cursor = self.cursor()
+                try:
+                    stamp_pending_events(cursor, write_pending_counters(cursor))
+                finally:
+                    cursor.close()
+            self._conn.commit()
+            if self.wrote and self._connect_replica is not None:
+                # Read-your-writes: this user's next requests (e.g. the redirect) read the primary
+                session['db_primary_until'] = time.time() + app.config.get('MYSQL_PRIMARY_PIN_SECONDS', 5.0)
+            self.wrote = False
+        for callback in g.pop('after_commit', []):
+            callback()
+        events = g.pop('pending_events', None)
+        if events:
+            event_broker.publish(events)
+
+    def rollback(self):
+        if self._conn is not None:
+            self._conn.rollback()
+        for pending in ('after_commit', 'pending_events', 'report_deltas', 'dirty_versions'):
+            g.pop(pending, None)
+
+    def close(self):
+        if self._replica is not None:
+            replica, self._replica = self._replica, None
+            replica.close()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._open(), name)
+
+class LazyCursor:
+    """Cursor proxy that opens the request connection on its first execute/fetch.
+
+    Plain reads go to the replica connection while the request has not touched the primary;
+    the first write or locking read moves it to the primary for good, so a transaction always
+    sees its own writes. Fetches and rowcount/lastrowid come from the last cursor executed.
+    """
+    def __init__(self, lazy_conn):
+        self._lazy_conn = lazy_conn
+        self._cursor = None
+        self._replica_cursor = None
+        self._active = None
+
+    def _primary_cursor(self):
+        if self._cursor is None:
+            self._cursor = self._lazy_conn._open().cursor()
+        return self._cursor
+
+    def _cursor_for(self, statement):
+        if not READ_STATEMENT.match(statement) and not statement.startswith(PRIMARY_READ):
+            self._lazy_conn.wrote = True
+        elif (is_plain_read(statement) and self._lazy_conn._conn is None
+                and self._lazy_conn._open_replica() is not None):
+            if self._replica_cursor is None:
+                self._replica_cursor = self._lazy_conn._replica.cursor()
+            return self._replica_cursor
+        return self._primary_cursor()
+
+    def execute(self, query, args=None):
+        self._active = self._cursor_for(query)
+        return self._active.execute(query, args)
+
+    def executemany(self, query, args):
+        self._active = self._cursor_for(query)
+        return self._active.executemany(query, args)
+
+    def close(self):
+        for attr in ('_replica_cursor', '_cursor'):
+            cursor = getattr(self, attr)
+            if cursor is not None:
+                setattr(self, attr, None)
+                cursor.close()
+        self._active = None
+
+    def __getattr__(self, name):
+        if self._active is None:
+            self._active = self._primary_cursor()
+        return getattr(self._active, name)
+
+class QueryStats:
+    """Query count, DB time, rows fetched and slowest statements for one unit of work."""
+    SLOWEST_KEPT = 5
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.slowest = []  # [(seconds, statement)], slowest first
+
+    def record_query(self, statement, seconds):
+        self.queries += 1
+        self.db_time += seconds
+        if len(self.slowest) < self.SLOWEST_KEPT or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, ' '.join(str(statement).split())[:200]))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[self.SLOWEST_KEPT:]
+
+    def record_fetch(self, rows, seconds):
+        self.rows += rows
+        self.db_time += seconds
+
+class InstrumentedCursor:
+    """Cursor proxy that times execute/fetch calls into a QueryStats."""
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self.stats = stats
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self.stats.record_query(query, time.perf_counter() - started)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self.stats.record_query(query, time.perf_counter() - started)
+
+    def _timed_fetch(self, fetch, *args):
+        started = time.perf_counter()
+        result = fetch(*args)
+        count = (1 if result is not None else 0) if fetch == self._cursor.fetchone else len(result)
+        self.stats.record_fetch(count, time.perf_counter() - started)
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._timed_fetch(self._cursor.fetchall)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(self._cursor.fetchmany, *([size] if size is not None else []))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+# Per-worker aggregates by endpoint, plus the slowest statements seen, for /metrics
+route_metrics = {}
+slow_statements = []  # [(seconds, endpoint, statement)], slowest first
+route_metrics_lock = threading.Lock()
+
+def get_db_cursor():
+    """Returns the request's database cursor; the connection itself is opened lazily on first query."""
+    if not hasattr(g, 'cursor'):
+        g.conn = LazyConnection(lambda: mysql.connection, getattr(mysql, 'replica_connection', None))
+        g.cursor = InstrumentedCursor(g.conn.cursor(), g.query_stats)
+    return g.cursor
+
+def open_db():
+    """(connection, cursor) for work outside a view, e.g. CLI commands: commits run the
+    after_commit hooks and publish queued events exactly as a request's do. Call it inside an
+    app (or test request) context and close the connection when done."""
+    conn = LazyConnection(lambda: mysql.connection)
+    return conn, conn.cursor()
+
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(e):
+    """Same fallback the views used when the connection failed up front: back to the homepage,
+    which itself renders without stock (redirecting there again would loop)."""
+    if request.endpoint == 'homepage':
+        return render_template('homepage.html', stock_levels=[], db_error=True)
+    return redirect(url_for('homepage'))
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.query_stats = QueryStats()
+    rate = app.config.get('PROFILE_SAMPLE_RATE') or 0
+    if rate and random.random() < rate:
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request_metrics(response):
+    """Reports this request's DB usage in headers, the log and the per-endpoint aggregates."""
+    stats = g.get('query_stats') or QueryStats()
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    opened = g.get('db_connections_opened', 0)
+    endpoint = request.endpoint or 'unmatched'
+
+    with db_request_stats_lock:
+        db_request_stats['requests'] += 1
+    with route_metrics_lock:
+        totals = route_metrics.setdefault(endpoint, {'requests': 0, 'seconds': 0.0, 'queries': 0,
+                                                     'db_seconds': 0.0, 'rows': 0, 'statuses': {}})
+        totals['requests'] += 1
+        totals['seconds'] += elapsed
+        totals['queries'] += stats.queries
+        totals['db_seconds'] += stats.db_time
+        totals['rows'] += stats.rows
+        totals['statuses'][response.status_code] = totals['statuses'].get(response.status_code, 0) + 1
+        for seconds, statement in stats.slowest:
+            if len(slow_statements) < 20 or seconds > slow_statements[-1][0]:
+                slow_statements.append((seconds, endpoint, statement))
+        slow_statements.sort(key=lambda item: item[0], reverse=True)
+        del slow_statements[20:]
+
+    response.headers['X-DB-Connections'] = str(opened)
+    response.headers['X-DB-Queries'] = str(stats.queries)
+    response.headers['X-DB-Time-Ms'] = f"{stats.db_time * 1000:.1f}"
+    response.headers['X-DB-Rows'] = str(stats.rows)
+    if g.get('db_replica'):
+        response.headers['X-DB-Replica'] = g.db_replica
+
+    log = app.logger.warning if stats.db_time * 1000 > app.config.get('SLOW_REQUEST_DB_MS', 200) else app.logger.debug
+    log("%s %s -> %s in %.1fms: %d queries, %.1fms in DB, %d rows",
+        request.method, request.path, response.status_code, elapsed * 1000, stats.queries, stats.db_time * 1000, stats.rows)
+    return response
+
+@app.teardown_request
+def finish_request_profile(e=None):
+    """Stops and logs a sampled request's profile. Teardown runs even when the view raised
+    (after_request does not), so the profiler never stays enabled on the thread."""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    profiler.disable()
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(20)
+    outcome = f" (raised {e!r})" if e is not None else ''
+    app.logger.info("Profile for %s %s%s:\n%s", request.method, request.path, outcome, report.getvalue())
+
+@app.teardown_appcontext
+def close_db(e=None):
+    """Closes the cursor and releases the connection (back to the pool, if pooled) at the end of the request."""
+    # Stock changed in this request: drop the cached summary now that the transaction
+    # has been committed or rolled back, so the next read sees the final state.
+    if g.pop('stock_dirty', False):
+        stock_cache.invalidate()
+
+    # Close cursor if present
+    cursor = getattr(g, 'cursor', None)
+    if cursor is not None:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        if hasattr(g, 'cursor'):
+            delattr(g, 'cursor')
+
+    # Close connection if present
+    conn = getattr(g, 'conn', None)
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        if hasattr(g, 'conn'):
+            delattr(g, 'conn')
+
+def update_blood_stock(blood_group, units_change, cursor, conn, collected_on=None, donation_id=None, request_id=None,
+                       record_batch=True, by_day=None):
+    """Adds/removes units from BloodStock table. Prevent negative inventory and handle missing groups.
+
+    Each change is a single atomic statement, so concurrent approvals/donations cannot lose
+    updates or drive stock below zero (the row lock is held until the caller commits).
+    Additions also create a unit batch (collected_on defaults to today) unless record_batch is
+    False because the caller records them itself (see add_stock_batches); deductions take the
+    first-expiring batches and, given request_id, record which ones were used. The stock event
+    reports the units per day they moved: collected_on (or by_day, {day: units}, for an addition
+    spanning several collection dates) for additions, today for deductions.
+    """
+    try:
+        # Ensure units_change is an integer
+        units_change = int(units_change)
+        g.stock_dirty = True
+
+        if units_change >= 0:
+            # Add stock, creating the group's row on first donation
+            cursor.execute("""
+                INSERT INTO BloodStock (BloodGroup, AvailableUnits) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE AvailableUnits = AvailableUnits + %s
+            """, (blood_group, units_change, units_change))
+            if units_change and record_batch:
+                add_stock_batch(cursor, blood_group, units_change, collected_on, donation_id)
+            bump_data_versions(cursor, 'stock')
+            days = by_day or {collected_on or datetime.now().date(): units_change}
+            queue_event('stock', group=blood_group, delta=units_change,
+                        days={as_date(day).isoformat(): units for day, units in days.items()})
+            return True
+
+        # Deduct only if enough stock remains; zero affected rows means it didn't
+        cursor.execute("""
+            UPDATE BloodStock SET AvailableUnits = AvailableUnits + %s
+            WHERE BloodGroup = %s AND AvailableUnits + %s >= 0
+        """, (units_change, blood_group, units_change))
+        if cursor.rowcount == 1:
+            allocate_stock_batches(cursor, blood_group, -units_change, request_id)
+            bump_data_versions(cursor, 'stock')
+            queue_event('stock', group=blood_group, delta=units_change,
+                        days={datetime.now().date().isoformat(): units_change})
+            return True
+
+        # Failure path only: read the row to explain why
+        cursor.execute("SELECT AvailableUnits FROM BloodStock WHERE BloodGroup = %s", [blood_group])
+        row = cursor.fetchone()
+        if row is None:
+            flash(f"Insufficient stock: {blood_group} does not exist.", 'danger')
+        else:
+            current_units = row.get('AvailableUnits') if isinstance(row, dict) else row[0]
+            flash(f"Insufficient stock for {blood_group}. Available: {current_units}, required: {abs(units_change)}", 'danger')
+        return False
+    except Exception as e:
+        flash(f"Stock update failed: {e}", 'danger')
+        return False
+
+REQUEST_STATUSES = ('Pending', 'Approved', 'Rejected', 'Completed')
+
+def bump_report_counters(cursor, deltas):
+    """Adds {'MetricName': delta} to ReportSummary as part of the caller's transaction.
+
+    Metrics are 'total_donations' and 'requests_<RequestStatus>'. Call this in the same
+    transaction as the write it accounts for; the deltas are summed per metric and written by
+    write_pending_counters() when it commits, so they commit or roll back with it.
+    """
+    pending = g.setdefault('report_deltas', {})
+    changed = set()
+    for metric, delta in deltas.items():
+        if delta:
+            pending[metric] = pending.get(metric, 0) + delta
+            changed.add('requests' if metric.startswith('requests_') else 'donations')
+    # Every new donation and request status change passes through here
+    bump_data_versions(cursor, *sorted(changed))
+
+# Change counters behind the API's ETag/Last-Modified headers and the admin fragment cache:
+# 'stock' (BloodStock), 'requests' (BloodRequest rows and statuses), 'donations' (Donation rows),
+# 'donors'/'recipients' (rows added or changed)
+DATA_VERSION_NAMES = ('stock', 'requests', 'donations', 'donors', 'recipients')
+
+def bump_data_versions(cursor, *names):
+    """Marks the named DataVersion counters for an increment when the caller's transaction
+    commits (once per transaction, however often a name is bumped)."""
+    g.setdefault('dirty_versions', set()).update(names)
+
+def write_pending_counters(cursor):
+    """Writes the counters bumped in this transaction: ReportSummary rows, then DataVersion rows,
+    each in name order. LazyConnection.commit() runs it last, just before COMMIT, so every
+    transaction locks these few shared rows after its own rows, in one global order, and holds
+    them only for the commit itself. Returns {name: the version this commit produces}."""
+    deltas = g.pop('report_deltas', {})
+    for metric in sorted(deltas):
+        if deltas[metric]:
+            cursor.execute("""
+                INSERT INTO ReportSummary (MetricName, MetricValue) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE MetricValue = MetricValue + %s
+            """, (metric, deltas[metric], deltas[metric]))
+    versions = {}
+    for name in sorted(g.pop('dirty_versions', ())):
+        # LAST_INSERT_ID(expr) hands the new Version back as lastrowid (0 when the row was inserted)
+        cursor.execute("""
+            INSERT INTO DataVersion (Name, Version, UpdatedAt) VALUES (%s, 1, UTC_TIMESTAMP())
+            ON DUPLICATE KEY UPDATE Version = LAST_INSERT_ID(Version + 1), UpdatedAt = UTC_TIMESTAMP()
+        """, [name])
+        versions[name] = cursor.lastrowid or 1
+    return versions
+
+# The DataVersion counter each event type's changes bump
+EVENT_VERSION_NAMES = {'stock': 'stock', 'request': 'requests'}
+
+def stamp_pending_events(cursor, versions):
+    """Completes the transaction's queued events so clients can apply them out of order or after
+    a gap: each gets the version its commit produces, and each stock event the group's new
+    AvailableUnits (read once per group, from rows this transaction already holds locked)."""
+    events = g.get('pending_events') or []
+    groups = sorted({event['group'] for event in events if event['type'] == 'stock'})
+    units = {}
+    if groups:
+        cursor.execute(f"""
+            SELECT BloodGroup, AvailableUnits FROM BloodStock
+            WHERE BloodGroup IN ({', '.join(['%s'] * len(groups))}) FOR UPDATE
+        """, groups)
+        units = {row['BloodGroup']: int(row['AvailableUnits']) for row in cursor.fetchall()}
+    for event in events:
+        if event['type'] == 'stock':
+            event['units'] = units.get(event['group'])
+        version = versions.get(EVENT_VERSION_NAMES.get(event['type']))
+        if version is not None:
+            event['version'] = version
+
+def _data_versions_sql(names):
+    return f"SELECT Name, Version, UpdatedAt FROM DataVersion WHERE Name IN ({', '.join(['%s'] * len(names))})"
+
+def fetch_data_versions(cursor, names):
+    """Returns ({name: version}, latest UpdatedAt as an aware UTC datetime or None)."""
+    cursor.execute(_data_versions_sql(names), list(names))
+    versions, last_modified = {name: 0 for name in names}, None
+    for row in cursor.fetchall():
+        versions[row['Name']] = int(row['Version'])
+        updated = row['UpdatedAt']
+        if isinstance(updated, str):
+            updated = datetime.strptime(updated[:19], '%Y-%m-%d %H:%M:%S')
+        updated = updated.replace(tzinfo=timezone.utc)
+        if last_modified is None or updated > last_modified:
+            last_modified = updated
+    return versions, last_modified
+
+def record_status_transition(cursor, old_status, new_status):
+    """Moves one request between the per-status counters."""
+    bump_report_counters(cursor, {f'requests_{old_status}': -1, f'requests_{new_status}': 1})
+
+REPORT_SUMMARY_SQL = "SELECT MetricName, MetricValue FROM ReportSummary"
+
+def fetch_report_summary(cursor):
+    """Reads the admin report block from the materialized counters (a handful of rows)."""
+    cursor.execute(REPORT_SUMMARY_SQL)
+    return _report_summary_result(cursor.fetchall())
+
+def _report_summary_result(rows):
+    metrics = {row['MetricName']: int(row['MetricValue']) for row in rows}
+    request_counts = {status: metrics.get(f'requests_{status}', 0) for status in REQUEST_STATUSES}
+    return {
+        'total_donations': metrics.get('total_donations', 0),
+        'total_requests': sum(request_counts.values()),
+        'pending_requests': request_counts['Pending'],
+        'approved_requests': request_counts['Approved'],
+        'rejected_requests': request_counts['Rejected'],
+        'completed_requests': request_counts['Completed'],
+    }
+
+def _bulk_requests_sql(req_ids):
+    return f"""
+        SELECT RequestID, RecipientID, BloodGroup, RequiredUnits, RequestStatus FROM BloodRequest
+        WHERE RequestID IN ({', '.join(['%s'] * len(req_ids))}) ORDER BY RequestDate, RequestID FOR UPDATE
+    """
+
+def bulk_request_action(req_ids, action, cursor, conn):
+    """Approves, rejects or completes many requests in ONE transaction.
+
+    Requests are locked and processed oldest first (RequestDate, RequestID), so stock is
+    allocated deterministically; stock rows for the involved groups are locked once. The caller
+    commits. Returns [(RequestID, succeeded, message)] in processing order.
+    """
+    req_ids = sorted({int(r) for r in req_ids})
+    if not req_ids:
+        return []
+    cursor.execute(_bulk_requests_sql(req_ids), req_ids)
+    rows = cursor.fetchall()
+    found = {row['RequestID'] for row in rows}
+    outcomes = [(req_id, False, 'Request not found.') for req_id in req_ids if req_id not in found]
+
+    transitions = []  # (row, new status)
+    if action == 'Approve':
+        groups = sorted({row['BloodGroup'] for row in rows if row['RequestStatus'] == 'Pending'})
+        available = {}
+        if groups:
+            group_placeholders = ', '.join(['%s'] * len(groups))
+            cursor.execute(f"""
+                SELECT BloodGroup, AvailableUnits FROM BloodStock
+                WHERE BloodGroup IN ({group_placeholders}) ORDER BY BloodGroup FOR UPDATE
+            """, groups)
+            available = {row['BloodGroup']: row['AvailableUnits'] for row in cursor.fetchall()}
+        for row in rows:
+            if row['RequestStatus'] != 'Pending':
+                outcomes.append((row['RequestID'], False, 'Only Pending requests can be Approved.'))
+            elif available.get(row['BloodGroup'], 0) < row['RequiredUnits']:
+                outcomes.append((row['RequestID'], False,
+                                 f"Insufficient stock of {row['BloodGroup']} ({row['RequiredUnits']}mL needed, "
+                                 f"{available.get(row['BloodGroup'], 0)}mL left)."))
+            else:
+                available[row['BloodGroup']] -= row['RequiredUnits']
+                transitions.append((row, 'Approved'))
+    elif action == 'Reject':
+        for row in rows:
+            if row['RequestStatus'] == 'Rejected':
+                outcomes.append((row['RequestID'], False, 'Already Rejected.'))
+            else:
+                transitions.append((row, 'Rejected'))
+    elif action == 'Complete':
+        for row in rows:
+            if row['RequestStatus'] != 'Approved':
+                outcomes.append((row['RequestID'], False, 'Cannot complete a request that is not Approved.'))
+            else:
+                transitions.append((row, 'Completed'))
+    else:
+        return [(req_id, False, f'Unknown action {action}.') for req_id in req_ids]
+
+    if not transitions:
+        return outcomes
+
+    new_status = transitions[0][1]
+    changed_ids = [row['RequestID'] for row, _ in transitions]
+    id_list = ', '.join(['%s'] * len(changed_ids))
+    if action == 'Approve':
+        cursor.execute(f"UPDATE BloodRequest SET RequestStatus = %s, ApprovedOn = %s WHERE RequestID IN ({id_list})",
+                       [new_status, datetime.now().date(), *changed_ids])
+    else:
+        cursor.execute(f"UPDATE BloodRequest SET RequestStatus = %s WHERE RequestID IN ({id_list})",
+                       [new_status, *changed_ids])
+
+    if action == 'Approve':
+        # Oldest request first, each recording the batches it drew from. Stock rows are locked
+        # and the totals pre-checked, so this cannot fail for lack of stock.
+        for row, _ in transitions:
+            if not update_blood_stock(row['BloodGroup'], -row['RequiredUnits'], cursor, conn, request_id=row['RequestID']):
+                raise Exception(f"Failed to update blood stock for {row['BloodGroup']}.")
+
+    counter_deltas = {f'requests_{new_status}': len(transitions)}
+    for row, _ in transitions:
+        key = f"requests_{row['RequestStatus']}"
+        counter_deltas[key] = counter_deltas.get(key, 0) - 1
+    bump_report_counters(cursor, counter_deltas)
+
+    for row, status in transitions:
+        queue_request_event(row['RequestID'], row['RecipientID'], status)
+        outcomes.append((row['RequestID'], True, f"{status}."))
+    return outcomes
+
+REQUEST_FOR_APPROVAL_SQL = "SELECT RecipientID, RequiredUnits, BloodGroup FROM BloodRequest WHERE RequestID = %s"
+
+def approve_blood_request(req_id, cursor, conn):
+    """Moves a Pending request to Approved and deducts its units from stock.
+
+    The status change is a conditional UPDATE, so a request can only be approved (and its
+    stock deducted) once even if two admins click at the same time. On insufficient stock the
+    transaction is rolled back. Returns (approved, message, flash_category).
+    """
+    cursor.execute(REQUEST_FOR_APPROVAL_SQL, [req_id])
+    request_details = cursor.fetchone()
+    if request_details:
+        cursor.execute("UPDATE BloodRequest SET RequestStatus = %s, ApprovedOn = %s WHERE RequestID = %s AND RequestStatus = %s",
+                       ['Approved', datetime.now().date(), req_id, 'Pending'])
+    if not request_details or cursor.rowcount != 1:
+        return False, 'Only Pending requests can be Approved.', 'danger'
+
+    units_needed = request_details['RequiredUnits']
+    blood_group = request_details['BloodGroup']
+
+    # Deduct stock upon approval (THIS IS THE DEDUCTION LOGIC)
+    if not update_blood_stock(blood_group, -units_needed, cursor, conn, request_id=req_id):
+        conn.rollback()
+        return False, f'Approval failed: Insufficient stock of {blood_group} ({units_needed}mL needed).', 'danger'
+    record_status_transition(cursor, 'Pending', 'Approved')
+    queue_request_event(req_id, request_details['RecipientID'], 'Approved')
+    return True, f'Request {req_id} Approved. {units_needed}mL of {blood_group} deducted from stock (Reserved).', 'success'
+
+def check_donor_eligibility(donor_data, today=None):
+    """Implements the eligibility logic (age, weight, last donation, medical).
+
+    Applies the same per-donor rules as check_donor_eligibility_batch (see _eligibility_verdict),
+    so a donor gets the same verdict here as in the admin list, the import and the recall backfill.
+    """
+    today = today or datetime.now().date()
+    eligible, reason, _ = _eligibility_verdict(
+        donor_data.get('Age'), donor_data.get('Weight'), _donation_date(donor_data.get('LastDonationDate')),
+        _has_condition(donor_data.get('ChronicDiseases', 'None')), today, today - DONATION_INTERVAL)
+    return eligible, reason
+
+NO_DISEASE_VALUES = frozenset(['none', 'n/a', ''])
+DEFAULT_DONOR_WEIGHT = 70.0  # the Donor.Weight column default
+
+def stored_donor_weight(donor):
+    """The weight a stored donor row is judged on: a missing or zero weight counts as the
+    column default, in every view (dashboard, admin list, import, NextEligibleDate)."""
+    return donor.get('Weight') or DEFAULT_DONOR_WEIGHT
+DONATION_INTERVAL = timedelta(days=90)
+_BAD_DATE = object()  # a LastDonationDate that is set but cannot be read as a date
+
+def _donation_date(value):
+    """LastDonationDate as a date, None if empty, or _BAD_DATE."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            return _BAD_DATE
+    return _BAD_DATE
+
+def _has_condition(disease):
+    return bool(disease) and str(disease).lower() not in NO_DISEASE_VALUES
+
+def _eligibility_verdict(age, weight, last_date, has_condition, today, cutoff):
+    """(eligible, reason, next-eligible date) for one donor; last_date comes from _donation_date
+    and cutoff is today - DONATION_INTERVAL (a later last donation means still waiting)."""
+    # 1. Age check
+    try:
+        age = int(age)
+    except Exception:
+        return False, "Invalid age provided.", None
+    if not (18 <= age <= 65):
+        return False, "Age must be between 18 and 65.", None
+
+    # 2. Weight check (a missing weight lets the donor through before the remaining checks)
+    try:
+        if float(weight) < 50:
+            return False, "Weight must be over 50 kg.", None
+    except Exception:
+        if weight is None or weight == 0:
+            return True, "Eligible to donate, but please update weight/details.", today
+        return False, "Invalid weight provided.", None
+
+    # 3. Last Donation Date check (90 days wait), reported ahead of a medical condition
+    if last_date is _BAD_DATE:
+        return False, "Error processing last donation date format.", None
+    if last_date is not None and last_date > cutoff:
+        return (False, f"Must wait {90 - (today - last_date).days} more days since last donation.",
+                None if has_condition else last_date + DONATION_INTERVAL)
+
+    # 4. Chronic Diseases
+    if has_condition:
+        return False, "Medical condition recorded. Please consult a doctor.", None
+    return True, "Eligible to donate.", today
+
+def _convert_column(values, convert):
+    """[convert(v) for v in values], calling convert once per distinct value."""
+    converted = {}
+    return [converted[v] if v in converted else converted.setdefault(v, convert(v)) for v in values]
+
+def check_donor_eligibility_batch(columns, today=None):
+    """The eligibility rules for many donors at once (check_donor_eligibility is the one-row call).
+
+    `columns` maps 'Age', 'Weight', 'LastDonationDate' and 'ChronicDiseases' to equal-length
+    sequences (a missing column means None for every row, or 'None' for ChronicDiseases).
+    Returns three lists: eligible flags, reasons and next-eligible dates (today if eligible,
+    the end of the 90-day wait if only that blocks, else None).
+
+    The date and disease columns are converted column by column, each distinct value once (a
+    page of donors shares few dates and fewer disease strings), and the cutoff is computed once;
+    only the rule order is applied row by row.
+    """
+    today = today or datetime.now().date()
+    cutoff = today - DONATION_INTERVAL
+    n = len(next((col for col in columns.values()), []))
+    ages = columns.get('Age') or [None] * n
+    weights = columns.get('Weight') or [None] * n
+    last_dates = columns.get('LastDonationDate') or [None] * n
+    diseases = columns.get('ChronicDiseases') or ['None'] * n
+
+    dates = _convert_column(last_dates, _donation_date)
+    conditions = _convert_column(diseases, _has_condition)
+    verdicts = [_eligibility_verdict(*row, today, cutoff) for row in zip(ages, weights, dates, conditions)]
+    return [v[0] for v in verdicts], [v[1] for v in verdicts], [v[2] for v in verdicts]
+
+def fetch_donors_with_eligibility(cursor, after_id=None, limit=None):
+    """Loads donors (optionally one keyset page after `after_id`) with their eligibility inputs
+    in ONE query and tags each row with EligibilityStatus."""
+    cursor.execute(*_donors_sql(after_id, limit))
+    return _tag_donor_eligibility(cursor.fetchall())
+
+def _donors_sql(after_id, limit):
+    sql = """
+        SELECT DonorID, Name, BloodGroup, Email, LastDonationDate, Age, Weight, ChronicDiseases
+        FROM Donor
+    """
+    params = []
+    if after_id is not None:
+        sql += " WHERE DonorID > %s"
+        params.append(after_id)
+    sql += " ORDER BY DonorID"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, params
+
+def _tag_donor_eligibility(donors):
+    # Same defaults the admin view always applied before checking eligibility
+    eligible, _, _ = check_donor_eligibility_batch({
+        'Age': [d.get('Age') for d in donors],
+        'Weight': [stored_donor_weight(d) for d in donors],
+        'LastDonationDate': [d.get('LastDonationDate') for d in donors],
+        'ChronicDiseases': [d.get('ChronicDiseases') or 'None' for d in donors],
+    })
+    for donor, is_eligible in zip(donors, eligible):
+        donor['EligibilityStatus'] = 'Eligible' if is_eligible else 'Ineligible'
+    return donors
+
+def parse_id_cursor(value):
+    """Parses an ID keyset cursor from the query string; bad/missing values mean 'first page'."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+def parse_request_cursor(value):
+    """Parses a '<RequestDate>_<RequestID>' keyset cursor; bad/missing values mean 'first page'."""
+    try:
+        date_str, req_id = value.split('_')
+        return datetime.strptime(date_str, '%Y-%m-%d').date(), int(req_id)
+    except (AttributeError, ValueError):
+        return None
+
+def fetch_requests_page(cursor, status, after=None, limit=25):
+    """One page of requests with the given status, newest first, keyed on (RequestDate, RequestID).
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    cursor.execute(*_requests_page_sql(status, after, limit))
+    return _requests_page_result(cursor.fetchall(), limit)
+
+def _requests_page_sql(status, after, limit):
+    sql = """
+        SELECT br.*, r.Name AS RecipientName
+        FROM BloodRequest br JOIN Recipient r ON br.RecipientID = r.RecipientID
+        WHERE br.RequestStatus = %s
+    """
+    params = [status]
+    if after is not None:
+        sql += " AND (br.RequestDate < %s OR (br.RequestDate = %s AND br.RequestID < %s))"
+        params.extend([after[0], after[0], after[1]])
+    sql += " ORDER BY br.RequestDate DESC, br.RequestID DESC LIMIT %s"
+    params.append(limit + 1)
+    return sql, params
+
+def _requests_page_result(rows, limit):
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    request_date = last['RequestDate']
+    if not isinstance(request_date, str):
+        request_date = request_date.strftime('%Y-%m-%d')
+    return rows[:limit], f"{request_date}_{last['RequestID']}"
+
+def fetch_recipients_page(cursor, after_id=None, limit=50):
+    """One page of recipients ordered by RecipientID. Returns (rows, next_cursor)."""
+    cursor.execute(*_recipients_page_sql(after_id, limit))
+    return _recipients_page_result(cursor.fetchall(), limit)
+
+def _recipients_page_sql(after_id, limit):
+    sql = "SELECT RecipientID, Name, BloodGroup, ContactNumber FROM Recipient"
+    params = []
+    if after_id is not None:
+        sql += " WHERE RecipientID > %s"
+        params.append(after_id)
+    sql += " ORDER BY RecipientID LIMIT %s"
+    params.append(limit + 1)
+    return sql, params
+
+def _recipients_page_result(rows, limit):
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], rows[limit - 1]['RecipientID']
+
+# --- Donor Matching ---
+BLOOD_GROUPS = ('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-')
+
+# Requested blood group -> donor groups that can give to it, in order of preference:
+# exact match first, O- (the universal donor, always scarce) last.
+COMPATIBLE_DONOR_GROUPS = {
+    'O-': ('O-',),
+    'O+': ('O+', 'O-'),
+    'A-': ('A-', 'O-'),
+    'A+': ('A+', 'A-', 'O+', 'O-'),
+    'B-': ('B-', 'O-'),
+    'B+': ('B+', 'B-', 'O+', 'O-'),
+    'AB-': ('AB-', 'A-', 'B-', 'O-'),
+    'AB+': ('AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'),
+}
+
+def as_date(value):
+    """DB/form date value (date, datetime or 'YYYY-MM-DD') as a date; None if empty."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    return value
+
+def donor_eligibility_state(donors, today=None):
+    """(NextEligibleDate, IneligibleReason) to store on each donor row: the day the 90-day wait
+    ends (today if they never donated) and None, or None and the static rule excluding them."""
+    today = today or datetime.now().date()
+    # Static rules only; the 90-day wait is what NextEligibleDate itself records
+    eligible, reasons, _ = check_donor_eligibility_batch({
+        'Age': [d.get('Age') for d in donors],
+        'Weight': [stored_donor_weight(d) for d in donors],
+        'LastDonationDate': [None] * len(donors),
+        'ChronicDiseases': [d.get('ChronicDiseases') or 'None' for d in donors],
+    }, today=today)
+    states = []
+    for donor, is_eligible, reason in zip(donors, eligible, reasons):
+        if not is_eligible:
+            states.append((None, reason))
+            continue
+        last_date = as_date(donor.get('LastDonationDate'))
+        states.append((last_date + DONATION_INTERVAL if last_date else today, None))
+    return states
+
+# Covered by idx_donor_next_eligible (NextEligibleDate, BloodGroup; DonorID is the primary key)
+MATCHABLE_DONORS_SQL = "SELECT DonorID, BloodGroup, NextEligibleDate FROM Donor WHERE NextEligibleDate IS NOT NULL"
+RESERVED_DONORS_SQL = """
+    SELECT DISTINCT MatchedDonorID FROM BloodRequest
+    WHERE MatchedDonorID IS NOT NULL AND RequestStatus IN ('Pending', 'Approved')
+"""
+
+class DonorMatchIndex:
+    """In-memory donor index for request matching, partitioned by blood group.
+
+    Each group keeps a sorted list of (eligible-from ordinal, DonorID), so the donors who can
+    give today are a prefix found by bisection, already ordered longest-rested first.
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_group = {group: [] for group in BLOOD_GROUPS}
+        self._entries = {}  # DonorID -> (BloodGroup, eligible-from ordinal)
+        self._loaded_at = None
+
+    def _remove(self, donor_id):
+        entry = self._entries.pop(donor_id, None)
+        if entry is not None:
+            group, ordinal = entry
+            bucket = self._by_group[group]
+            pos = bisect.bisect_left(bucket, (ordinal, donor_id))
+            if pos < len(bucket) and bucket[pos] == (ordinal, donor_id):
+                del bucket[pos]
+
+    def _insert(self, donor_id, blood_group, eligible_from):
+        if blood_group in self._by_group and eligible_from is not None:
+            ordinal = eligible_from.toordinal()
+            bisect.insort(self._by_group[blood_group], (ordinal, donor_id))
+            self._entries[donor_id] = (blood_group, ordinal)
+
+    def load(self, donors, reserved_ids=()):
+        """Rebuilds from (DonorID, BloodGroup, NextEligibleDate) rows; donors already matched to an
+        open request, or excluded by a static rule (no NextEligibleDate), are left out."""
+        reserved_ids = set(reserved_ids)
+        by_group = {group: [] for group in BLOOD_GROUPS}
+        entries = {}
+        for donor in donors:
+            start = as_date(donor['NextEligibleDate'])
+            if start is not None and donor['BloodGroup'] in by_group and donor['DonorID'] not in reserved_ids:
+                ordinal = start.toordinal()
+                by_group[donor['BloodGroup']].append((ordinal, donor['DonorID']))
+                entries[donor['DonorID']] = (donor['BloodGroup'], ordinal)
+        for bucket in by_group.values():
+            bucket.sort()
+        with self._lock:
+            self._by_group, self._entries = by_group, entries
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, cursor):
+        """Loads from the database if never loaded or older than the TTL (two queries)."""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        # Kept for `ttl` seconds and shared by every request, so never loaded from a lagging replica
+        cursor.execute(PRIMARY_READ + MATCHABLE_DONORS_SQL)
+        donors = cursor.fetchall()
+        cursor.execute(PRIMARY_READ + RESERVED_DONORS_SQL)
+        reserved = [row['MatchedDonorID'] for row in cursor.fetchall()]
+        self.load(donors, reserved)
+
+    def update_donor(self, donor_id, blood_group, eligible_from):
+        """Re-indexes one donor after a donation/profile change (eligible_from None removes them)."""
+        with self._lock:
+            self._remove(donor_id)
+            self._insert(donor_id, blood_group, eligible_from)
+
+    def remove_donor(self, donor_id):
+        with self._lock:
+            self._remove(donor_id)
+
+    def find_matches(self, blood_group, limit=5, today=None):
+        """Up to `limit` donors who can give to `blood_group` today, best first, as
+        [(DonorID, donor BloodGroup, eligible-from date)]."""
+        today_ordinal = (today or datetime.now().date()).toordinal()
+        matches = []
+        with self._lock:
+            for group in COMPATIBLE_DONOR_GROUPS.get(blood_group, ()):
+                bucket = self._by_group[group]
+                available = bisect.bisect_right(bucket, (today_ordinal, float('inf')))
+                for ordinal, donor_id in bucket[:min(available, limit - len(matches))]:
+                    matches.append((donor_id, group, date.fromordinal(ordinal)))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def stats(self):
+        with self._lock:
+            return {'donors': len(self._entries), **{group: len(b) for group, b in self._by_group.items()}}
+
+donor_match_index = DonorMatchIndex(app.config['MATCH_INDEX_TTL'])
+
+# (requested group, donor group) pairs COMPATIBLE_DONOR_GROUPS allows, for SQL row-constructor IN lists
+COMPATIBLE_GROUP_PAIRS = sorted((requested, donor) for requested, donors in COMPATIBLE_DONOR_GROUPS.items()
+                                for donor in donors)
+MATCH_DONOR_SQL = f"""
+    UPDATE BloodRequest r JOIN Donor d ON d.DonorID = %s
+    SET r.MatchedDonorID = d.DonorID
+    WHERE r.RequestID = %s AND r.RequestStatus = 'Pending' AND d.NextEligibleDate <= %s
+      AND (r.BloodGroup, d.BloodGroup) IN ({', '.join(['(%s, %s)'] * len(COMPATIBLE_GROUP_PAIRS))})
+"""
+
+def record_donor_match(req_id, donor_id, cursor, today=None):
+    """Stores the match on a still-Pending request if the donor can give to its group and is
+    eligible today (checked in the UPDATE itself, whatever the form sent), and takes the donor
+    out of the index. Returns False if nothing was matched."""
+    today = today or datetime.now().date()
+    cursor.execute(MATCH_DONOR_SQL, [donor_id, req_id, today, *(group for pair in COMPATIBLE_GROUP_PAIRS for group in pair)])
+    if cursor.rowcount != 1:
+        return False
+    bump_data_versions(cursor, 'requests')
+    donor_match_index.remove_donor(donor_id)
+    return True
+
+def _donor_names_sql(donor_ids):
+    return f"SELECT DonorID, Name FROM Donor WHERE DonorID IN ({', '.join(['%s'] * len(donor_ids))})"
+
+def suggest_donor_matches(cursor, requests):
+    """Adds SuggestedDonor (DonorID/Name/BloodGroup) to unmatched requests from the index."""
+    donor_match_index.ensure_loaded(cursor)
+    suggestions = {}
+    for req in requests:
+        if not req.get('MatchedDonorID'):
+            found = donor_match_index.find_matches(req['BloodGroup'], limit=1)
+            if found:
+                suggestions[req['RequestID']] = found[0]
+    names = {}
+    if suggestions:
+        donor_ids = sorted({donor_id for donor_id, _, _ in suggestions.values()})
+        cursor.execute(_donor_names_sql(donor_ids), donor_ids)
+        names = {row['DonorID']: row['Name'] for row in cursor.fetchall()}
+    for req in requests:
+        match = suggestions.get(req['RequestID'])
+        req['SuggestedDonor'] = None
+        if match and match[0] in names:
+            req['SuggestedDonor'] = {'DonorID': match[0], 'Name': names[match[0]], 'BloodGroup': match[1]}
+    return requests
+
+# --- Stock Forecasting ---
+FORECAST_INFLOW_SQL = """
+    SELECT o.BloodGroup, d.DonationDate AS Day, SUM(d.UnitsDonated) AS Units
+    FROM Donation d JOIN Donor o ON d.DonorID = o.DonorID
+    WHERE d.DonationDate >= %s GROUP BY o.BloodGroup, d.DonationDate
+"""
+# Outflow is every unit that left stock, on the day it left: approvals and expirations (the
+# same changes the live stock events report)
+FORECAST_OUTFLOW_SQL = """
+    SELECT BloodGroup, Day, SUM(Units) AS Units FROM (
+        SELECT BloodGroup, ApprovedOn AS Day, RequiredUnits AS Units
+        FROM BloodRequest WHERE ApprovedOn >= %s
+        UNION ALL
+        SELECT BloodGroup, ExpiredOn, ExpiredUnits
+        FROM StockBatch WHERE ExpiredOn >= %s
+    ) outflow
+    GROUP BY BloodGroup, Day
+"""
+
+class StockForecaster:
+    """Per-group daily inflow/outflow buckets for rolling-window rates and days-to-stockout.
+
+    Each group keeps running totals (cum[i] = units in days 0..i-1), so any window's total is
+    one subtraction whatever the length of history. It is loaded from two aggregate queries,
+    then kept current from committed stock events, each booked on the day its units moved: a
+    donation or import to inflow on its collection date, an approval or expiry to outflow.
+    """
+    KINDS = ('inflow', 'outflow')
+
+    def __init__(self, windows, ttl):
+        self.windows = tuple(sorted(windows))
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._origin = None  # ordinal of day 0
+        self._cum = {kind: {group: [0] for group in BLOOD_GROUPS} for kind in self.KINDS}
+        self._loaded_at = None
+
+    def load(self, inflow_rows, outflow_rows, today=None):
+        """Rebuilds from (BloodGroup, Day, Units) aggregate rows; days older than the rows or
+        the longest window are kept as zeros."""
+        today_ordinal = (today or datetime.now().date()).toordinal()
+        days = [as_date(row['Day']).toordinal() for row in (*inflow_rows, *outflow_rows)]
+        origin = min([today_ordinal - self.windows[-1] + 1, *days])
+        span = today_ordinal - origin + 1
+        cum = {}
+        for kind, rows in zip(self.KINDS, (inflow_rows, outflow_rows)):
+            buckets = {group: [0] * span for group in BLOOD_GROUPS}
+            for row in rows:
+                day = as_date(row['Day']).toordinal() - origin
+                if row['BloodGroup'] in buckets and 0 <= day < span:
+                    buckets[row['BloodGroup']][day] += int(row['Units'])
+            cum[kind] = {}
+            for group, daily in buckets.items():
+                running, total = [0] * (span + 1), 0
+                for i, units in enumerate(daily):
+                    total += units
+                    running[i + 1] = total
+                cum[kind][group] = running
+        with self._lock:
+            self._origin, self._cum = origin, cum
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, cursor):
+        """Reloads if never loaded or older than the TTL: two GROUP BY queries over the longest window."""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        since = datetime.now().date() - timedelta(days=self.windows[-1] - 1)
+        # Kept for `ttl` seconds and shared by every request, so never loaded from a lagging replica
+        cursor.execute(PRIMARY_READ + FORECAST_INFLOW_SQL, [since])
+        inflow = cursor.fetchall()
+        cursor.execute(PRIMARY_READ + FORECAST_OUTFLOW_SQL, [since, since])
+        outflow = cursor.fetchall()
+        self.load(inflow, outflow)
+
+    def _extend_to(self, today_ordinal):
+        """Adds empty buckets for days that started since the last load (lock held)."""
+        missing = today_ordinal - self._origin + 2 - len(self._cum['inflow'][BLOOD_GROUPS[0]])
+        if missing > 0:
+            for by_group in self._cum.values():
+                for running in by_group.values():
+                    running.extend([running[-1]] * missing)
+
+    def record(self, blood_group, units_change, day=None, today=None):
+        """Applies one committed stock change to day's bucket (default today): positive is
+        inflow, negative outflow. Days before the loaded history are outside every window."""
+        today = today or datetime.now().date()
+        day_ordinal = (as_date(day) or today).toordinal()
+        with self._lock:
+            if self._origin is None or blood_group not in BLOOD_GROUPS or not units_change:
+                return
+            if day_ordinal < self._origin:
+                return
+            self._extend_to(max(day_ordinal, today.toordinal()))
+            running = self._cum['inflow' if units_change > 0 else 'outflow'][blood_group]
+            for i in range(day_ordinal - self._origin + 1, len(running)):
+                running[i] += abs(units_change)
+
+    def rates(self, today=None):
+        """{group: {window: (inflow per day, outflow per day)}} for the windows ending today."""
+        today_ordinal = (today or datetime.now().date()).toordinal()
+        with self._lock:
+            if self._origin is None:
+                return {}
+            self._extend_to(today_ordinal)
+            end = today_ordinal - self._origin + 1
+            return {group: {window: tuple((self._cum[kind][group][end] - self._cum[kind][group][max(0, end - window)]) / window
+                                          for kind in self.KINDS)
+                            for window in self.windows}
+                    for group in BLOOD_GROUPS}
+
+    def forecast(self, stock_levels, alert_days=7, today=None):
+        """Per-group projection rows for the dashboard/API.
+
+        The burn rate is the worst net outflow across the windows, so a recent surge in
+        approvals shows up before the longer averages catch up.
+        """
+        today = today or datetime.now().date()
+        rates = self.rates(today)
+        available = {row['BloodGroup']: int(row['AvailableUnits']) for row in stock_levels}
+        rows = []
+        for group in BLOOD_GROUPS:
+            group_rates = rates.get(group, {})
+            burn = max([outflow - inflow for inflow, outflow in group_rates.values()] or [0.0])
+            units = available.get(group, 0)
+            days_left = units / burn if burn > 0 else None
+            rows.append({
+                'BloodGroup': group,
+                'AvailableUnits': units,
+                'inflow_per_day': {window: round(r[0], 1) for window, r in group_rates.items()},
+                'outflow_per_day': {window: round(r[1], 1) for window, r in group_rates.items()},
+                'net_burn_per_day': round(max(burn, 0.0), 1),
+                'days_to_stockout': round(days_left, 1) if days_left is not None else None,
+                'stockout_date': (today + timedelta(days=int(days_left))).isoformat() if days_left is not None else None,
+                'alert': days_left is not None and days_left < alert_days,
+            })
+        return rows
+
+stock_forecaster = StockForecaster(app.config['FORECAST_WINDOWS'], app.config['FORECAST_TTL'])
+def _forecast_stock_event(event):
+    if event['type'] == 'stock':
+        for day, units in event.get('days', {}).items():
+            stock_forecaster.record(event['group'], units, day=day)
+
+event_broker.add_listener(_forecast_stock_event)
+
+# --- Bulk Donation Import ---
+IMPORT_FIELDS = ('Email', 'DonationDate', 'UnitsDonated', 'DonationCenter')
+
+def iter_import_rows(stream, fmt):
+    """Yields (line_no, row dict) from a CSV (header row) or JSON Lines text stream, one at a time."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {'_error': f"Invalid JSON: {e}"}
+            yield line_no, row if isinstance(row, dict) else {'_error': "Expected a JSON object."}
+
+def _validate_import_row(row):
+    """Parses one raw row into (email, date, units, center) or raises ValueError with the reason."""
+    if row.get('_error'):
+        raise ValueError(row['_error'])
+    email = (row.get('Email') or '').strip()
+    if not email:
+        raise ValueError("Missing Email.")
+    try:
+        donation_date = datetime.strptime(str(row.get('DonationDate') or '').strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError("DonationDate must be YYYY-MM-DD.")
+    try:
+        units = int(row.get('UnitsDonated'))
+    except (TypeError, ValueError):
+        raise ValueError("UnitsDonated must be a whole number.")
+    if units <= 0:
+        raise ValueError("UnitsDonated must be positive.")
+    return email, donation_date, units, (row.get('DonationCenter') or '').strip() or None
+
+def _import_chunk(chunk, cursor, conn, on_reject):
+    """Validates and writes one chunk in a single transaction. Returns the accepted count."""
+    parsed = []
+    for line_no, row in chunk:
+        try:
+            parsed.append((line_no, *_validate_import_row(row)))
+        except ValueError as e:
+            on_reject(line_no, str(e))
+    if not parsed:
+        return 0
+
+    emails = sorted({p[1] for p in parsed})
+    placeholders = ', '.join(['%s'] * len(emails))
+    cursor.execute(f"""
+        SELECT DonorID, Email, BloodGroup, Age, Weight, LastDonationDate, ChronicDiseases
+        FROM Donor WHERE Email IN ({placeholders})
+    """, emails)
+    donors = {row['Email']: row for row in cursor.fetchall()}
+
+    candidates, seen = [], set()
+    for line_no, email, donation_date, units, center in parsed:
+        donor = donors.get(email)
+        if donor is None:
+            on_reject(line_no, f"No donor registered with email {email}.")
+        elif email in seen:
+            on_reject(line_no, "Donor appears more than once in this batch; re-import the row separately.")
+        else:
+            seen.add(email)
+            candidates.append((line_no, donor, donation_date, units, center))
+
+    # Eligibility as of each donation date, with the same defaults as the donor dashboard
+    accepted = []
+    for day in sorted({c[2] for c in candidates}):
+        same_day = [c for c in candidates if c[2] == day]
+        eligible, reasons, _ = check_donor_eligibility_batch({
+            'Age': [c[1].get('Age') for c in same_day],
+            'Weight': [stored_donor_weight(c[1]) for c in same_day],
+            'LastDonationDate': [c[1].get('LastDonationDate') for c in same_day],
+            'ChronicDiseases': [c[1].get('ChronicDiseases') or 'None' for c in same_day],
+        }, today=day)
+        for candidate, is_eligible, reason in zip(same_day, eligible, reasons):
+            if is_eligible:
+                accepted.append(candidate)
+            else:
+                on_reject(candidate[0], f"Donor ineligible: {reason}")
+    if not accepted:
+        return 0
+
+    try:
+        # One row at a time: each unit batch needs its DonationID, and a multi-row insert's ids are
+        # only guaranteed consecutive under innodb_autoinc_lock_mode < 2
+        batches = []
+        for _, donor, day, units, center in accepted:
+            cursor.execute("INSERT INTO Donation (DonorID, DonationDate, UnitsDonated, DonationCenter) VALUES (%s, %s, %s, %s)",
+                           (donor['DonorID'], day, units, center))
+            batches.append((donor['BloodGroup'], cursor.lastrowid, day, units))
+        # Accepted donors passed the static rules, so only the 90-day wait moves
+        cursor.executemany("""
+            UPDATE Donor SET LastDonationDate = %s, NextEligibleDate = %s, IneligibleReason = NULL
+            WHERE DonorID = %s AND (LastDonationDate IS NULL OR LastDonationDate < %s)
+        """, sorted([(day, day + DONATION_INTERVAL, donor['DonorID'], day) for _, donor, day, _, _ in accepted],
+                    key=lambda params: params[2]))
+        bump_data_versions(cursor, 'donors')
+
+        # One stock statement per blood group in the chunk, and one unit batch per donation
+        stock_deltas, stock_days = {}, {}
+        for blood_group, _, day, units in batches:
+            stock_deltas[blood_group] = stock_deltas.get(blood_group, 0) + units
+            by_day = stock_days.setdefault(blood_group, {})
+            by_day[day] = by_day.get(day, 0) + units
+        for blood_group, units in sorted(stock_deltas.items()):
+            if not update_blood_stock(blood_group, units, cursor, conn, record_batch=False,
+                                      by_day=stock_days[blood_group]):
+                raise Exception(f"Failed to update blood stock for {blood_group}.")
+        add_stock_batches(cursor, batches)
+        bump_report_counters(cursor, {'total_donations': sum(stock_deltas.values())})
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        for line_no, *_ in accepted:
+            on_reject(line_no, f"Batch failed and was rolled back: {e}")
+        return 0
+
+    for _, donor, day, _, _ in accepted:
+        user_cache.invalidate('donor', donor['DonorID'])
+        donor_match_index.update_donor(donor['DonorID'], donor['BloodGroup'],
+                                       max(day, as_date(donor['LastDonationDate']) or day) + DONATION_INTERVAL)
+    return len(accepted)
+
+def import_donations(rows, cursor, conn, on_reject, chunk_size=500):
+    """Streams (line_no, row) pairs into Donation in chunked transactions.
+
+    Each chunk costs one donor lookup, one insert per donation, batched updates and unit batches,
+    and one stock update per blood group. Rejected rows are reported through on_reject(line_no, reason) rather than collected,
+    so memory stays bounded by chunk_size. Returns {'accepted': n, 'rejected': n}.
+    """
+    counts = {'accepted': 0, 'rejected': 0}
+
+    def reject(line_no, reason):
+        counts['rejected'] += 1
+        on_reject(line_no, reason)
+
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            counts['accepted'] += _import_chunk(chunk, cursor, conn, reject)
+            chunk = []
+    if chunk:
+        counts['accepted'] += _import_chunk(chunk, cursor, conn, reject)
+    return counts
+
+# --- Streaming Export ---
+EXPORT_QUERIES = {
+    'donors': """SELECT DonorID, Name, Age, Gender, BloodGroup, ContactNumber, Email, Address,
+                        Weight, ChronicDiseases, LastDonationDate
+                 FROM Donor ORDER BY DonorID""",
+    'donations': """SELECT DonationID, DonorID, DonationDate, UnitsDonated, DonationCenter
+                    FROM Donation ORDER BY DonationID""",
+    'requests': """SELECT RequestID, RecipientID, BloodGroup, RequiredUnits, Hospital, Reason,
+                          RequestDate, RequestStatus, MatchedDonorID
+                   FROM BloodRequest ORDER BY RequestID""",
+}
+EXPORT_FETCH_SIZE = 1000
+
+def open_dedicated_connection():
+    """A connection owned by the caller (not the request's), e.g. for a response that outlives the view."""
+    pool = getattr(mysql, 'pool', None)
+    if pool is not None:
+        return pool.acquire()
+    return mysql.connect  # flask_mysqldb: fresh connection, not cached on the app context
+
+def open_streaming_cursor(conn):
+    """Unbuffered (server-side) dict cursor: rows are read from the socket as they are fetched."""
+    if _flask_mysqldb_spec is not None:
+        return conn.cursor(importlib.import_module('MySQLdb.cursors').SSDictCursor)
+    return conn.cursor(pymysql.cursors.SSDictCursor)
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)  # Decimal
+
+def export_rows(dataset, fmt, conn=None):
+    """Yields an export of `dataset` as CSV or a JSON array, in chunks of EXPORT_FETCH_SIZE rows.
+
+    Uses a server-side cursor on its own connection, so memory stays constant whatever the
+    table size, and closes both when the generator finishes or is closed early.
+    """
+    conn = conn or open_dedicated_connection()
+    cursor = open_streaming_cursor(conn)
+    try:
+        cursor.execute(EXPORT_QUERIES[dataset])
+        columns = [col[0] for col in cursor.description]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == 'csv':
+            writer.writerow(columns)
+        else:
+            buffer.write('[')
+        first = True
+        while True:
+            rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                if fmt == 'csv':
+                    writer.writerow([row[col] for col in columns])
+                else:
+                    buffer.write(('' if first else ',\n') + json.dumps({col: _json_value(row[col]) for col in columns}))
+                first = False
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if fmt != 'csv':
+            buffer.write(']\n')
+        yield buffer.getvalue()
+    finally:
+        try:
+            cursor.close()
+        finally:
+            conn.close()
+
+# --- Schema Migrations ---
+# instance/bloodbank.sql creates the base schema; everything after it (indexes, new tables and
+# columns) is a numbered migration below, recorded in SchemaMigrations once applied. MySQL
+# commits DDL implicitly, so every step is written to be safe to re-run after a partial failure.
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+def index_exists(cursor, table, index_name):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index_name))
+    return cursor.fetchone() is not None
+
+def ensure_index(table, index_name, columns):
+    """Migration step that creates an index unless it already exists."""
+    def step(cursor):
+        if not index_exists(cursor, table, index_name):
+            cursor.execute(f"CREATE INDEX {index_name} ON {table} ({columns})")
+    return step
+
+def ensure_column(table, column, definition):
+    """Migration step that adds a column unless it already exists."""
+    def step(cursor):
+        if not column_exists(cursor, table, column):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+# (version, name, steps); a step is an SQL string or a callable taking the cursor
+MIGRATIONS = [
+    (1, 'BloodRequest.RequestDate column', [
+        ensure_column('BloodRequest', 'RequestDate', 'DATE NOT NULL DEFAULT (CURDATE()) AFTER Reason'),
+    ]),
+    (2, 'ReportSummary counters', [
+        """CREATE TABLE IF NOT EXISTS ReportSummary (
+               MetricName VARCHAR(50) PRIMARY KEY,
+               MetricValue BIGINT NOT NULL DEFAULT 0
+           )""",
+        "INSERT IGNORE INTO ReportSummary (MetricName, MetricValue) "
+        "SELECT 'total_donations', COALESCE(SUM(UnitsDonated), 0) FROM Donation",
+        "INSERT IGNORE INTO ReportSummary (MetricName, MetricValue) "
+        "SELECT CONCAT('requests_', RequestStatus), COUNT(*) FROM BloodRequest GROUP BY RequestStatus",
+    ]),
+    (3, 'Indexes for hot route queries', [
+        # Admin pending/approved pages: WHERE RequestStatus = ? ORDER BY RequestDate DESC, RequestID DESC
+        ensure_index('BloodRequest', 'idx_request_status_date', 'RequestStatus, RequestDate, RequestID'),
+        # Recipient dashboard history: WHERE RecipientID = ? ORDER BY RequestDate DESC
+        ensure_index('BloodRequest', 'idx_request_recipient_date', 'RecipientID, RequestDate'),
+        # Stock reconciliation / per-group request totals
+        ensure_index('BloodRequest', 'idx_request_group_status', 'BloodGroup, RequestStatus'),
+        # Donor dashboard history: WHERE DonorID = ? ORDER BY DonationDate DESC
+        ensure_index('Donation', 'idx_donation_donor_date', 'DonorID, DonationDate'),
+        # Date-range reporting over donations
+        ensure_index('Donation', 'idx_donation_date', 'DonationDate'),
+        # Group-wise donor lookups by recency (matching, recall)
+        ensure_index('Donor', 'idx_donor_group_last_donation', 'BloodGroup, LastDonationDate'),
+    ]),
+    (4, 'DataVersion counters for API conditional GETs', [
+        """CREATE TABLE IF NOT EXISTS DataVersion (
+               Name VARCHAR(20) PRIMARY KEY,
+               Version BIGINT NOT NULL DEFAULT 0,
+               UpdatedAt DATETIME NOT NULL
+           )""",
+        "INSERT IGNORE INTO DataVersion (Name, Version, UpdatedAt) VALUES "
+        "('stock', 1, UTC_TIMESTAMP()), ('requests', 1, UTC_TIMESTAMP()), ('donations', 1, UTC_TIMESTAMP())",
+    ]),
+    (5, 'Unit batches with expiry and request allocations', [
+        """CREATE TABLE IF NOT EXISTS StockBatch (
+               BatchID INT AUTO_INCREMENT PRIMARY KEY,
+               BloodGroup ENUM('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-') NOT NULL,
+               DonationID INT NULL,
+               CollectedOn DATE NOT NULL,
+               ExpiresOn DATE NOT NULL,
+               Units INT NOT NULL,
+               RemainingUnits INT NOT NULL,
+               ExpiredUnits INT NOT NULL DEFAULT 0,
+               Status ENUM('Available', 'Depleted', 'Expired') NOT NULL DEFAULT 'Available',
+               INDEX idx_batch_group_fifo (BloodGroup, Status, ExpiresOn, BatchID),
+               INDEX idx_batch_status_expiry (Status, ExpiresOn),
+               FOREIGN KEY (DonationID) REFERENCES Donation(DonationID) ON DELETE SET NULL
+           )""",
+        """CREATE TABLE IF NOT EXISTS BatchAllocation (
+               RequestID INT NOT NULL,
+               BatchID INT NOT NULL,
+               Units INT NOT NULL,
+               PRIMARY KEY (RequestID, BatchID),
+               INDEX idx_allocation_batch (BatchID),
+               FOREIGN KEY (RequestID) REFERENCES BloodRequest(RequestID) ON DELETE CASCADE,
+               FOREIGN KEY (BatchID) REFERENCES StockBatch(BatchID)
+           )""",
+        # Existing stock becomes batches dated by the donations it came from
+        lambda cursor: backfill_stock_batches(cursor),
+    ]),
+    (6, 'Materialized donor eligibility and recall runs', [
+        ensure_column('Donor', 'NextEligibleDate', 'DATE NULL'),
+        ensure_column('Donor', 'IneligibleReason', 'VARCHAR(255) NULL'),
+        # Recall lists: WHERE NextEligibleDate BETWEEN ? AND ?, grouped by BloodGroup
+        ensure_index('Donor', 'idx_donor_next_eligible', 'NextEligibleDate, BloodGroup'),
+        lambda cursor: backfill_donor_eligibility(cursor),
+        """CREATE TABLE IF NOT EXISTS RecallRun (
+               RecallDate DATE PRIMARY KEY,
+               Donors INT NOT NULL DEFAULT 0,
+               SentAt DATETIME NOT NULL
+           )""",
+    ]),
+    (7, 'DataVersion counters for donors and recipients', [
+        "INSERT IGNORE INTO DataVersion (Name, Version, UpdatedAt) VALUES "
+        "('donors', 1, UTC_TIMESTAMP()), ('recipients', 1, UTC_TIMESTAMP())",
+    ]),
+    (8, 'Outflow dates: request approval and batch expiry', [
+        ensure_column('BloodRequest', 'ApprovedOn', 'DATE NULL'),
+        # No approval date was kept before: the request date is the closest record
+        "UPDATE BloodRequest SET ApprovedOn = RequestDate "
+        "WHERE RequestStatus IN ('Approved', 'Completed') AND ApprovedOn IS NULL",
+        # Forecast outflow: WHERE ApprovedOn >= ?, covering
+        ensure_index('BloodRequest', 'idx_request_approved', 'ApprovedOn, BloodGroup, RequiredUnits'),
+        ensure_column('StockBatch', 'ExpiredOn', 'DATE NULL'),
+        # The sweep expires batches the day after their expiry date
+        "UPDATE StockBatch SET ExpiredOn = DATE_ADD(ExpiresOn, INTERVAL 1 DAY) "
+        "WHERE Status = 'Expired' AND ExpiredOn IS NULL",
+        ensure_index('StockBatch', 'idx_batch_expired', 'ExpiredOn, BloodGroup, ExpiredUnits'),
+    ]),
+    (9, 'Stored recall lists', [
+        """CREATE TABLE IF NOT EXISTS RecallEntry (
+               RecallDate DATE NOT NULL,
+               DonorID INT NOT NULL,
+               BloodGroup ENUM('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-') NOT NULL,
+               Priority INT NOT NULL,
+               Batch INT NOT NULL,
+               PRIMARY KEY (RecallDate, DonorID),
+               INDEX idx_recall_entry_order (RecallDate, Priority, Batch),
+               FOREIGN KEY (DonorID) REFERENCES Donor(DonorID) ON DELETE CASCADE
+           )""",
+    ]),
+]
+
+def apply_migrations(conn, echo=None):
+    """Applies pending MIGRATIONS in order. Returns the versions applied."""
+    cursor = conn.cursor()
+    applied_now = []
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SchemaMigrations (
+                Version INT PRIMARY KEY,
+                Name VARCHAR(100) NOT NULL,
+                AppliedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Serialize workers starting at the same time
+        cursor.execute("SELECT GET_LOCK('bloodbank_migrations', 60) AS acquired")
+        if not cursor.fetchone()['acquired']:
+            raise Exception("Timed out waiting for the migration lock.")
+        try:
+            cursor.execute("SELECT Version FROM SchemaMigrations")
+            applied = {row['Version'] for row in cursor.fetchall()}
+            for version, name, steps in MIGRATIONS:
+                if version in applied:
+                    continue
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute("INSERT INTO SchemaMigrations (Version, Name) VALUES (%s, %s)", (version, name))
+                conn.commit()
+                applied_now.append(version)
+                if echo:
+                    echo(f"Applied migration {version}: {name}")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('bloodbank_migrations')")
+    finally:
+        cursor.close()
+    return applied_now
+
+migrations_state = {'done': False}
+migrations_lock = threading.Lock()
+
+@app.before_request
+def run_pending_migrations():
+    """Applies pending migrations once per worker, on its first request."""
+    if migrations_state['done'] or not app.config.get('AUTO_MIGRATE'):
+        return
+    with migrations_lock:
+        if migrations_state['done']:
+            return
+        try:
+            conn = mysql.connection
+        except Exception as e:
+            app.logger.warning("Skipping schema migrations, database unavailable: %s", e)
+            return
+        try:
+            apply_migrations(conn, echo=app.logger.info)
+            migrations_state['done'] = True
+        except Exception as e:
+            # Don't retry on every request; fix the cause and run `flask migrate`
+            migrations_state['done'] = True
+            conn.rollback()
+            app.logger.error("Schema migration failed: %s", e)
+        finally:
+            # flask_mysqldb keeps its connection on the app context for the rest of the
+            # request (close_db releases it); only a pooled connection is ours to return now.
+            if getattr(mysql, 'pool', None) is not None:
+                conn.close()
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Applies pending schema migrations."""
+    conn = mysql.connection
+    try:
+        applied = apply_migrations(conn, echo=click.echo)
+    finally:
+        conn.close()
+    click.echo(f"{len(applied)} migration(s) applied; schema is at version {MIGRATIONS[-1][0]}.")
+
+# --- Unit Inventory ---
+class StockInventory:
+    """Expiry-ordered index of available unit batches per blood group (one per worker).
+
+    Each group keeps a sorted list of (expiry ordinal, BatchID), so the first usable batch is
+    found by bisection and allocation walks forward from it. The database stays authoritative:
+    batches are consumed with conditional UPDATEs, index changes are applied after the commit,
+    and a disagreement falls back to a locked FIFO read plus a reload.
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_group = {group: [] for group in BLOOD_GROUPS}
+        self._batches = {}  # BatchID -> [BloodGroup, expiry ordinal, remaining units]
+        self._loaded_at = None
+
+    def load(self, rows):
+        """Rebuilds from (BatchID, BloodGroup, ExpiresOn, RemainingUnits) rows of available batches."""
+        by_group = {group: [] for group in BLOOD_GROUPS}
+        batches = {}
+        for row in rows:
+            if row['BloodGroup'] in by_group and row['RemainingUnits'] > 0:
+                ordinal = as_date(row['ExpiresOn']).toordinal()
+                by_group[row['BloodGroup']].append((ordinal, row['BatchID']))
+                batches[row['BatchID']] = [row['BloodGroup'], ordinal, int(row['RemainingUnits'])]
+        for bucket in by_group.values():
+            bucket.sort()
+        with self._lock:
+            self._by_group, self._batches = by_group, batches
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, cursor):
+        """Reloads if never loaded, invalidated or older than the TTL (one query)."""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        # Kept for `ttl` seconds and shared by every request, so never loaded from a lagging replica
+        cursor.execute(PRIMARY_READ + AVAILABLE_BATCHES_SQL)
+        self.load(cursor.fetchall())
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def add(self, batch_id, blood_group, expires_on, units):
+        with self._lock:
+            if blood_group in self._by_group and batch_id not in self._batches:
+                ordinal = expires_on.toordinal()
+                bisect.insort(self._by_group[blood_group], (ordinal, batch_id))
+                self._batches[batch_id] = [blood_group, ordinal, units]
+
+    def _drop(self, batch_id):
+        blood_group, ordinal, _ = self._batches.pop(batch_id)
+        bucket = self._by_group[blood_group]
+        pos = bisect.bisect_left(bucket, (ordinal, batch_id))
+        if pos < len(bucket) and bucket[pos] == (ordinal, batch_id):
+            del bucket[pos]
+
+    def consume(self, allocations):
+        """Applies committed [(BatchID, units)] allocations."""
+        with self._lock:
+            for batch_id, units in allocations:
+                entry = self._batches.get(batch_id)
+                if entry is not None:
+                    entry[2] -= units
+                    if entry[2] <= 0:
+                        self._drop(batch_id)
+
+    def remove_expired(self, today):
+        """Drops batches that expired before `today` (after a committed sweep)."""
+        cutoff = (today.toordinal(), -1)
+        with self._lock:
+            for bucket in self._by_group.values():
+                stale = bisect.bisect_left(bucket, cutoff)
+                for _, batch_id in bucket[:stale]:
+                    self._batches.pop(batch_id, None)
+                del bucket[:stale]
+
+    def plan(self, blood_group, units, today):
+        """[(BatchID, units)] taking `units` from the first-expiring usable batches, or the
+        partial plan if the index does not hold enough."""
+        plan, needed = [], units
+        with self._lock:
+            bucket = self._by_group.get(blood_group, [])
+            for _, batch_id in bucket[bisect.bisect_left(bucket, (today.toordinal(), -1)):]:
+                take = min(self._batches[batch_id][2], needed)
+                plan.append((batch_id, take))
+                needed -= take
+                if needed == 0:
+                    break
+        return plan
+
+    def expiry_summary(self, today, within_days):
+        """{group: {'next_expiry', 'expiring_units', 'batches'}} for the dashboard."""
+        today_ordinal = today.toordinal()
+        summary = {}
+        with self._lock:
+            for group, bucket in self._by_group.items():
+                start = bisect.bisect_left(bucket, (today_ordinal, -1))
+                end = bisect.bisect_right(bucket, (today_ordinal + within_days, float('inf')))
+                summary[group] = {
+                    'next_expiry': date.fromordinal(bucket[start][0]) if start < len(bucket) else None,
+                    'expiring_units': sum(self._batches[batch_id][2] for _, batch_id in bucket[start:end]),
+                    'batches': len(bucket) - start,
+                }
+        return summary
+
+    def stats(self):
+        with self._lock:
+            return {'batches': len(self._batches), **{group: len(b) for group, b in self._by_group.items()}}
+
+stock_inventory = StockInventory(app.config['INVENTORY_INDEX_TTL'])
+
+AVAILABLE_BATCHES_SQL = """
+    SELECT BatchID, BloodGroup, ExpiresOn, RemainingUnits FROM StockBatch
+    WHERE Status = 'Available' AND RemainingUnits > 0
+"""
+FIFO_BATCHES_SQL = """
+    SELECT BatchID, RemainingUnits FROM StockBatch
+    WHERE BloodGroup = %s AND Status = 'Available' AND RemainingUnits > 0 AND ExpiresOn >= %s
+    ORDER BY ExpiresOn, BatchID FOR UPDATE
+"""
+STOCK_ROWS_LOCK_SQL = "SELECT BloodGroup, AvailableUnits FROM BloodStock ORDER BY BloodGroup FOR UPDATE"
+EXPIRED_BATCH_TOTALS_SQL = """
+    SELECT BloodGroup, SUM(RemainingUnits) AS Units, COUNT(*) AS Batches FROM StockBatch
+    WHERE Status = 'Available' AND ExpiresOn < %s GROUP BY BloodGroup
+"""
+CONSUME_BATCH_SQL = """
+    UPDATE StockBatch SET RemainingUnits = RemainingUnits - %s,
+                          Status = IF(RemainingUnits = 0, 'Depleted', Status)
+    WHERE BatchID = %s AND Status = 'Available' AND RemainingUnits >= %s
+"""
+
+BACKFILL_DONATIONS_SQL = """
+    SELECT d.DonationID, d.DonationDate, d.UnitsDonated
+    FROM Donation d JOIN Donor o ON d.DonorID = o.DonorID
+    WHERE o.BloodGroup = %s ORDER BY d.DonationDate DESC, d.DonationID DESC
+"""
+
+def backfill_stock_batches(cursor):
+    """Splits each group's current AvailableUnits into batches, if no batches exist yet.
+
+    Stock on hand is assumed to be the newest donations (approvals take the oldest units), so
+    each group's donations are taken newest first, with their real dates, until they cover
+    AvailableUnits; the oldest one taken may be partly used. Units no donation accounts for
+    (stock entered by hand) have no known age, so they are dated today rather than letting the
+    first automatic sweep expire them unreviewed.
+    """
+    cursor.execute("SELECT COUNT(*) AS batches FROM StockBatch")
+    if cursor.fetchone()['batches']:
+        return
+    cursor.execute("SELECT BloodGroup, AvailableUnits FROM BloodStock WHERE AvailableUnits > 0 ORDER BY BloodGroup")
+    shelf_life = timedelta(days=app.config['UNIT_SHELF_LIFE_DAYS'])
+    today = datetime.now().date()
+    rows = []
+    for stock in cursor.fetchall():
+        group, needed = stock['BloodGroup'], int(stock['AvailableUnits'])
+        cursor.execute(BACKFILL_DONATIONS_SQL, [group])
+        for donation in cursor.fetchall():
+            if needed <= 0:
+                break
+            units = int(donation['UnitsDonated'])
+            collected_on = as_date(donation['DonationDate'])
+            rows.append((group, donation['DonationID'], collected_on, collected_on + shelf_life, units, min(units, needed)))
+            needed -= units
+        if needed > 0:
+            rows.append((group, None, today, today + shelf_life, needed, needed))
+    if rows:
+        cursor.executemany("""
+            INSERT INTO StockBatch (BloodGroup, DonationID, CollectedOn, ExpiresOn, Units, RemainingUnits)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, rows)
+    stock_inventory.invalidate()
+
+def add_stock_batch(cursor, blood_group, units, collected_on=None, donation_id=None):
+    """Records a batch of newly donated units; it joins the index once the transaction commits."""
+    collected_on = as_date(collected_on) or datetime.now().date()
+    expires_on = collected_on + timedelta(days=app.config['UNIT_SHELF_LIFE_DAYS'])
+    cursor.execute("""
+        INSERT INTO StockBatch (BloodGroup, DonationID, CollectedOn, ExpiresOn, Units, RemainingUnits)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (blood_group, donation_id, collected_on, expires_on, units, units))
+    batch_id = cursor.lastrowid
+    after_commit(lambda: stock_inventory.add(batch_id, blood_group, expires_on, units))
+    return batch_id
+
+def add_stock_batches(cursor, batches):
+    """add_stock_batch() for many donations in one multi-row insert, given
+    [(BloodGroup, DonationID, CollectedOn, Units)]; the index reloads after commit."""
+    shelf_life = timedelta(days=app.config['UNIT_SHELF_LIFE_DAYS'])
+    cursor.executemany("""
+        INSERT INTO StockBatch (BloodGroup, DonationID, CollectedOn, ExpiresOn, Units, RemainingUnits)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, [(group, donation_id, day, day + shelf_life, units, units) for group, donation_id, day, units in batches])
+    after_commit(stock_inventory.invalidate)
+
+def allocate_stock_batches(cursor, blood_group, units, request_id=None, today=None):
+    """Takes `units` from the first-expiring usable batches of a group (caller holds its BloodStock
+    row lock) and records the allocation against request_id. Returns [(BatchID, units)]."""
+    today = today or datetime.now().date()
+    stock_inventory.ensure_loaded(cursor)
+    allocations, needed = {}, units
+    for batch_id, take in stock_inventory.plan(blood_group, units, today):
+        cursor.execute(CONSUME_BATCH_SQL, [take, batch_id, take])
+        if cursor.rowcount != 1:
+            break
+        allocations[batch_id] = take
+        needed -= take
+
+    if needed:
+        # Index behind the database (other workers, a rolled-back transaction): FIFO read under lock
+        stock_inventory.invalidate()
+        cursor.execute(FIFO_BATCHES_SQL, [blood_group, today])
+        for row in cursor.fetchall():
+            take = min(int(row['RemainingUnits']), needed)
+            cursor.execute(CONSUME_BATCH_SQL, [take, row['BatchID'], take])
+            allocations[row['BatchID']] = allocations.get(row['BatchID'], 0) + take
+            needed -= take
+            if needed == 0:
+                break
+        if needed:
+            raise Exception(f"Unexpired {blood_group} batches are {needed}mL short of AvailableUnits "
+                            f"(check with `flask expire-stock --check`).")
+
+    if request_id is not None:
+        cursor.executemany("INSERT INTO BatchAllocation (RequestID, BatchID, Units) VALUES (%s, %s, %s)",
+                           [(request_id, batch_id, take) for batch_id, take in allocations.items()])
+    allocated = list(allocations.items())
+    after_commit(lambda: stock_inventory.consume(allocated))
+    return allocated
+
+def expire_stock_batches(cursor, today=None):
+    """Expires every available batch whose expiry date has passed, in bulk, and takes their units
+    out of AvailableUnits. The caller commits. Returns {group: (units, batches)}.
+
+    AvailableUnits never goes below zero: if it holds fewer units than the expired batches (the
+    two have drifted apart), only what is there is removed and the shortfall is logged for
+    `flask expire-stock --check`.
+    """
+    today = today or datetime.now().date()
+    # Stock rows first, in the same order approvals lock them
+    cursor.execute(STOCK_ROWS_LOCK_SQL)
+    available = {row['BloodGroup']: int(row['AvailableUnits']) for row in cursor.fetchall()}
+    cursor.execute(EXPIRED_BATCH_TOTALS_SQL, [today])
+    expired = {row['BloodGroup']: (int(row['Units']), int(row['Batches'])) for row in cursor.fetchall()}
+    if not expired:
+        return {}
+    cursor.execute("""
+        UPDATE StockBatch SET ExpiredUnits = RemainingUnits, RemainingUnits = 0, Status = 'Expired', ExpiredOn = %s
+        WHERE Status = 'Available' AND ExpiresOn < %s
+    """, [today, today])
+    for blood_group, (units, _) in sorted(expired.items()):
+        removed = min(units, available.get(blood_group, 0))
+        if removed < units:
+            app.logger.warning("Expiry sweep: %s AvailableUnits is %dmL short of its expired batches (%dmL); "
+                               "run `flask expire-stock --check`", blood_group, units - removed, units)
+        if removed:
+            cursor.execute("""
+                UPDATE BloodStock SET AvailableUnits = AvailableUnits - %s
+                WHERE BloodGroup = %s AND AvailableUnits >= %s
+            """, [removed, blood_group, removed])
+            queue_event('stock', group=blood_group, delta=-removed, days={today.isoformat(): -removed})
+    g.stock_dirty = True
+    bump_data_versions(cursor, 'stock')
+    after_commit(lambda: stock_inventory.remove_expired(today))
+    return expired
+
+def inventory_drift(cursor):
+    """{group: (AvailableUnits, units in available batches)} for groups where they disagree."""
+    cursor.execute("""
+        SELECT s.BloodGroup, s.AvailableUnits, COALESCE(b.Units, 0) AS BatchUnits
+        FROM BloodStock s LEFT JOIN (
+            SELECT BloodGroup, SUM(RemainingUnits) AS Units FROM StockBatch
+            WHERE Status = 'Available' GROUP BY BloodGroup
+        ) b ON b.BloodGroup = s.BloodGroup
+    """)
+    return {row['BloodGroup']: (int(row['AvailableUnits']), int(row['BatchUnits']))
+            for row in cursor.fetchall() if int(row['AvailableUnits']) != int(row['BatchUnits'])}
+
+class BackgroundJob:
+    """Daemon thread calling run_once() every `interval_key` config seconds until stopped.
+
+    Each worker starts its own on its first request (not at import, so CLI runs don't); a
+    failed run is logged and counted, and the next tick tries again.
+    """
+    name = 'background-job'
+    interval_key = None
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats = {'runs': 0, 'errors': 0}
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if not self.is_running:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                self.app.logger.error("%s run failed: %s", self.name, e)
+            self._stop.wait(self.app.config.get(self.interval_key, 900))
+
+    def run_once(self):
+        raise NotImplementedError
+
+    def stats(self):
+        with self._lock:
+            return {'running': self.is_running, **self._stats}
+
+class ExpirySweeper(BackgroundJob):
+    """Expires lapsed unit batches once per worker per day, off the request path."""
+    name = 'expiry-sweeper'
+    interval_key = 'INVENTORY_SWEEP_INTERVAL'
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._swept_day = None
+
+    def run_once(self, today=None):
+        """Sweeps unless this worker already has today; returns {group: (units, batches)} or None."""
+        today = today or datetime.now().date()
+        if self._swept_day == today:
+            return None
+        with self.app.app_context():
+            conn, cursor = open_db()
+            try:
+                expired = expire_stock_batches(cursor, today)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+                conn.close()
+        self._swept_day = today
+        with self._lock:
+            self._stats['runs'] += 1
+        if expired:
+            self.app.logger.info("Expired unit batches: %s", expired)
+        return expired
+
+expiry_sweeper = ExpirySweeper(app)
+
+@app.before_request
+def start_expiry_sweeper():
+    """Starts this worker's expiry sweep thread on its first request."""
+    if app.config.get('INVENTORY_AUTO_SWEEP') and not expiry_sweeper.is_running:
+        expiry_sweeper.start()
+
+@app.cli.command('expire-stock')
+@click.option('--check', is_flag=True, help='Only report AvailableUnits that disagree with the batch totals.')
+def expire_stock_command(check):
+    """Expires lapsed unit batches (for cron) and reconciles AvailableUnits with the batches."""
+    conn, cursor = open_db()
+    try:
+        if not check:
+            expired = expire_stock_batches(cursor)
+            conn.commit()
+            for blood_group, (units, batches) in sorted(expired.items()):
+                click.echo(f"{blood_group}: expired {units}mL in {batches} batch(es)")
+            click.echo(f"Sweep done: {sum(b for _, b in expired.values())} batch(es) expired.")
+        drift = inventory_drift(cursor)
+        conn.rollback()
+        for blood_group, (available, batched) in sorted(drift.items()):
+            click.echo(f"{blood_group}: AvailableUnits={available} batches={batched}")
+        if drift:
+            raise click.ClickException("AvailableUnits disagrees with the unit batches.")
+        click.echo("AvailableUnits matches the unit batches.")
+    finally:
+        cursor.close()
+        conn.close()
+
+# --- Donor Recall ---
+def backfill_donor_eligibility(cursor, chunk_size=1000):
+    """Fills NextEligibleDate/IneligibleReason for donors that have neither, one keyset chunk at a time."""
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT DonorID, Age, Weight, LastDonationDate, ChronicDiseases FROM Donor
+            WHERE DonorID > %s AND NextEligibleDate IS NULL AND IneligibleReason IS NULL
+            ORDER BY DonorID LIMIT %s
+        """, [last_id, chunk_size])
+        donors = cursor.fetchall()
+        if not donors:
+            return
+        states = donor_eligibility_state(donors)
+        cursor.executemany("UPDATE Donor SET NextEligibleDate = %s, IneligibleReason = %s WHERE DonorID = %s",
+                           [(next_date, reason, donor['DonorID']) for donor, (next_date, reason) in zip(donors, states)])
+        last_id = donors[-1]['DonorID']
+
+def recall_group_priority(cursor):
+    """Blood groups ordered scarcest first: soonest projected stockout, then fewest units."""
+    stock_forecaster.ensure_loaded(cursor)
+    forecast = stock_forecaster.forecast(stock_cache.get_stock_levels(cursor))
+    ranked = sorted(forecast, key=lambda row: (row['days_to_stockout'] is None,
+                                               row['days_to_stockout'] or 0, row['AvailableUnits']))
+    return [row['BloodGroup'] for row in ranked]
+
+RECALL_DONORS_SQL = """
+    SELECT DonorID, Name, BloodGroup, Email, ContactNumber, NextEligibleDate FROM Donor
+    WHERE NextEligibleDate >= %s AND NextEligibleDate < %s ORDER BY NextEligibleDate, DonorID
+"""
 
-# --- Configuration ---
-app = Flask(__name__)
-# IMPORTANT: Use a complex key in production!
-app.config['SECRET_KEY'] = 'a_very_secure_secret_for_flask_sessions' 
+def build_recall_lists(cursor, start, days=1, batch_size=50):
+    """Donors whose wait ends in [start, start + days), as batches of at most batch_size
+    [{'group', 'priority', 'batch', 'donors'}], scarcest group first.
 
-# MySQL Database Configuration (!!! REPLACE WITH YOUR CREDENTIALS !!!)
-app.config['MYSQL_HOST'] = '127.0.0.1' 
-app.config['MYSQL_USER'] = 'root'
-app.config['MYSQL_PASSWORD'] = '2468@Sneha' 
-app.config['MYSQL_DB'] = 'blood_donation_db' 
-app.config['MYSQL_CURSORCLASS'] = 'DictCursor' 
+    One range scan on idx_donor_next_eligible; nobody else's eligibility is evaluated.
+    """
+    cursor.execute(RECALL_DONORS_SQL, [start, start + timedelta(days=days)])
+    by_group = {}
+    for row in cursor.fetchall():
+        by_group.setdefault(row['BloodGroup'], []).append(row)
+    batches = []
+    for priority, group in enumerate(recall_group_priority(cursor), start=1):
+        donors = by_group.get(group, [])
+        for offset in range(0, len(donors), batch_size):
+            batches.append({'group': group, 'priority': priority, 'batch': offset // batch_size + 1,
+                            'donors': donors[offset:offset + batch_size]})
+    return batches
 
-app.config['MYSQL_AUTOCOMMIT'] = False 
+RECALL_LIST_SQL = """
+    SELECT e.Priority, e.Batch, e.BloodGroup, d.DonorID, d.Name, d.Email, d.ContactNumber, d.NextEligibleDate
+    FROM RecallEntry e JOIN Donor d ON d.DonorID = e.DonorID
+    WHERE e.RecallDate = %s ORDER BY e.Priority, e.Batch, d.NextEligibleDate, d.DonorID
+"""
+RECALL_RUNS_SQL = "SELECT RecallDate, Donors, SentAt FROM RecallRun ORDER BY RecallDate DESC LIMIT %s"
 
-mysql = MySQL(app)
+def store_recall_lists(cursor, day, batches):
+    """Saves `day`'s lists as RecallEntry rows, in the transaction that claims the day."""
+    cursor.executemany("""
+        INSERT INTO RecallEntry (RecallDate, DonorID, BloodGroup, Priority, Batch) VALUES (%s, %s, %s, %s, %s)
+    """, [(day, donor['DonorID'], batch['group'], batch['priority'], batch['batch'])
+          for batch in batches for donor in batch['donors']])
 
-# --- Decorators and Utility Functions ---
+def load_recall_lists(cursor, day):
+    """The lists stored for `day`, in build_recall_lists' shape (donors as they are now)."""
+    cursor.execute(RECALL_LIST_SQL, [day])
+    batches = []
+    for row in cursor.fetchall():
+        if not batches or (batches[-1]['priority'], batches[-1]['batch']) != (row['Priority'], row['Batch']):
+            batches.append({'group': row['BloodGroup'], 'priority': row['Priority'], 'batch': row['Batch'], 'donors': []})
+        batches[-1]['donors'].append({key: row[key] for key in
+                                      ('DonorID', 'Name', 'BloodGroup', 'Email', 'ContactNumber', 'NextEligibleDate')})
+    return batches
 
-def login_required(role):
-    """A decorator to restrict access to certain roles."""
-    def wrapper(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            if not g.user or g.role != role:
-                flash(f"Access Denied. Please log in as a {role.capitalize()}.", 'danger')
-                return redirect(url_for(role + '_page', view='login'))
-            return f(*args, **kwargs)
-        return decorated_function
-    return wrapper
+def publish_recall_lists(day, batches):
+    event_broker.publish([{'type': 'recall', 'day': day.isoformat(), **batch} for batch in batches])
 
-def get_db_cursor():
-    """Initializes and returns a database cursor, handling connection errors."""
-    if not hasattr(g, 'cursor'):
-        try:
-            g.conn = mysql.connection
-            g.cursor = g.conn.cursor()
-        except Exception as e:
-            flash(f"Database connection failed. Check your MySQL settings. Error: {e}", 'danger')
-            return None
-    return g.cursor
+class RecallScheduler(BackgroundJob):
+    """Background thread that sends each day's recall lists once per deployment.
 
-@app.teardown_appcontext
-def close_db(e=None):
-    """Closes the database connection at the end of the request."""
-    # Close cursor if present
-    cursor = getattr(g, 'cursor', None)
-    if cursor is not None:
+    Every worker runs one, waking every RECALL_INTERVAL seconds; the first to insert the day's
+    RecallRun row stores the lists (RecallEntry) in the same transaction, then sends them as
+    'recall' events to the admins' /events streams. Admins who were not connected read them
+    at /admin/recalls.
+    """
+    name = 'recall-scheduler'
+    interval_key = 'RECALL_INTERVAL'
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._stats.update(sent_days=0, donors=0)
+
+    def run_once(self, day=None):
+        """Sends `day`'s lists unless some worker already has; returns the batches sent or None."""
+        day = day or datetime.now().date()
+        with self.app.app_context():
+            conn, cursor = open_db()
+            try:
+                cursor.execute("INSERT IGNORE INTO RecallRun (RecallDate, SentAt) VALUES (%s, UTC_TIMESTAMP())", [day])
+                if cursor.rowcount != 1:
+                    conn.rollback()
+                    return None
+                batches = build_recall_lists(cursor, day, batch_size=self.app.config.get('RECALL_BATCH_SIZE', 50))
+                donors = sum(len(batch['donors']) for batch in batches)
+                store_recall_lists(cursor, day, batches)
+                cursor.execute("UPDATE RecallRun SET Donors = %s WHERE RecallDate = %s", [donors, day])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+                conn.close()
+        publish_recall_lists(day, batches)
+        with self._lock:
+            self._stats['runs'] += 1
+            self._stats['sent_days'] += 1
+            self._stats['donors'] += donors
+        self.app.logger.info("Sent recall lists for %s: %d donors in %d batches", day, donors, len(batches))
+        return batches
+
+recall_scheduler = RecallScheduler(app)
+
+@app.before_request
+def start_recall_scheduler():
+    """Starts this worker's recall thread on its first request (not at import, so CLI runs don't)."""
+    if app.config.get('RECALL_SCHEDULER') and not recall_scheduler.is_running:
+        recall_scheduler.start()
+
+@app.cli.command('recall-donors')
+@click.option('--date', 'start', default=None, help='First day (YYYY-MM-DD); defaults to today.')
+@click.option('--days', default=1, show_default=True, help='Number of days to cover.')
+@click.option('--send', is_flag=True, help="Send the start day's lists now (once per day, like the scheduler).")
+@click.option('--resend', is_flag=True, help="Publish the start day's stored lists to admins again.")
+def recall_donors_command(start, days, send, resend):
+    """Prints the recall lists: donors whose 90-day wait ends in the period, scarcest group first."""
+    start = as_date(start) or datetime.now().date()
+    if send:
+        batches = recall_scheduler.run_once(start)
+        if batches is None:
+            raise click.ClickException(f"Recall lists for {start} were already sent; see /admin/recalls or use --resend.")
+    elif resend:
+        conn, cursor = open_db()
         try:
+            batches = load_recall_lists(cursor, start)
+        finally:
             cursor.close()
-        except Exception:
-            pass
-        if hasattr(g, 'cursor'):
-            delattr(g, 'cursor')
-
-    # Close connection if present
-    conn = getattr(g, 'conn', None)
-    if conn is not None:
+            conn.close()
+        if not batches:
+            raise click.ClickException(f"No recall lists stored for {start}.")
+        publish_recall_lists(start, batches)
+    else:
+        conn, cursor = open_db()
         try:
+            batches = build_recall_lists(cursor, start, days, app.config['RECALL_BATCH_SIZE'])
+        finally:
+            cursor.close()
             conn.close()
-        except Exception:
-            pass
-        if hasattr(g, 'conn'):
-            delattr(g, 'conn')
+    for batch in batches:
+        click.echo(f"#{batch['priority']} {batch['group']} batch {batch['batch']}: {len(batch['donors'])} donors")
+        for donor in batch['donors']:
+            click.echo(f"    {donor['NextEligibleDate']}  {donor['DonorID']:>7}  {donor['Name']}  "
+                       f"{donor['ContactNumber'] or '-'}  {donor['Email']}")
+    click.echo(f"{sum(len(b['donors']) for b in batches)} donors in {len(batches)} batches.")
 
-def update_blood_stock(blood_group, units_change, cursor, conn):
-    """Adds/removes units from BloodStock table. Prevent negative inventory and handle missing groups."""
-    try:
-        # Ensure units_change is an integer
-        units_change = int(units_change)
+# --- Dashboard Loaders (sync and async) ---
+DONOR_EXISTS_SQL = "SELECT 1 FROM Donor WHERE DonorID = %s"
+DONATION_HISTORY_SQL = "SELECT DonationDate, UnitsDonated, DonationCenter FROM Donation WHERE DonorID = %s ORDER BY DonationDate DESC"
 
-        # Check if the BloodGroup exists and read current stock
-        cursor.execute("SELECT AvailableUnits FROM BloodStock WHERE BloodGroup = %s", [blood_group])
-        row = cursor.fetchone()
+RECIPIENT_HISTORY_SQL = """
+    SELECT RequestID, BloodGroup, RequiredUnits, RequestDate, RequestStatus
+    FROM BloodRequest
+    WHERE RecipientID = %s
+    ORDER BY RequestDate DESC
+"""
 
-        if row is None:
-            # If group doesn't exist and we're trying to deduct, fail
-            if units_change < 0:
-                flash(f"Insufficient stock: {blood_group} does not exist.", 'danger')
-                return False
-            # Otherwise insert initial stock
-            cursor.execute("INSERT INTO BloodStock (BloodGroup, AvailableUnits) VALUES (%s, %s)", (blood_group, units_change))
-            return True
+def _admin_dashboard_pages(args):
+    """(after, limit) per admin dashboard section, from the query string cursors."""
+    page_sizes = app.config['ADMIN_PAGE_SIZES']
+    return {
+        'pending': (parse_request_cursor(args.get('pending')), page_sizes['pending']),
+        'approved': (parse_request_cursor(args.get('approved')), page_sizes['approved']),
+        # One extra row tells us whether a next page exists
+        'donors': (parse_id_cursor(args.get('donors')), page_sizes['donors'] + 1),
+        'recipients': (parse_id_cursor(args.get('recipients')), page_sizes['recipients']),
+    }
 
-        current_units = row.get('AvailableUnits') if isinstance(row, dict) else row[0]
-        new_units = current_units + units_change
-        if new_units < 0:
-            flash(f"Insufficient stock for {blood_group}. Available: {current_units}, required: {abs(units_change)}", 'danger')
-            return False
+def _admin_dashboard_result(blood_stock, pending, approved, donors, recipients, reports):
+    page_sizes = app.config['ADMIN_PAGE_SIZES']
+    pending, approved, recipients = pending or ([], None), approved or ([], None), recipients or ([], None)
+    next_cursors = {'pending': pending[1], 'approved': approved[1], 'donors': None, 'recipients': recipients[1]}
+    if len(donors) > page_sizes['donors']:
+        donors = donors[:page_sizes['donors']]
+        next_cursors['donors'] = donors[-1]['DonorID']
+    return {'blood_stock': blood_stock, 'pending_requests': pending[0], 'approved_requests': approved[0],
+            'all_donors': donors, 'all_recipients': recipients[0], 'reports': reports, 'next_cursors': next_cursors}
 
-        cursor.execute("UPDATE BloodStock SET AvailableUnits = %s WHERE BloodGroup = %s", (new_units, blood_group))
-        return True
-    except Exception as e:
-        flash(f"Stock update failed: {e}", 'danger')
-        return False
+def load_admin_dashboard(cursor, args, sections=None):
+    """Stock, one keyset page per section (filtering in SQL) and the report counters, one query at a time.
+    Given `sections`, only those are queried (see ADMIN_FRAGMENTS); the others come back empty."""
+    pages = _admin_dashboard_pages(args)
+    wanted = lambda *names: sections is None or any(name in sections for name in names)
+    return _admin_dashboard_result(
+        stock_cache.get_stock_levels(cursor) if wanted('stock', 'forecast') else [],
+        fetch_requests_page(cursor, 'Pending', *pages['pending']) if wanted('pending') else None,
+        fetch_requests_page(cursor, 'Approved', *pages['approved']) if wanted('approved') else None,
+        fetch_donors_with_eligibility(cursor, *pages['donors']) if wanted('donors') else [],
+        fetch_recipients_page(cursor, *pages['recipients']) if wanted('recipients') else None,
+        # Maintained incrementally; see bump_report_counters
+        fetch_report_summary(cursor) if wanted('reports') else {},
+    )
 
-def check_donor_eligibility(donor_data):
-    """Implements the eligibility logic (age, weight, last donation, medical)."""
-    age = donor_data.get('Age')
-    weight = donor_data.get('Weight')
-    last_donation_date = donor_data.get('LastDonationDate')
-    chronic_diseases = donor_data.get('ChronicDiseases', 'None')
-    
-    # 1. Age check
-    try:
-        age = int(age)
-        if not (18 <= age <= 65):
-            return False, "Age must be between 18 and 65."
-    except:
-        return False, "Invalid age provided."
-    
-    # 2. Weight check
-    try:
-        weight = float(weight)
-        if weight < 50:
-            return False, "Weight must be over 50 kg."
-    except:
-        # If weight is None/missing in DB, allow them to proceed to fill the form.
-        if weight is None or weight == 0:
-            return True, "Eligible to donate, but please update weight/details."
-        return False, "Invalid weight provided."
+async def _async_value(value):
+    return value
+
+async def load_admin_dashboard_async(args, sections=None):
+    """load_admin_dashboard() with the independent queries running concurrently on the async pool."""
+    pages = _admin_dashboard_pages(args)
+    (pending_after, pending_limit), (approved_after, approved_limit) = pages['pending'], pages['approved']
+    wanted = lambda *names: sections is None or any(name in sections for name in names)
+    fetch = lambda section, sql_and_params: async_mysql.fetchall(*sql_and_params) if wanted(section) else _async_value(None)
+    stock, pending_rows, approved_rows, donor_rows, recipient_rows, report_rows = await asyncio.gather(
+        stock_cache.get_stock_levels_async(async_mysql) if wanted('stock', 'forecast') else _async_value([]),
+        fetch('pending', _requests_page_sql('Pending', pending_after, pending_limit)),
+        fetch('approved', _requests_page_sql('Approved', approved_after, approved_limit)),
+        fetch('donors', _donors_sql(*pages['donors'])),
+        fetch('recipients', _recipients_page_sql(*pages['recipients'])),
+        fetch('reports', (REPORT_SUMMARY_SQL,)),
+    )
+    return _admin_dashboard_result(
+        stock,
+        _requests_page_result(pending_rows, pending_limit) if pending_rows is not None else None,
+        _requests_page_result(approved_rows, approved_limit) if approved_rows is not None else None,
+        _tag_donor_eligibility(donor_rows) if donor_rows is not None else [],
+        _recipients_page_result(recipient_rows, pages['recipients'][1]) if recipient_rows is not None else None,
+        _report_summary_result(report_rows) if report_rows is not None else {},
+    )
+
+async def load_recipient_dashboard_async(recipient_id):
+    """(request_history, blood_stock) for the recipient dashboard, fetched concurrently."""
+    return await asyncio.gather(
+        async_mysql.fetchall(RECIPIENT_HISTORY_SQL, [recipient_id]),
+        stock_cache.get_stock_levels_async(async_mysql),
+    )
 
-    # 3. Last Donation Date check (90 days wait)
-    if last_donation_date:
+class AsyncMySQL:
+    """aiomysql pool on one background event loop per worker process.
+
+    Flask runs each coroutine on a fresh event loop, which a pool cannot outlive, so the pool
+    stays on its own loop and fetchall() hands queries over to it from whichever loop awaits.
+    Each query checks out its own connection (autocommit), so concurrent queries really overlap.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._loop = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='async-mysql', daemon=True).start()
+                try:
+                    self._pool = asyncio.run_coroutine_threadsafe(self._create_pool(), loop).result(
+                        timeout=self.app.config.get('MYSQL_POOL_TIMEOUT', 5.0))
+                except Exception:
+                    loop.call_soon_threadsafe(loop.stop)
+                    raise
+                self._loop = loop
+        return self._loop
+
+    async def _create_pool(self):
+        aiomysql = importlib.import_module('aiomysql')
+        cfg = self.app.config
+        return await aiomysql.create_pool(
+            host=cfg.get('MYSQL_HOST', '127.0.0.1'), user=cfg.get('MYSQL_USER'), password=cfg.get('MYSQL_PASSWORD'),
+            db=cfg.get('MYSQL_DB'), minsize=1, maxsize=cfg.get('ASYNC_POOL_MAX_SIZE', 10),
+            pool_recycle=cfg.get('MYSQL_POOL_RECYCLE', 300), autocommit=True, cursorclass=aiomysql.DictCursor)
+
+    async def _fetchall(self, sql, params):
+        async with self._pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                return await cursor.fetchall()
+
+    async def fetchall(self, sql, params=None):
+        """Runs one query on the pool and returns its rows as dicts; awaitable from any event loop."""
+        loop = self._ensure_started()
+        stats = g.get('query_stats')
+        started = time.perf_counter()
         try:
-            last_date = last_donation_date # Assumes it's a date object from DB query
-            if isinstance(last_donation_date, str):
-                 last_date = datetime.strptime(last_donation_date, '%Y-%m-%d').date()
-            elif isinstance(last_donation_date, datetime):
-                last_date = last_donation_date.date()
-            
-            today = datetime.now().date()
-            if today < (last_date + timedelta(days=90)):
-                wait_days = 90 - (today - last_date).days
-                return False, f"Must wait {wait_days} more days since last donation."
-        except Exception:
-            # If the date format is wrong, we treat it as ineligible for safety
-            return False, "Error processing last donation date format."
+            rows = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._fetchall(sql, params or ()), loop))
+        finally:
+            if stats is not None:
+                stats.record_query(sql, time.perf_counter() - started)
+        if stats is not None:
+            stats.rows += len(rows)
+        return list(rows)
+
+    def stats(self):
+        if self._pool is None:
+            return {'started': False}
+        return {'started': True, 'size': self._pool.size, 'idle': self._pool.freesize, 'max_size': self._pool.maxsize}
+
+async_mysql = AsyncMySQL(app)
+ASYNC_READS_AVAILABLE = (importlib.util.find_spec('aiomysql') is not None
+                         and importlib.util.find_spec('asgiref') is not None)
+
+def async_reads_enabled():
+    """True if this request's loaders may use the async pool. The pool's autocommit connections
+    cannot see the request's uncommitted writes, and they skip LazyCursor's read-your-writes
+    routing, so pinned requests (see reads_pinned_to_primary) and ones that wrote stay sync."""
+    if not (app.config.get('ASYNC_READS') and ASYNC_READS_AVAILABLE):
+        return False
+    conn = g.get('conn')
+    return not reads_pinned_to_primary() and not (conn is not None and conn.wrote)
+
+def run_async(coroutine_function, *args):
+    """Runs an async loader to completion from a sync view (Flask's async bridge, via asgiref)."""
+    return app.ensure_sync(coroutine_function)(*args)
+
+if app.config['ASYNC_READS'] and not ASYNC_READS_AVAILABLE:
+    app.logger.warning("ASYNC_READS is set but aiomysql/asgiref are not installed; using the sync path.")
+
+# --- Dashboard Fragment Cache ---
+class FragmentCache:
+    """Per-worker LRU of rendered template fragments, bounded by entry count and total size.
+
+    Keys include the data versions a fragment was rendered from, so writes never purge
+    anything: they bump a version, and fragments for old versions age out of the LRU.
+    """
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (html, next-page cursor, build seconds)
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'build_seconds': 0.0, 'saved_seconds': 0.0}
+        self._sections = {}
+
+    def _count(self, section, outcome):
+        self._stats[outcome] += 1
+        counts = self._sections.setdefault(section, {'hits': 0, 'misses': 0})
+        counts[outcome] += 1
 
-    # 4. Chronic Diseases (simplified check)
-    if chronic_diseases and str(chronic_diseases).lower() not in ['none', 'n/a', '']:
-        return False, "Medical condition recorded. Please consult a doctor."
+    def get(self, key):
+        """(html, next-page cursor) for a key, or None; key[0] is the section name."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._count(key[0], 'misses')
+                return None
+            self._entries.move_to_end(key)
+            self._count(key[0], 'hits')
+            self._stats['saved_seconds'] += entry[2]
+            return entry[0], entry[1]
 
-    return True, "Eligible to donate."
+    def set(self, key, html, next_cursor, build_seconds):
+        size = len(html)
+        with self._lock:
+            self._stats['build_seconds'] += build_seconds
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (html, next_cursor, build_seconds)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {**self._stats, 'hit_rate': self._stats['hits'] / lookups if lookups else 0.0,
+                    'entries': len(self._entries), 'bytes': self._bytes,
+                    'sections': {name: dict(counts) for name, counts in self._sections.items()}}
+
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_MAX_ENTRIES'], app.config['FRAGMENT_CACHE_MAX_BYTES'])
+
+# Admin dashboard section -> (data versions it is rendered from, whether it also changes daily).
+# Each is a `<section>_section` macro in admin_page.html.
+ADMIN_FRAGMENTS = {
+    'reports': (('requests', 'donations'), False),
+    'stock': (('stock',), True),                              # expiry columns count from today
+    'forecast': (('stock',), True),                           # every stock change bumps 'stock'
+    'pending': (('requests', 'recipients', 'donors'), True),  # suggested donors must be eligible today
+    'approved': (('requests', 'recipients'), False),
+    'donors': (('donors',), True),                            # eligibility is relative to today
+    'recipients': (('recipients',), False),
+}
+
+def admin_fragment_key(section, versions, args, today):
+    names, daily = ADMIN_FRAGMENTS[section]
+    return (section, tuple(versions[name] for name in names), today.toordinal() if daily else None,
+            args.get(section) if section in app.config['ADMIN_PAGE_SIZES'] else None)
+
+def _admin_fragment_context(cursor, section, data, today):
+    """Keyword arguments for one section's macro, from load_admin_dashboard() data."""
+    alert_days = app.config['FORECAST_ALERT_DAYS']
+    if section == 'stock':
+        stock_inventory.ensure_loaded(cursor)
+        return {'blood_stock': data['blood_stock'], 'expiry': stock_inventory.expiry_summary(today, alert_days),
+                'alert_days': alert_days}
+    if section == 'forecast':
+        stock_forecaster.ensure_loaded(cursor)
+        return {'forecast': stock_forecaster.forecast(data['blood_stock'], alert_days)}
+    if section == 'pending':
+        return {'pending_requests': suggest_donor_matches(cursor, data['pending_requests'])}
+    name = {'reports': 'reports', 'approved': 'approved_requests', 'donors': 'all_donors',
+            'recipients': 'all_recipients'}[section]
+    return {name: data[name]}
+
+def render_admin_fragments(cursor, args):
+    """({section: rendered HTML}, {section: next-page cursor}) for the admin dashboard.
+
+    One DataVersion read decides which cached sections are still current; only the others are
+    queried (sync or async path) and rendered. Build time is the section's render time plus an
+    even share of the load, and is what a later hit reports as saved.
+    """
+    today = datetime.now().date()
+    enabled = app.config.get('FRAGMENT_CACHE_ENABLED')
+    versions = fetch_data_versions(cursor, DATA_VERSION_NAMES)[0] if enabled else None
+    fragments, next_cursors, missing = {}, {}, {}
+    for section in ADMIN_FRAGMENTS:
+        key = admin_fragment_key(section, versions, args, today) if enabled else None
+        cached = fragment_cache.get(key) if enabled else None
+        if cached is None:
+            missing[section] = key
+        else:
+            fragments[section], next_cursors[section] = cached
+    if not missing:
+        return fragments, next_cursors
+
+    started = time.perf_counter()
+    if async_reads_enabled():
+        data = run_async(load_admin_dashboard_async, args, missing)
+    else:
+        data = load_admin_dashboard(cursor, args, missing)
+    load_share = (time.perf_counter() - started) / len(missing)
+    for section, key in missing.items():
+        started = time.perf_counter()
+        macro = get_template_attribute('admin_page.html', f'{section}_section')
+        fragments[section] = macro(**_admin_fragment_context(cursor, section, data, today))
+        next_cursors[section] = data['next_cursors'].get(section)
+        if enabled:
+            fragment_cache.set(key, fragments[section], next_cursors[section],
+                               load_share + time.perf_counter() - started)
+    return fragments, next_cursors
 
 # --- Before Request Middleware ---
+# Narrow projections for g.user: only what templates and views read (never Password)
+USER_PROFILE_QUERIES = {
+    'donor': """SELECT DonorID, Name, Age, Gender, BloodGroup, ContactNumber, Email, Address,
+                       Weight, ChronicDiseases, LastDonationDate
+                FROM Donor WHERE DonorID = %s""",
+    'recipient': "SELECT RecipientID, Name, BloodGroup, Email FROM Recipient WHERE RecipientID = %s",
+    'admin': "SELECT AdminID, Username FROM AdminLogin WHERE AdminID = %s",
+}
+
+# Endpoints that never read g.user (no template render, no login check)
+USER_OPTIONAL_ENDPOINTS = {'static', 'logout', 'metrics', 'api_stock', 'events'}
+
 @app.before_request
 def load_logged_in_user():
     """Load user data into Flask's global context (g)."""
@@ -191,33 +3276,39 @@ def load_logged_in_user():
     g.role = session.get('user_role')
     user_id = session.get('user_id')
 
-    if user_id and g.role:
-        cursor = get_db_cursor()
-        if cursor is None: return 
+    if request.endpoint in USER_OPTIONAL_ENDPOINTS or g.role not in USER_PROFILE_QUERIES:
+        return
 
-        table = g.role.capitalize()
-        
-        # Adjust table name for AdminLogin
-        if g.role == 'admin':
-            table = 'AdminLogin'
-            cursor.execute(f"SELECT * FROM {table} WHERE AdminID = %s", [user_id])
-        else:
-            # Note: We use string formatting here for table name as it's not user input
-            cursor.execute(f"SELECT * FROM {table} WHERE {table}ID = %s", [user_id])
-        
-        g.user = cursor.fetchone()
+    if user_id:
+        g.user = user_cache.get(g.role, user_id)
+        if g.user is not None:
+            return
+
+        try:
+            cursor = get_db_cursor()
+            cursor.execute(USER_PROFILE_QUERIES[g.role], [user_id])
+            g.user = cursor.fetchone()
+        except DatabaseUnavailable:
+            # Other views fall back to the homepage, which renders without the profile
+            if request.endpoint != 'homepage':
+                raise
+            return
+        if g.user:
+            user_cache.set(g.role, user_id, g.user)
 
 # --- 1. Homepage Route ---
 @app.route('/')
 def homepage():
     """Entry point: shows roles and blood stock summary."""
     cursor = get_db_cursor()
-    if cursor is None: 
-        return render_template('homepage.html', stock_levels=[], db_error=True)
     
     try:
-        cursor.execute("SELECT BloodGroup, AvailableUnits FROM BloodStock")
-        stock_levels = cursor.fetchall()
+        if async_reads_enabled():
+            stock_levels = run_async(stock_cache.get_stock_levels_async, async_mysql)
+        else:
+            stock_levels = stock_cache.get_stock_levels(cursor)
+    except DatabaseUnavailable:
+        return render_template('homepage.html', stock_levels=[], db_error=True)
     except Exception:
         flash("Database query failed. Please ensure the MySQL server is running.", 'danger')
         stock_levels = []
@@ -229,7 +3320,6 @@ def homepage():
 def donor_page():
     view = request.args.get('view', 'login') 
     cursor = get_db_cursor()
-    if cursor is None: return redirect(url_for('homepage'))
     conn = g.conn
     today = datetime.now().date().strftime('%Y-%m-%d')
 
@@ -247,16 +3337,23 @@ def donor_page():
                 updated_contact = request.form['contact']
                 updated_address = request.form['address']
                 updated_diseases = request.form.get('diseases', 'None')
+
+                # g.user may be a cached row; lock the donor so two concurrent submissions
+                # cannot both pass the 90-day check against the same stale LastDonationDate.
+                cursor.execute("SELECT LastDonationDate FROM Donor WHERE DonorID = %s FOR UPDATE",
+                               [g.user['DonorID']])
+                locked_donor = cursor.fetchone() or {}
                 
                 current_eligibility_check = {
                     'Age': updated_age,
                     'Weight': updated_weight,
-                    'LastDonationDate': g.user.get('LastDonationDate'),
+                    'LastDonationDate': locked_donor.get('LastDonationDate'),
                     'ChronicDiseases': updated_diseases
                 }
                 is_eligible, eligibility_reason = check_donor_eligibility(current_eligibility_check)
                 
                 if not is_eligible:
+                    conn.rollback()
                     flash(f'Donation failed. You are currently ineligible: {eligibility_reason}', 'danger')
                     return redirect(url_for('donor_page', view='dashboard'))
 
@@ -275,15 +3372,27 @@ def donor_page():
 
                 cursor.execute("INSERT INTO Donation (DonorID, DonationDate, UnitsDonated, DonationCenter) VALUES (%s, %s, %s, %s)", 
                                  (g.user['DonorID'], date_str, units, hospital))
+                donation_id = cursor.lastrowid
+                bump_report_counters(cursor, {'total_donations': units})
                 
-                # 4. Update Donor's LastDonationDate
-                cursor.execute("UPDATE Donor SET LastDonationDate = %s WHERE DonorID = %s", (date_str, g.user['DonorID']))
+                # 4. Update Donor's LastDonationDate and the stored eligibility derived from it
+                next_eligible, ineligible_reason = donor_eligibility_state([{
+                    'Age': updated_age, 'Weight': updated_weight,
+                    'LastDonationDate': date_str, 'ChronicDiseases': updated_diseases}])[0]
+                cursor.execute("""
+                    UPDATE Donor SET LastDonationDate = %s, NextEligibleDate = %s, IneligibleReason = %s
+                    WHERE DonorID = %s
+                """, (date_str, next_eligible, ineligible_reason, g.user['DonorID']))
+                bump_data_versions(cursor, 'donors')
                 
                 # 5. Update Blood Stock
-                if not update_blood_stock(updated_blood_group, units, cursor, conn):
+                if not update_blood_stock(updated_blood_group, units, cursor, conn,
+                                          collected_on=date_str, donation_id=donation_id):
                     raise Exception("Failed to update blood stock.")
 
                 conn.commit()
+                user_cache.invalidate('donor', g.user['DonorID'])
+                donor_match_index.update_donor(g.user['DonorID'], updated_blood_group, next_eligible)
                 flash('Donation recorded and stock updated! Thank you.', 'success')
                 return redirect(url_for('donor_page', view='dashboard'))
             except Exception as e:
@@ -297,13 +3406,13 @@ def donor_page():
         # Recalculate eligibility with the currently loaded data for the display
         donor_data_for_display = {
             **donor, 
-            'Weight': donor.get('Weight') or 70, 
+            'Weight': stored_donor_weight(donor),
             'ChronicDiseases': donor.get('ChronicDiseases') or 'None'
         }
         eligible_for_display, reason_for_display = check_donor_eligibility(donor_data_for_display)
 
         # Fetch History
-        cursor.execute("SELECT DonationDate, UnitsDonated, DonationCenter FROM Donation WHERE DonorID = %s ORDER BY DonationDate DESC", [donor['DonorID']])
+        cursor.execute(DONATION_HISTORY_SQL, [donor['DonorID']])
         donation_history = cursor.fetchall()
         
         return render_template('donor_page.html', view='dashboard', donor=donor, today=today, eligibility_status=f"Status: {'Eligible' if eligible_for_display else 'Ineligible'}. Reason: {reason_for_display}", donation_history=donation_history)
@@ -315,22 +3424,18 @@ def donor_page():
             email = request.form['email']
             password = request.form['password'] # Must match HTML form input name
             
-            # 1. Attempt Login
-            cursor.execute("SELECT * FROM Donor WHERE Email = %s AND Password = %s", [email, password])
-            donor = cursor.fetchone()
+            # 1. Attempt Login (one lookup also tells us whether the email is registered)
+            donor_id, email_registered = authenticate('donor', email, password, cursor, conn)
 
-            if donor:
+            if donor_id:
                 # SUCCESS: Existing user found and logged in
-                session['user_id'] = donor['DonorID']
+                session['user_id'] = donor_id
                 session['user_role'] = 'donor'
                 flash('Login successful! Welcome back.', 'success')
                 return redirect(url_for('donor_page', view='dashboard'))
 
-            # 2. If Login failed, check if email is registered (for feedback)
-            cursor.execute("SELECT DonorID FROM Donor WHERE Email = %s", [email])
-            existing_email_record = cursor.fetchone()
-
-            if existing_email_record:
+            # 2. If Login failed, give feedback when the email is registered
+            if email_registered:
                 # Email found, but password was wrong.
                 flash('Invalid Password for the registered email. Please try again.', 'danger')
                 return redirect(url_for('donor_page', view='login'))
@@ -342,12 +3447,12 @@ def donor_page():
                 
                 # Assumes Donor table has Password, Weight, ChronicDiseases columns
                 cursor.execute("""
-                    INSERT INTO Donor (Name, Age, Gender, BloodGroup, ContactNumber, Email, Address, Password, Weight, LastDonationDate, ChronicDiseases)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    INSERT INTO Donor (Name, Age, Gender, BloodGroup, ContactNumber, Email, Address, Password, Weight, LastDonationDate, ChronicDiseases, NextEligibleDate)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """, (
-                    name, 25, 'Other', 'O+', 'N/A', email, 'Unknown', password, 70, None, 'None'
+                    name, 25, 'Other', 'O+', 'N/A', email, 'Unknown', password_hasher.hash(password), 70, None, 'None', today
                 ))
-                
+                bump_data_versions(cursor, 'donors')
                 conn.commit()
                 
                 # Fetch the newly created user ID
@@ -356,6 +3461,7 @@ def donor_page():
                 
                 session['user_id'] = new_donor['DonorID']
                 session['user_role'] = 'donor'
+                user_cache.invalidate('donor', new_donor['DonorID'])
                 
                 flash('Account created automatically! Please fill in all details during your first donation.', 'success')
                 return redirect(url_for('donor_page', view='dashboard'))
@@ -373,7 +3479,6 @@ def donor_page():
 def recipient_page():
     view = request.args.get('view', 'login') 
     cursor = get_db_cursor()
-    if cursor is None: return redirect(url_for('homepage'))
     conn = g.conn
     
     if g.user and g.role == 'recipient':
@@ -394,6 +3499,8 @@ def recipient_page():
                     INSERT INTO BloodRequest (RecipientID, BloodGroup, RequiredUnits, RequestStatus, Hospital, Reason)
                     VALUES (%s, %s, %s, 'Pending', %s, %s)
                 """, (recipient['RecipientID'], blood_group, units, hospital, reason))
+                bump_report_counters(cursor, {'requests_Pending': 1})
+                queue_request_event(cursor.lastrowid, recipient['RecipientID'], 'Pending')
                 
                 conn.commit()
                 flash('Blood request submitted successfully and sent to Admin for review!', 'success')
@@ -404,18 +3511,14 @@ def recipient_page():
                 return redirect(url_for('recipient_page', view='dashboard'))
 
         # GET: Dashboard View
-        # ... (Dashboard view logic remains unchanged)
-        cursor.execute("""
-            SELECT RequestID, BloodGroup, RequiredUnits, RequestDate, RequestStatus 
-            FROM BloodRequest 
-            WHERE RecipientID = %s 
-            ORDER BY RequestDate DESC
-        """, [recipient['RecipientID']])
-        request_history = cursor.fetchall()
-        
-        # Fetch current stock for reference
-        cursor.execute("SELECT BloodGroup, AvailableUnits FROM BloodStock")
-        blood_stock = cursor.fetchall()
+        if async_reads_enabled():
+            request_history, blood_stock = run_async(load_recipient_dashboard_async, recipient['RecipientID'])
+        else:
+            cursor.execute(RECIPIENT_HISTORY_SQL, [recipient['RecipientID']])
+            request_history = cursor.fetchall()
+
+            # Fetch current stock for reference
+            blood_stock = stock_cache.get_stock_levels(cursor)
 
         return render_template('recipient_page.html', view='dashboard', recipient=recipient, request_history=request_history, blood_stock=blood_stock)
 
@@ -446,8 +3549,9 @@ def recipient_page():
                 cursor.execute("""
                     INSERT INTO Recipient (Name, Age, Gender, BloodGroup, ContactNumber, Email, Address, Password)
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """, (name, age, gender, blood_group, contact, registration_email, address, registration_password))
-                
+                """, (name, age, gender, blood_group, contact, registration_email, address,
+                      password_hasher.hash(registration_password)))
+                bump_data_versions(cursor, 'recipients')
                 conn.commit()
                 
                 # Fetch the newly created user ID
@@ -456,26 +3560,23 @@ def recipient_page():
                 
                 session['user_id'] = new_recipient['RecipientID']
                 session['user_role'] = 'recipient'
+                user_cache.invalidate('recipient', new_recipient['RecipientID'])
                 flash('Registration successful! You are now logged in.', 'success')
                 return redirect(url_for('recipient_page', view='dashboard'))
             
             # 2. Attempt Login (Happens when view='login' is posted)
 
             # 1. Attempt Login with full credentials
-            cursor.execute("SELECT * FROM Recipient WHERE Email = %s AND Password = %s", [initial_email, initial_password])
-            recipient = cursor.fetchone()
+            recipient_id, existing_user = authenticate('recipient', initial_email, initial_password, cursor, conn)
 
-            if recipient:
+            if recipient_id:
                 # Login successful
-                session['user_id'] = recipient['RecipientID']
+                session['user_id'] = recipient_id
                 session['user_role'] = 'recipient'
                 flash('Login successful! You can now make a blood request.', 'success')
                 return redirect(url_for('recipient_page', view='dashboard'))
             
-            # 2. Login Failed: Check if user exists by email only
-            cursor.execute("SELECT RecipientID FROM Recipient WHERE Email = %s", [initial_email])
-            existing_user = cursor.fetchone()
-
+            # 2. Login Failed: the same lookup told us whether the email exists
             if existing_user:
                 # User exists, but password was wrong
                 flash('Invalid Password for existing account. Please try again.', 'danger')
@@ -502,7 +3603,6 @@ def admin_page():
     # Always default view to 'login' for URL/GET requests
     view = request.args.get('view', 'login') 
     cursor = get_db_cursor()
-    if cursor is None: return redirect(url_for('homepage'))
     conn = g.conn
 
     # 1. Check for Authentication
@@ -514,29 +3614,34 @@ def admin_page():
                 username = request.form['username']
                 password = request.form['password']
                 
-                cursor.execute("SELECT AdminID FROM AdminLogin WHERE Username = %s AND Password = %s", (username, password))
-                admin = cursor.fetchone()
+                try:
+                    admin_id, username_taken = authenticate('admin', username, password, cursor, conn)
+                except Exception as e:
+                    conn.rollback()
+                    flash(f"Login failed: {e}", 'danger')
+                    return redirect(url_for('admin_page', view='login'))
 
-                if admin:
-                    session['user_id'] = admin['AdminID']
+                if admin_id:
+                    session['user_id'] = admin_id
                     session['user_role'] = 'admin'
                     flash('Admin login successful!', 'success')
                     # Redirect after successful login
                     return redirect(url_for('admin_page', view='dashboard')) 
                 else:
                     # Handle auto-creation/login failure for new/invalid user
-                    cursor.execute("SELECT AdminID FROM AdminLogin WHERE Username = %s", [username])
-                    if cursor.fetchone():
+                    if username_taken:
                         flash('Invalid Password', 'danger')
                     else:
                         try:
                             # Auto-create Admin (simple registration)
-                            cursor.execute("INSERT INTO AdminLogin (Username, Password) VALUES (%s, %s)", (username, password))
+                            cursor.execute("INSERT INTO AdminLogin (Username, Password) VALUES (%s, %s)",
+                                           (username, password_hasher.hash(password)))
                             conn.commit()
                             cursor.execute("SELECT AdminID FROM AdminLogin WHERE Username = %s", [username])
                             new_admin = cursor.fetchone()
                             session['user_id'] = new_admin['AdminID']
                             session['user_role'] = 'admin'
+                            user_cache.invalidate('admin', new_admin['AdminID'])
                             flash('New Admin record created and logged in!', 'success')
                             return redirect(url_for('admin_page', view='dashboard'))
                         except Exception as e:
@@ -559,8 +3664,22 @@ def admin_page():
     # --- POST: Admin Action Handlers (Request Management) ---
     if request.method == 'POST':
         try:
-            # 1. Request Management
-            if 'request_action' in request.form:
+            # 1. Bulk Request Management (many IDs, one transaction)
+            if 'bulk_action' in request.form:
+                req_ids = request.form.getlist('request_ids')
+                if not req_ids:
+                    flash('Select at least one request.', 'danger')
+                    return redirect(url_for('admin_page', view='dashboard'))
+                outcomes = bulk_request_action(req_ids, request.form['bulk_action'], cursor, conn)
+                succeeded = [str(req_id) for req_id, ok, _ in outcomes if ok]
+                if succeeded:
+                    flash(f"{request.form['bulk_action']}: requests {', '.join(succeeded)}.", 'success')
+                for req_id, ok, message in outcomes:
+                    if not ok:
+                        flash(f'Request {req_id}: {message}', 'danger')
+
+            # 2. Single Request Management
+            elif 'request_action' in request.form:
                 req_id = request.form['request_id']
                 action = request.form['request_action']
                 
@@ -568,38 +3687,36 @@ def admin_page():
                 req_id_int = int(req_id)
                 
                 if action == 'Approve':
-                    # Use req_id_int for query parameter
-                    cursor.execute("SELECT RequiredUnits, BloodGroup, RequestStatus FROM BloodRequest WHERE RequestID = %s", [req_id_int])
-                    request_details = cursor.fetchone()
-                    
-                    if request_details and request_details['RequestStatus'] == 'Pending':
-                        units_needed = request_details['RequiredUnits']
-                        blood_group = request_details['BloodGroup']
+                    _, message, category = approve_blood_request(req_id_int, cursor, conn)
+                    flash(message, category)
                         
-                        # Deduct stock upon approval (THIS IS THE DEDUCTION LOGIC)
-                        if update_blood_stock(blood_group, -units_needed, cursor, conn):
-                            # Use list for query parameters: [status, id]
-                            cursor.execute("UPDATE BloodRequest SET RequestStatus = %s WHERE RequestID = %s", ['Approved', req_id_int])
-                            flash(f'Request {req_id} Approved. {units_needed}mL of {blood_group} deducted from stock (Reserved).', 'success')
-                        else:
-                            flash(f'Approval failed: Insufficient stock of {blood_group} ({units_needed}mL needed).', 'danger')
+                elif action == 'Match':
+                    donor_id = int(request.form['donor_id'])
+                    if record_donor_match(req_id_int, donor_id, cursor):
+                        flash(f'Donor {donor_id} matched to Request {req_id}.', 'success')
                     else:
-                        flash('Only Pending requests can be Approved.', 'danger')
-                        
+                        flash(f'Donor {donor_id} cannot be matched to Request {req_id}: the request must be Pending '
+                              f'and the donor compatible with its blood group and eligible today.', 'danger')
+
                 elif action == 'Reject':
                      # Rejection logic (no stock change needed)
                      # Use list for query parameters: [status, id]
+                    cursor.execute("SELECT RecipientID, RequestStatus FROM BloodRequest WHERE RequestID = %s FOR UPDATE", [req_id_int])
+                    request_details = cursor.fetchone()
                     cursor.execute("UPDATE BloodRequest SET RequestStatus = %s WHERE RequestID = %s", ['Rejected', req_id_int])
+                    if request_details and request_details['RequestStatus'] != 'Rejected':
+                        record_status_transition(cursor, request_details['RequestStatus'], 'Rejected')
+                        queue_request_event(req_id_int, request_details['RecipientID'], 'Rejected')
                     flash(f'Request {req_id} Rejected.', 'info')
 
                 elif action == 'Complete':
                     # Update status to Completed. Stock deduction already occurred at Approval.
-                    cursor.execute("SELECT RequestStatus FROM BloodRequest WHERE RequestID = %s", [req_id_int])
-                    request_details = cursor.fetchone()
-                    
-                    if request_details and request_details['RequestStatus'] == 'Approved':
-                        # Use list for query parameters: [status, id]
-                        cursor.execute("UPDATE BloodRequest SET RequestStatus = %s WHERE RequestID = %s", ['Completed', req_id_int])
+                    cursor.execute("UPDATE BloodRequest SET RequestStatus = %s WHERE RequestID = %s AND RequestStatus = %s",
+                                   ['Completed', req_id_int, 'Approved'])
+                    if cursor.rowcount == 1:
+                        record_status_transition(cursor, 'Approved', 'Completed')
+                        cursor.execute("SELECT RecipientID FROM BloodRequest WHERE RequestID = %s", [req_id_int])
+                        queue_request_event(req_id_int, cursor.fetchone()['RecipientID'], 'Completed')
                         flash(f'Request {req_id} Completed. Stock was previously reserved upon Approval.', 'success')
                     else:
                         flash('Cannot complete a request that is not Approved.', 'danger')
@@ -616,65 +3733,332 @@ def admin_page():
             return redirect(url_for('admin_page', view='dashboard'))
 
 
-    # --- GET: Dashboard Data Fetching ---
-    
-    # 1. Fetch Blood Stock
-    cursor.execute("SELECT BloodGroup, AvailableUnits FROM BloodStock")
-    blood_stock = cursor.fetchall()
-    
-    # 2. Fetch Requests
-    cursor.execute("""
-        SELECT br.*, r.Name AS RecipientName 
-        FROM BloodRequest br JOIN Recipient r ON br.RecipientID = r.RecipientID 
-        ORDER BY br.RequestDate DESC
-    """)
-    all_requests = cursor.fetchall()
+    # --- GET: Dashboard Data Fetching (unchanged sections come from the fragment cache) ---
+    fragments, next_cursors = render_admin_fragments(cursor, request.args)
 
-    pending_requests = [req for req in all_requests if req['RequestStatus'] == 'Pending']
-    approved_requests = [req for req in all_requests if req['RequestStatus'] == 'Approved']
-    
-    # 3. Fetch Donors and Recipients
-    cursor.execute("SELECT DonorID, Name, BloodGroup, Email, LastDonationDate FROM Donor")
-    all_donors = cursor.fetchall()
-    
-    # Calculate eligibility for Admin view
-    for donor in all_donors:
-        # Need to refetch all details for eligibility check (or assume defaults)
-        cursor.execute("SELECT * FROM Donor WHERE DonorID = %s", [donor['DonorID']])
-        full_donor_data = cursor.fetchone()
-        
-        # Ensure required keys exist with defaults for safety in check_donor_eligibility
-        donor_data_for_check = {
-            **full_donor_data,
-            'Weight': full_donor_data.get('Weight') or 70.0, 
-            'ChronicDiseases': full_donor_data.get('ChronicDiseases') or 'None',
-            'LastDonationDate': full_donor_data.get('LastDonationDate')
+    # Next/first page links keep the other sections' cursors untouched
+    page_links = {}
+    for section, next_cursor in next_cursors.items():
+        if section not in app.config['ADMIN_PAGE_SIZES']:
+            continue
+        args = {k: v for k, v in request.args.items() if k != section}
+        page_links[section] = {
+            'next': url_for('admin_page', **{**args, section: next_cursor}) if next_cursor is not None else None,
+            'first': url_for('admin_page', **args) if request.args.get(section) else None,
         }
-        
-        eligible, _ = check_donor_eligibility(donor_data_for_check)
-        donor['EligibilityStatus'] = 'Eligible' if eligible else 'Ineligible'
 
-    cursor.execute("SELECT RecipientID, Name, BloodGroup, ContactNumber FROM Recipient")
-    all_recipients = cursor.fetchall()
+    return render_template('admin_page.html', view=view, fragments=fragments, page_links=page_links)
 
-    # 4. Reporting Summary
-    cursor.execute("SELECT SUM(UnitsDonated) AS total_donations FROM Donation")
-    total_donations = cursor.fetchone()['total_donations'] or 0
-    
-    cursor.execute("SELECT RequestStatus, COUNT(*) as count FROM BloodRequest GROUP BY RequestStatus")
-    request_counts_raw = cursor.fetchall()
-    request_counts = {item['RequestStatus']: item['count'] for item in request_counts_raw}
+@app.route('/admin/import', methods=['POST'])
+@login_required('admin')
+def admin_import_donations():
+    """Bulk donation import from an uploaded CSV/JSONL file (see IMPORT_FIELDS)."""
+    upload = request.files.get('import_file')
+    if not upload or not upload.filename:
+        flash('Choose a CSV or JSONL file to import.', 'danger')
+        return redirect(url_for('admin_page', view='dashboard'))
 
-    reports = {
-        'total_donations': total_donations,
-        'total_requests': sum(request_counts.values()),
-        'pending_requests': request_counts.get('Pending', 0),
-        'approved_requests': request_counts.get('Approved', 0),
-        'rejected_requests': request_counts.get('Rejected', 0),
-        'completed_requests': request_counts.get('Completed', 0),
-    }
+    fmt = 'jsonl' if upload.filename.lower().endswith(('.jsonl', '.json')) else 'csv'
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    rejects = []
+
+    def on_reject(line_no, reason):
+        # Keep only a sample for the flash message; the count covers the rest
+        if len(rejects) < 20:
+            rejects.append(f"line {line_no}: {reason}")
+
+    cursor = get_db_cursor()
+    counts = import_donations(iter_import_rows(stream, fmt), cursor, g.conn, on_reject,
+                              chunk_size=app.config['IMPORT_CHUNK_SIZE'])
+    flash(f"Imported {counts['accepted']} donations; {counts['rejected']} rows rejected.",
+          'success' if not counts['rejected'] else 'warning')
+    if rejects:
+        flash('Rejected rows: ' + '; '.join(rejects) + (' ...' if counts['rejected'] > len(rejects) else ''), 'warning')
+    return redirect(url_for('admin_page', view='dashboard'))
+
+@app.route('/admin/recalls')
+@login_required('admin')
+def admin_recalls():
+    """A day's stored recall lists (?date=, default today) and the recent recall runs."""
+    try:
+        day = as_date(request.args.get('date')) or datetime.now().date()
+    except ValueError:
+        flash('Dates must be YYYY-MM-DD; showing today.', 'danger')
+        day = datetime.now().date()
+    cursor = get_db_cursor()
+    cursor.execute(RECALL_RUNS_SQL, [14])
+    runs = cursor.fetchall()
+    return render_template('admin_page.html', view='recalls', day=day, runs=runs,
+                           batches=load_recall_lists(cursor, day))
+
+@app.route('/admin/export/<dataset>.<fmt>')
+@login_required('admin')
+def admin_export(dataset, fmt):
+    """Streams a full-history export (donors, donations or requests) as CSV or JSON."""
+    if dataset not in EXPORT_QUERIES or fmt not in ('csv', 'json'):
+        flash('Unknown export.', 'danger')
+        return redirect(url_for('admin_page', view='dashboard'))
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/json'
+    return Response(stream_with_context(export_rows(dataset, fmt)), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={dataset}.{fmt}'})
+
+# --- 5. JSON API ---
+# Compact JSON for polling clients. Each response carries an ETag and Last-Modified taken from
+# the DataVersion counters it depends on, so an unchanged resource costs one primary-key read
+# and a 304 with no body.
+def api_login_required(*roles):
+    """Like login_required, but answers 401 JSON instead of redirecting to a login form."""
+    def wrapper(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not g.user or g.role not in roles:
+                return jsonify({'error': 'authentication required'}), 401
+            return f(*args, **kwargs)
+        return decorated_function
+    return wrapper
+
+def conditional_json(cursor, names, scope, build):
+    """Returns 304 if the client's validators match the current data versions, else the JSON of
+    build(versions), read in the same snapshot as those {name: version} counters.
+
+    `scope` distinguishes representations that share versions (user, filters, page).
+    """
+    versions, last_modified = fetch_data_versions(cursor, names)
+    etag = f"{scope}:" + '.'.join(str(versions[name]) for name in names)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = since is not None and last_modified is not None and last_modified.replace(microsecond=0) <= since
+    if not_modified:
+        response = Response(status=304)
+    else:
+        response = Response(json.dumps(build(versions), separators=(',', ':'), default=_json_value), mimetype='application/json')
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache' if g.user else 'no-cache'
+    return response
+
+@app.route('/api/stock')
+def api_stock():
+    """Available units per blood group."""
+    cursor = get_db_cursor()
+    def build(versions):
+        # Read in the same snapshot as the version, not from stock_cache, so body and ETag agree
+        cursor.execute(STOCK_LEVELS_SQL + " ORDER BY BloodGroup")
+        return {'stock': {row['BloodGroup']: int(row['AvailableUnits']) for row in cursor.fetchall()},
+                'version': versions['stock']}
+    return conditional_json(cursor, ('stock',), 'stock', build)
+
+@app.route('/api/requests')
+@api_login_required('admin', 'recipient')
+def api_requests():
+    """Admins: one keyset page of requests by ?status= (default Pending), ?after=, ?limit=.
+    Recipients: their own requests."""
+    cursor = get_db_cursor()
+    if g.role == 'recipient':
+        recipient_id = g.user['RecipientID']
+        def build(versions):
+            cursor.execute(RECIPIENT_HISTORY_SQL, [recipient_id])
+            return {'requests': cursor.fetchall(), 'version': versions['requests']}
+        return conditional_json(cursor, ('requests',), f'requests-r{recipient_id}', build)
+
+    status = request.args.get('status', 'Pending')
+    if status not in REQUEST_STATUSES:
+        return jsonify({'error': f"status must be one of {', '.join(REQUEST_STATUSES)}"}), 400
+    after = parse_request_cursor(request.args.get('after'))
+    limit = min(max(request.args.get('limit', 50, type=int) or 50, 1), 500)
+    def build(versions):
+        rows, next_cursor = fetch_requests_page(cursor, status, after, limit)
+        return {'requests': rows, 'next': next_cursor}
+    scope = f"requests-a-{status}-{after[0].isoformat() + '_' + str(after[1]) if after else ''}-{limit}"
+    return conditional_json(cursor, ('requests',), scope, build)
+
+@app.route('/api/forecast')
+@api_login_required('admin')
+def api_forecast():
+    """Per-group inflow/outflow rates and projected days to stockout."""
+    cursor = get_db_cursor()
+    stock_forecaster.ensure_loaded(cursor)
+    return jsonify({
+        'windows': list(stock_forecaster.windows),
+        'alert_days': app.config['FORECAST_ALERT_DAYS'],
+        'groups': stock_forecaster.forecast(stock_cache.get_stock_levels(cursor), app.config['FORECAST_ALERT_DAYS']),
+    })
+
+@app.route('/api/donors/<int:donor_id>/history')
+@api_login_required('admin', 'donor')
+def api_donor_history(donor_id):
+    """A donor's donations, newest first (donors may only read their own)."""
+    if g.role == 'donor' and g.user['DonorID'] != donor_id:
+        return jsonify({'error': 'forbidden'}), 403
+    cursor = get_db_cursor()
+    cursor.execute(DONOR_EXISTS_SQL, [donor_id])
+    if cursor.fetchone() is None:
+        return jsonify({'error': 'donor not found'}), 404
+    def build(versions):
+        cursor.execute(DONATION_HISTORY_SQL, [donor_id])
+        return {'donor_id': donor_id, 'donations': cursor.fetchall()}
+    return conditional_json(cursor, ('donations',), f'history-{donor_id}', build)
+
+@app.route('/events')
+def events():
+    """Server-Sent Events: stock changes (delta, new AvailableUnits and version) for everyone,
+    request status changes for their recipient (and for admins). Reads only the session, so no
+    DB connection is held open.
+
+    Event ids count per worker, so a reconnect cannot resume by Last-Event-ID; clients resync
+    from the JSON API whenever the stream opens and use `version` to ignore stale events.
+    """
+    role, user_id = session.get('user_role'), session.get('user_id')
+    if role == 'admin':
+        accept = lambda event: True
+    elif role == 'recipient' and user_id:
+        accept = lambda event: event['type'] == 'stock' or event.get('recipient_id') == user_id
+    else:
+        accept = lambda event: event['type'] == 'stock'
+
+    subscription = event_broker.subscribe(accept)
+    if subscription is None:
+        return Response('retry: 30000\n\n', status=503, mimetype='text/event-stream')
+    keepalive = app.config.get('SSE_KEEPALIVE', 15)
+
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while not subscription.overflowed:
+                try:
+                    event_id, event = subscription.queue.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'), default=str)}\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: don't buffer the stream
+    return response
+
+# --- Connection Pool Statistics ---
+@app.route('/admin/pool-stats')
+@login_required('admin')
+def pool_stats():
+    """JSON snapshot of this worker's connection pool, for sizing MYSQL_POOL_* per worker."""
+    pool = getattr(mysql, 'pool', None)
+    with db_request_stats_lock:
+        per_request = dict(db_request_stats)
+    per_request['connections_per_request'] = (
+        per_request['connections_opened'] / per_request['requests'] if per_request['requests'] else 0.0)
+    if pool is None:
+        return jsonify({'pooled': False, 'requests': per_request, 'async': async_mysql.stats()})
+    return jsonify({'pooled': True, 'requests': per_request, 'async': async_mysql.stats(),
+                    'replicas': mysql.replica_stats(), **pool.stats()})
+
+@app.route('/admin/cache-stats')
+@login_required('admin')
+def cache_stats():
+    """JSON hit/miss counters for this worker's stock, user-profile and dashboard fragment caches."""
+    return jsonify({'stock': stock_cache.stats(), 'user': user_cache.stats(), 'fragments': fragment_cache.stats()})
 
-    return render_template('admin_page.html', view=view, blood_stock=blood_stock, pending_requests=pending_requests, approved_requests=approved_requests, all_donors=all_donors, all_recipients=all_recipients, reports=reports)
+@app.route('/admin/query-stats')
+@login_required('admin')
+def query_stats():
+    """JSON per-endpoint DB usage and the slowest statements seen by this worker."""
+    with route_metrics_lock:
+        endpoints = {name: {k: v for k, v in totals.items() if k != 'statuses'} for name, totals in route_metrics.items()}
+        slowest = [{'ms': round(seconds * 1000, 2), 'endpoint': endpoint, 'statement': statement}
+                   for seconds, endpoint, statement in slow_statements]
+    for totals in endpoints.values():
+        totals['queries_per_request'] = totals['queries'] / totals['requests']
+    return jsonify({'endpoints': endpoints, 'slowest_statements': slowest})
+
+def _prometheus_labels(**labels):
+    return '{' + ','.join(f'{k}="{str(v).replace(chr(34), "")}"' for k, v in labels.items()) + '}'
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of this worker's request, DB, pool and cache metrics."""
+    token = app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+
+    lines = []
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            lines.append(f'{name}{_prometheus_labels(**labels) if labels else ""} {value}')
+
+    with route_metrics_lock:
+        snapshot = {name: {**totals, 'statuses': dict(totals['statuses'])} for name, totals in route_metrics.items()}
+    metric('bloodbank_http_requests_total', 'counter', 'Requests handled, by endpoint and status.',
+           [({'endpoint': name, 'status': status}, count)
+            for name, totals in snapshot.items() for status, count in totals['statuses'].items()])
+    metric('bloodbank_http_request_seconds_total', 'counter', 'Time spent handling requests.',
+           [({'endpoint': name}, f"{totals['seconds']:.6f}") for name, totals in snapshot.items()])
+    metric('bloodbank_db_queries_total', 'counter', 'SQL statements executed.',
+           [({'endpoint': name}, totals['queries']) for name, totals in snapshot.items()])
+    metric('bloodbank_db_seconds_total', 'counter', 'Time spent in MySQL execute/fetch calls.',
+           [({'endpoint': name}, f"{totals['db_seconds']:.6f}") for name, totals in snapshot.items()])
+    metric('bloodbank_db_rows_fetched_total', 'counter', 'Rows fetched from MySQL.',
+           [({'endpoint': name}, totals['rows']) for name, totals in snapshot.items()])
+    with db_request_stats_lock:
+        opened = db_request_stats['connections_opened']
+        replica_opened, replica_fallbacks = db_request_stats['replica_connections_opened'], db_request_stats['replica_fallbacks']
+    metric('bloodbank_db_connections_opened_total', 'counter', 'Request connections actually opened.', [({}, opened)])
+    metric('bloodbank_db_replica_connections_opened_total', 'counter', 'Request reads served by a replica.', [({}, replica_opened)])
+    metric('bloodbank_db_replica_fallbacks_total', 'counter', 'GET requests that found no healthy replica.', [({}, replica_fallbacks)])
+
+    pool = getattr(mysql, 'pool', None)
+    if pool is not None:
+        pool_stats_snapshot = pool.stats()
+        for key in ('size', 'idle', 'in_use', 'max_size'):
+            metric(f'bloodbank_pool_{key}', 'gauge', f'Connection pool {key}.', [({}, pool_stats_snapshot[key])])
+        for key in ('checkouts', 'waits', 'timeouts', 'created', 'recycled', 'ping_failures'):
+            metric(f'bloodbank_pool_{key}_total', 'counter', f'Connection pool {key}.', [({}, pool_stats_snapshot[key])])
+        replicas = mysql.replica_stats()
+        if replicas:
+            metric('bloodbank_replica_healthy', 'gauge', 'Replica in rotation (1) or skipped (0).',
+                   [({'replica': r['name']}, int(r['healthy'])) for r in replicas])
+            metric('bloodbank_replica_lag_seconds', 'gauge', 'Replication lag at the last health check.',
+                   [({'replica': r['name']}, r['lag']) for r in replicas if r['lag'] is not None])
+
+    caches = {'stock': stock_cache.stats(), 'user': user_cache.stats()}
+    for key in ('hits', 'misses', 'invalidations'):
+        metric(f'bloodbank_cache_{key}_total', 'counter', f'Cache {key}.',
+               [({'cache': name}, stats[key]) for name, stats in caches.items()])
+    fragments_snapshot = fragment_cache.stats()
+    for key in ('hits', 'misses'):
+        metric(f'bloodbank_fragment_cache_{key}_total', 'counter', f'Admin dashboard fragment cache {key}.',
+               [({'section': name}, counts[key]) for name, counts in fragments_snapshot['sections'].items()])
+    metric('bloodbank_fragment_cache_evictions_total', 'counter', 'Fragments evicted by the LRU bounds.',
+           [({}, fragments_snapshot['evictions'])])
+    metric('bloodbank_fragment_cache_bytes', 'gauge', 'Size of the cached fragments.', [({}, fragments_snapshot['bytes'])])
+    metric('bloodbank_fragment_cache_saved_seconds_total', 'counter', 'Estimated load and render time saved by hits.',
+           [({}, f"{fragments_snapshot['saved_seconds']:.6f}")])
+
+    hasher_snapshot = password_hasher.stats()
+    for key in ('hashes', 'verifications', 'legacy_verifications', 'rehashes'):
+        metric(f'bloodbank_password_{key}_total', 'counter', f'Password {key.replace("_", " ")}.', [({}, hasher_snapshot[key])])
+    metric('bloodbank_password_pool_wait_seconds_total', 'counter', 'Time logins waited for a hash pool thread.',
+           [({}, f"{hasher_snapshot['wait_seconds']:.6f}")])
+
+    events_snapshot = event_broker.stats()
+    metric('bloodbank_sse_subscribers', 'gauge', 'Open /events streams.', [({}, events_snapshot['subscribers'])])
+    for key in ('published', 'delivered', 'dropped_subscribers'):
+        metric(f'bloodbank_sse_{key}_total', 'counter', f'Live events {key.replace("_", " ")}.', [({}, events_snapshot[key])])
+
+    sweep_snapshot = expiry_sweeper.stats()
+    for key in ('runs', 'errors'):
+        metric(f'bloodbank_expiry_sweep_{key}_total', 'counter', f'Expiry sweep {key}.', [({}, sweep_snapshot[key])])
+
+    recall_snapshot = recall_scheduler.stats()
+    for key in ('sent_days', 'donors', 'errors'):
+        metric(f'bloodbank_recall_{key}_total', 'counter', f'Recall scheduler {key.replace("_", " ")}.', [({}, recall_snapshot[key])])
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
 
 # --- General Logout ---
 @app.route('/logout')
@@ -684,7 +4068,630 @@ def logout():
     flash('You have been logged out.', 'info')
     return redirect(url_for('homepage'))
 
+# --- Benchmarks (flask CLI) ---
+@app.cli.command('bench-admin-donors')
+@click.option('--sizes', default='100,1000,10000', help='Comma-separated donor counts to seed.')
+@click.option('--repeat', default=20, help='Timed page loads per page and size.')
+def bench_admin_donors(sizes, repeat):
+    """Seeds synthetic donors inside a rolled-back transaction and times one page of the admin
+    donor list (the dashboard's keyset query) at the start and the middle of the table. Per-page
+    time should stay flat as the table grows."""
+    limit = app.config['ADMIN_PAGE_SIZES']['donors'] + 1
+    repeat = max(repeat, 1)
+    conn, cursor = open_db()
+    try:
+        seeded = 0
+        for target in sorted(int(s) for s in sizes.split(',')):
+            rows = [(f'Bench Donor {i}', 18 + i % 50, 'Other', 'O+', f'bench{i}@bench.invalid', 'x',
+                     50 + i % 40, 'None', None) for i in range(seeded, target)]
+            cursor.executemany("""
+                INSERT INTO Donor (Name, Age, Gender, BloodGroup, Email, Password, Weight, ChronicDiseases, LastDonationDate)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, rows)
+            seeded = target
+            cursor.execute("SELECT COUNT(*) AS donors FROM Donor")
+            total = cursor.fetchone()['donors']
+            cursor.execute("SELECT DonorID FROM Donor ORDER BY DonorID LIMIT 1 OFFSET %s", [total // 2])
+            middle = cursor.fetchone()['DonorID']
+
+            for label, after_id in (('first', None), ('middle', middle)):
+                instrumented = InstrumentedCursor(cursor, QueryStats())
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    page = fetch_donors_with_eligibility(instrumented, after_id, limit)
+                per_page_ms = (time.perf_counter() - started) / repeat * 1000
+                click.echo(f"donors={total:>7} page={label:<6} rows={len(page):>3} "
+                           f"queries/page={instrumented.stats.queries / repeat:.0f} time={per_page_ms:.2f}ms")
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+def stock_reconciliation_totals(cursor, blood_group):
+    """Current stock vs. the history that should explain it, for one blood group."""
+    cursor.execute("SELECT AvailableUnits FROM BloodStock WHERE BloodGroup = %s", [blood_group])
+    row = cursor.fetchone()
+    cursor.execute("""
+        SELECT COALESCE(SUM(d.UnitsDonated), 0) AS donated
+        FROM Donation d JOIN Donor o ON d.DonorID = o.DonorID WHERE o.BloodGroup = %s
+    """, [blood_group])
+    donated = cursor.fetchone()['donated']
+    cursor.execute("""
+        SELECT COALESCE(SUM(RequiredUnits), 0) AS reserved
+        FROM BloodRequest WHERE BloodGroup = %s AND RequestStatus IN ('Approved', 'Completed')
+    """, [blood_group])
+    reserved = cursor.fetchone()['reserved']
+    return {'stock': row['AvailableUnits'] if row else 0, 'donated': int(donated), 'reserved': int(reserved)}
+
+@app.cli.command('stress-stock')
+@click.option('--threads', default=8, help='Concurrent workers.')
+@click.option('--rounds', default=25, help='Donation/approval/bulk-approval rounds per worker.')
+@click.option('--units', default=10, help='Units per donation and per request.')
+@click.option('--blood-group', default='O-', help='Blood group to hammer.')
+@click.confirmation_option(prompt='This commits test donors, donations and requests. Use a scratch database. Continue?')
+def stress_stock(threads, rounds, units, blood_group):
+    """Hammers donations, approvals and bulk approvals from many threads, then checks that stock
+    reconciles with history and that no transaction was rolled back as a deadlock victim."""
+
+    tag = f"stress{int(time.time())}"
+    with app.test_request_context():
+        conn, cursor = open_db()
+        before = stock_reconciliation_totals(cursor, blood_group)
+        cursor.execute("""
+            INSERT INTO Donor (Name, Age, Gender, BloodGroup, Email, Password, Weight, ChronicDiseases)
+            VALUES (%s, 30, 'Other', %s, %s, 'x', 70, 'None')
+        """, (tag, blood_group, f'{tag}@stress.invalid'))
+        donor_id = cursor.lastrowid
+        cursor.execute("""
+            INSERT INTO Recipient (Name, Age, Gender, BloodGroup, Email, Password)
+            VALUES (%s, 30, 'Other', %s, %s, 'x')
+        """, (tag, blood_group, f'{tag}@stress.invalid'))
+        recipient_id = cursor.lastrowid
+        request_ids = []
+        for _ in range(threads * rounds):
+            cursor.execute("""
+                INSERT INTO BloodRequest (RecipientID, BloodGroup, RequiredUnits, Hospital, Reason, RequestStatus)
+                VALUES (%s, %s, %s, 'Stress Test', %s, 'Pending')
+            """, (recipient_id, blood_group, units, tag))
+            request_ids.append(cursor.lastrowid)
+        bump_report_counters(cursor, {'requests_Pending': len(request_ids)})
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    outcomes = {'donations': 0, 'approved': 0, 'bulk_approved': 0, 'rejected_attempts': 0, 'deadlocks': 0, 'errors': 0}
+    outcomes_lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        with app.test_request_context():
+            conn, cursor = open_db()
+            for _ in range(rounds):
+                key = 'errors'
+                try:
+                    roll = rng.random()
+                    if roll < 0.4:
+                        cursor.execute("INSERT INTO Donation (DonorID, UnitsDonated, DonationCenter) VALUES (%s, %s, %s)",
+                                       (donor_id, units, tag))
+                        bump_report_counters(cursor, {'total_donations': units})
+                        if not update_blood_stock(blood_group, units, cursor, conn):
+                            raise Exception("Failed to update blood stock.")
+                        key = 'donations'
+                    elif roll < 0.7:
+                        # Deliberately collide: several workers may race for the same request
+                        approved, _, _ = approve_blood_request(rng.choice(request_ids), cursor, conn)
+                        key = 'approved' if approved else 'rejected_attempts'
+                    else:
+                        results = bulk_request_action(rng.sample(request_ids, min(3, len(request_ids))), 'Approve', cursor, conn)
+                        key = 'bulk_approved' if any(ok for _, ok, _ in results) else 'rejected_attempts'
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    key = 'deadlocks' if e.args and e.args[0] == 1213 else 'errors'
+                with outcomes_lock:
+                    outcomes[key] += 1
+            cursor.close()
+            conn.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with app.test_request_context():
+        conn, cursor = open_db()
+        after = stock_reconciliation_totals(cursor, blood_group)
+        cursor.close()
+        conn.close()
+
+    expected_stock = before['stock'] + (after['donated'] - before['donated']) - (after['reserved'] - before['reserved'])
+    click.echo(f"{outcomes} in {elapsed:.2f}s")
+    click.echo(f"before={before} after={after} expected_stock={expected_stock}")
+    if after['stock'] != expected_stock or after['stock'] < 0:
+        raise click.ClickException("Stock does not reconcile with Donation/BloodRequest history.")
+    if outcomes['deadlocks']:
+        raise click.ClickException(f"{outcomes['deadlocks']} transactions were rolled back as deadlock victims.")
+    click.echo("Stock reconciles.")
+
+@app.cli.command('rebuild-reports')
+@click.option('--check', is_flag=True, help='Only compare the counters with a full recount; do not write.')
+def rebuild_reports(check):
+    """Recounts ReportSummary from Donation/BloodRequest and repairs any drift."""
+    conn, cursor = open_db()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ReportSummary (
+                MetricName VARCHAR(50) PRIMARY KEY,
+                MetricValue BIGINT NOT NULL DEFAULT 0
+            )
+        """)
+        # Lock the counters first: writers that bump them wait for us, and our recount
+        # snapshot starts after any writer already holding them has committed.
+        cursor.execute("SELECT MetricName, MetricValue FROM ReportSummary FOR UPDATE")
+        current = {row['MetricName']: int(row['MetricValue']) for row in cursor.fetchall()}
+
+        cursor.execute("SELECT COALESCE(SUM(UnitsDonated), 0) AS total FROM Donation")
+        expected = {'total_donations': int(cursor.fetchone()['total'])}
+        cursor.execute("SELECT RequestStatus, COUNT(*) AS count FROM BloodRequest GROUP BY RequestStatus")
+        counts = {row['RequestStatus']: int(row['count']) for row in cursor.fetchall()}
+        for status in REQUEST_STATUSES:
+            expected[f'requests_{status}'] = counts.get(status, 0)
+
+        drift = {name: (current.get(name, 0), value) for name, value in expected.items() if current.get(name, 0) != value}
+        for name, (have, want) in drift.items():
+            click.echo(f"{name}: counter={have} recount={want}")
+        if check:
+            conn.rollback()
+            if drift:
+                raise click.ClickException("Report counters drifted from the base tables.")
+            click.echo("Report counters reconcile.")
+            return
+
+        cursor.executemany("""
+            INSERT INTO ReportSummary (MetricName, MetricValue) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE MetricValue = VALUES(MetricValue)
+        """, list(expected.items()))
+        conn.commit()
+        click.echo(f"Rebuilt {len(expected)} report counters ({len(drift)} corrected).")
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.cli.command('bench-matching')
+@click.option('--donors', default=100000, help='Synthetic donors to index.')
+@click.option('--queries', default=10000, help='Match queries to time.')
+def bench_matching(donors, queries):
+    """Times DonorMatchIndex build and match queries on synthetic donors (no database needed)."""
+    rng = random.Random(42)
+    today = datetime.now().date()
+    # Roughly 1 in 10 excluded by a static rule (no NextEligibleDate), the rest spread over a year
+    rows = [{'DonorID': i, 'BloodGroup': rng.choice(BLOOD_GROUPS),
+             'NextEligibleDate': today + timedelta(days=rng.randint(-300, 90)) if rng.random() > 0.1 else None}
+            for i in range(1, donors + 1)]
+    index = DonorMatchIndex(ttl=float('inf'))
+    started = time.perf_counter()
+    index.load(rows)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    groups = [rng.choice(BLOOD_GROUPS) for _ in range(queries)]
+    started = time.perf_counter()
+    for group in groups:
+        index.find_matches(group, limit=5, today=today)
+    per_query_us = (time.perf_counter() - started) / queries * 1e6
+    click.echo(f"donors={donors} indexed={index.stats()['donors']} build={build_ms:.1f}ms "
+               f"match={per_query_us:.1f}us/query (top 5)")
+
+@app.cli.command('bench-forecast')
+@click.option('--years', default=5, help='Years of synthetic daily history to load.')
+@click.option('--updates', default=100000, help='Incremental stock changes to apply.')
+@click.option('--forecasts', default=10000, help='Forecast computations to time.')
+def bench_forecast(years, updates, forecasts):
+    """Times StockForecaster load, incremental updates and forecasts on synthetic history (no database needed)."""
+    rng = random.Random(42)
+    today = datetime.now().date()
+    days = [today - timedelta(days=i) for i in range(years * 365)]
+    inflow = [{'BloodGroup': group, 'Day': day, 'Units': rng.randint(0, 4000)} for day in days for group in BLOOD_GROUPS]
+    outflow = [{'BloodGroup': group, 'Day': day, 'Units': rng.randint(0, 4000)} for day in days for group in BLOOD_GROUPS]
+    forecaster = StockForecaster(app.config['FORECAST_WINDOWS'], ttl=float('inf'))
+    started = time.perf_counter()
+    forecaster.load(inflow, outflow, today=today)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    changes = [(rng.choice(BLOOD_GROUPS), rng.choice((450, -300))) for _ in range(updates)]
+    started = time.perf_counter()
+    for group, delta in changes:
+        forecaster.record(group, delta, today=today)
+    update_us = (time.perf_counter() - started) / max(updates, 1) * 1e6
+
+    stock = [{'BloodGroup': group, 'AvailableUnits': rng.randint(0, 20000)} for group in BLOOD_GROUPS]
+    started = time.perf_counter()
+    for _ in range(forecasts):
+        rows = forecaster.forecast(stock, today=today)
+    forecast_us = (time.perf_counter() - started) / max(forecasts, 1) * 1e6
+    click.echo(f"history={len(days)} days x {len(BLOOD_GROUPS)} groups ({len(inflow) + len(outflow)} buckets) "
+               f"load={load_ms:.1f}ms update={update_us:.2f}us forecast={forecast_us:.1f}us (all groups, windows {forecaster.windows})")
+    click.echo(f"alerts: {', '.join(row['BloodGroup'] for row in rows if row['alert']) or 'none'}")
+
+@app.cli.command('import-donations')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None, help='Defaults to the file extension.')
+@click.option('--chunk-size', default=None, type=int, help='Rows per transaction (IMPORT_CHUNK_SIZE).')
+@click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False), default=None, help='Write rejected rows here as CSV.')
+def import_donations_command(path, fmt, chunk_size, rejects_path):
+    """Streams a donation-camp CSV/JSONL file into the database."""
+    fmt = fmt or ('jsonl' if path.lower().endswith(('.jsonl', '.json')) else 'csv')
+    rejects_file = open(rejects_path, 'w', newline='') if rejects_path else None
+    rejects_writer = csv.writer(rejects_file) if rejects_file else None
+    if rejects_writer:
+        rejects_writer.writerow(['line', 'reason'])
+
+    def on_reject(line_no, reason):
+        if rejects_writer:
+            rejects_writer.writerow([line_no, reason])
+        else:
+            click.echo(f"line {line_no}: {reason}", err=True)
+
+    with app.test_request_context():
+        conn, cursor = open_db()
+        try:
+            with open(path, newline='', encoding='utf-8') as stream:
+                counts = import_donations(iter_import_rows(stream, fmt), cursor, conn, on_reject,
+                                          chunk_size=chunk_size or app.config['IMPORT_CHUNK_SIZE'])
+        finally:
+            cursor.close()
+            conn.close()
+            if rejects_file:
+                rejects_file.close()
+    click.echo(f"Imported {counts['accepted']} donations; {counts['rejected']} rows rejected.")
+
+@app.cli.command('export')
+@click.argument('dataset', type=click.Choice(sorted(EXPORT_QUERIES)))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default='csv')
+@click.option('--output', type=click.File('w'), default='-', help='Defaults to stdout.')
+def export_command(dataset, fmt, output):
+    """Streams a dataset (donors, donations, requests) to a file in constant memory."""
+    for chunk in export_rows(dataset, fmt):
+        output.write(chunk)
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+BENCH_ROUTES = {
+    # name: (role to log in as, method, path)
+    'homepage': (None, 'GET', '/'),
+    'donor': ('donor', 'GET', '/donor?view=dashboard'),
+    'recipient': ('recipient', 'GET', '/recipient?view=dashboard'),
+    'admin': ('admin', 'GET', '/admin?view=dashboard'),
+    'approve': ('admin', 'POST', '/admin?view=dashboard'),  # update_blood_stock() path
+}
+# Read-only routes; 'approve' commits approvals, so it only runs on request, against --seed rows
+BENCH_DEFAULT_ROUTES = ('homepage', 'donor', 'recipient', 'admin')
+
+@app.cli.command('bench-routes')
+@click.option('--seed', default=0, help='Commit this many synthetic donors (plus related rows) first. Scratch databases only.')
+@click.option('--requests', 'total', default=200, help='Requests per route.')
+@click.option('--concurrency', default=8, help='Concurrent client threads per route.')
+@click.option('--routes', default=','.join(BENCH_DEFAULT_ROUTES),
+              help='Comma-separated subset of: ' + ', '.join(BENCH_ROUTES) + " ('approve' needs --seed)")
+@click.option('--max-p95-ms', default=None, type=float, help='Fail if any route p95 exceeds this.')
+@click.option('--json-output', type=click.File('w'), default=None, help='Also write the results as JSON (for CI baselines).')
+@click.option('--compare-async', is_flag=True, help='Run the read routes again with ASYNC_READS on (needs aiomysql and asgiref).')
+def bench_routes(seed, total, concurrency, routes, max_p95_ms, json_output, compare_async):
+    """Drives the main routes through the Flask test client under concurrency and reports
+    p50/p95/p99 latency, throughput and queries per request."""
+    if compare_async and not ASYNC_READS_AVAILABLE:
+        raise click.ClickException("--compare-async needs the aiomysql and asgiref packages.")
+    names = [r.strip() for r in routes.split(',') if r.strip()]
+    unknown = sorted(set(names) - set(BENCH_ROUTES))
+    if unknown:
+        raise click.ClickException(f"Unknown route(s): {', '.join(unknown)}.")
+    if 'approve' in names and not seed:
+        raise click.ClickException("'approve' commits approvals and stock deductions; "
+                                   "it only runs with --seed, against the seeded requests.")
+    conn, cursor = open_db()
+    tag = None
+    try:
+        if seed:
+            also = ' and approve the seeded Pending requests' if 'approve' in names else ''
+            click.confirm(f'Commit {seed} synthetic donors and related rows{also} in {app.config["MYSQL_DB"]}?', abort=True)
+            tag = seed_synthetic_dataset(cursor, conn, seed, tag_prefix='bench')
+        identities = {}
+        for role, sql in (('donor', "SELECT MIN(DonorID) AS id FROM Donor"),
+                          ('recipient', "SELECT MIN(RecipientID) AS id FROM Recipient"),
+                          ('admin', "SELECT MIN(AdminID) AS id FROM AdminLogin")):
+            cursor.execute(sql)
+            identities[role] = cursor.fetchone()['id']
+        pending_ids = []
+        if tag:
+            # Only this run's synthetic requests (Hospital carries the seed tag)
+            cursor.execute("SELECT RequestID FROM BloodRequest WHERE RequestStatus = 'Pending' AND Hospital = %s "
+                           "ORDER BY RequestID LIMIT %s", [tag, total])
+            pending_ids = [row['RequestID'] for row in cursor.fetchall()]
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+
+    results = {}
+    runs = [(name, False) for name in names]
+    if compare_async:
+        runs += [(name, True) for name, _ in runs if BENCH_ROUTES[name][1] == 'GET' and name != 'donor']
+    configured_mode = app.config.get('ASYNC_READS')
+    for name, async_mode in runs:
+        role, method, path = BENCH_ROUTES[name]
+        label = f'{name}[async]' if async_mode else name
+        if role and identities.get(role) is None:
+            click.echo(f"{label:<16} skipped: no {role} rows")
+            continue
+        app.config['ASYNC_READS'] = async_mode
+        latencies, queries, statuses = [], [], {}
+        lock = threading.Lock()
+        remaining = iter(range(total))
+        approve_ids = iter(pending_ids)
+
+        def client_loop():
+            client = app.test_client()
+            if role:
+                with client.session_transaction() as sess:
+                    sess['user_id'] = identities[role]
+                    sess['user_role'] = role
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                    form = None
+                    if name == 'approve':
+                        req_id = next(approve_ids, None)
+                        if req_id is None:
+                            return
+                        form = {'request_id': req_id, 'request_action': 'Approve'}
+                started = time.perf_counter()
+                response = client.open(path, method=method, data=form)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed * 1000)
+                    queries.append(int(response.headers.get('X-DB-Queries', 0)))
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client_loop) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+
+        latencies.sort()
+        results[label] = {
+            'requests': len(latencies),
+            'p50_ms': round(_percentile(latencies, 50), 2),
+            'p95_ms': round(_percentile(latencies, 95), 2),
+            'p99_ms': round(_percentile(latencies, 99), 2),
+            'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+            'statuses': statuses,
+        }
+        r = results[label]
+        click.echo(f"{label:<16} n={r['requests']:<5} p50={r['p50_ms']:>8.2f}ms p95={r['p95_ms']:>8.2f}ms "
+                   f"p99={r['p99_ms']:>8.2f}ms {r['throughput_rps']:>8.1f} req/s "
+                   f"{r['queries_per_request']:>6.2f} queries/req statuses={statuses}")
+
+    app.config['ASYNC_READS'] = configured_mode
+
+    if json_output:
+        json.dump(results, json_output, indent=2)
+    if max_p95_ms is not None:
+        slow = [name for name, r in results.items() if r['p95_ms'] > max_p95_ms]
+        if slow:
+            raise click.ClickException(f"p95 above {max_p95_ms}ms: {', '.join(slow)}")
+
+@app.cli.command('bench-login')
+@click.option('--users', default=50, help='Throwaway admin accounts to create (deleted afterwards).')
+@click.option('--requests', 'total', default=200, help='Logins to perform.')
+@click.option('--concurrency', default=8, help='Concurrent client threads.')
+@click.option('--legacy', is_flag=True, help='Store the accounts in plaintext, so the first logins include the rehash.')
+def bench_login(users, total, concurrency, legacy):
+    """Logs in through POST /admin under concurrency; reports latency, logins/s and hash-pool wait."""
+    tag = f"benchlogin{int(time.time())}"
+    accounts = [(f'{tag}-{i}', f'pw-{tag}-{i}') for i in range(users)]
+    conn, cursor = open_db()
+    try:
+        cursor.executemany("INSERT INTO AdminLogin (Username, Password) VALUES (%s, %s)",
+                           [(username, password if legacy else password_hasher.hash(password)) for username, password in accounts])
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    latencies, failures = [], 0
+    lock = threading.Lock()
+    remaining = iter(range(total))
+    before = password_hasher.stats()
+
+    def client_loop():
+        nonlocal failures
+        while True:
+            with lock:
+                i = next(remaining, None)
+            if i is None:
+                return
+            username, password = accounts[i % len(accounts)]
+            client = app.test_client()  # fresh session per login
+            started = time.perf_counter()
+            response = client.post('/admin', data={'username': username, 'password': password})
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed * 1000)
+                if response.status_code != 302 or 'dashboard' not in response.headers.get('Location', ''):
+                    failures += 1
+
+    try:
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client_loop) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+    finally:
+        conn, cursor = open_db()
+        try:
+            cursor.execute("DELETE FROM AdminLogin WHERE Username LIKE %s", [f'{tag}-%'])
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    after = password_hasher.stats()
+    kdf_calls = (after['verifications'] - before['verifications']) + (after['hashes'] - before['hashes'])
+    latencies.sort()
+    click.echo(f"method={password_hasher.method} pool={app.config['PASSWORD_HASH_WORKERS']} concurrency={concurrency}")
+    click.echo(f"{len(latencies)} logins ({failures} failed) in {wall:.2f}s: {len(latencies) / wall:.1f} logins/s; "
+               f"p50={_percentile(latencies, 50):.1f}ms p95={_percentile(latencies, 95):.1f}ms p99={_percentile(latencies, 99):.1f}ms")
+    if kdf_calls:
+        click.echo(f"KDF calls={kdf_calls} rehashes={after['rehashes'] - before['rehashes']} "
+                   f"avg pool wait={(after['wait_seconds'] - before['wait_seconds']) / kdf_calls * 1000:.1f}ms "
+                   f"avg KDF={(after['kdf_seconds'] - before['kdf_seconds']) / kdf_calls * 1000:.1f}ms")
+
+# Every read the routes and the in-memory indexes issue, built from the same constants and SQL
+# builders the code executes (tests/test_route_queries.py checks they stay in step), with sample params
+ROUTE_QUERIES = [
+    ('stock levels', STOCK_LEVELS_SQL, []),
+    ('api: stock', STOCK_LEVELS_SQL + " ORDER BY BloodGroup", []),
+    ('api: data versions', _data_versions_sql(DATA_VERSION_NAMES), list(DATA_VERSION_NAMES)),
+    ('before_request: donor profile', USER_PROFILE_QUERIES['donor'], [1]),
+    ('before_request: recipient profile', USER_PROFILE_QUERIES['recipient'], [1]),
+    ('before_request: admin profile', USER_PROFILE_QUERIES['admin'], [1]),
+    ('donor: login', _credential_sql('donor'), ['ravi@example.com']),
+    ('recipient: login', _credential_sql('recipient'), ['anita@example.com']),
+    ('admin: login', _credential_sql('admin'), ['admin1']),
+    ('donor: history', DONATION_HISTORY_SQL, [1]),
+    ('api: donor exists', DONOR_EXISTS_SQL, [1]),
+    ('recipient: history', RECIPIENT_HISTORY_SQL, [1]),
+    ('admin: request for approval', REQUEST_FOR_APPROVAL_SQL, [1]),
+    ('admin: bulk action lock', _bulk_requests_sql([1, 2]), [1, 2]),
+    ('admin: pending page', *_requests_page_sql('Pending', None, 25)),
+    ('admin: approved next page', *_requests_page_sql('Approved', (date(2025, 1, 1), 1000), 25)),
+    ('admin: donors first page', *_donors_sql(None, 51)),
+    ('admin: donors next page', *_donors_sql(1000, 51)),
+    ('admin: recipients first page', *_recipients_page_sql(None, 50)),
+    ('admin: recipients next page', *_recipients_page_sql(1000, 50)),
+    ('admin: reports', REPORT_SUMMARY_SQL, []),
+    ('admin: suggested donor names', _donor_names_sql([1, 2]), [1, 2]),
+    ('match index: donors', MATCHABLE_DONORS_SQL, []),
+    ('match index: reserved donors', RESERVED_DONORS_SQL, []),
+    ('forecast: inflow', FORECAST_INFLOW_SQL, ['2025-01-01']),
+    ('forecast: outflow', FORECAST_OUTFLOW_SQL, ['2025-01-01', '2025-01-01']),
+    ('inventory: available batches', AVAILABLE_BATCHES_SQL, []),
+    ('approve: FIFO batches', FIFO_BATCHES_SQL, ['O+', '2025-01-01']),
+    ('sweep: stock row locks', STOCK_ROWS_LOCK_SQL, []),
+    ('sweep: expired batches', EXPIRED_BATCH_TOTALS_SQL, ['2025-01-01']),
+    ('recall: donors becoming eligible', RECALL_DONORS_SQL, ['2025-01-01', '2025-01-02']),
+    ('recall: stored lists', RECALL_LIST_SQL, ['2025-01-01']),
+    ('recall: recent runs', RECALL_RUNS_SQL, [14]),
+]
+
+def seed_synthetic_dataset(cursor, conn, donors, tag_prefix='seed'):
+    """Bulk-inserts synthetic donors, recipients (donors/2), donations (donors*2) and requests
+    (donors, all four statuses), keeping BloodStock and ReportSummary consistent with them.
+    Commits (ANALYZE TABLE would anyway), so use a scratch database. Returns the row tag."""
+    tag = f"{tag_prefix}{int(time.time())}"
+    statuses = list(REQUEST_STATUSES)
+    start = datetime(2020, 1, 1)
+    cursor.executemany("""
+        INSERT INTO Donor (Name, Age, Gender, BloodGroup, Email, Password, Weight, ChronicDiseases, LastDonationDate, NextEligibleDate)
+        VALUES (%s, %s, 'Other', %s, %s, 'x', 70, 'None', %s, %s)
+    """, [(tag, 18 + i % 47, BLOOD_GROUPS[i % 8], f'{tag}.d{i}@seed.invalid',
+           (start + timedelta(days=i % 2000)).date(), (start + timedelta(days=i % 2000)).date() + DONATION_INTERVAL)
+          for i in range(donors)])
+    cursor.executemany("""
+        INSERT INTO Recipient (Name, Age, Gender, BloodGroup, Email, Password)
+        VALUES (%s, 40, 'Other', %s, %s, 'x')
+    """, [(tag, BLOOD_GROUPS[i % 8], f'{tag}.r{i}@seed.invalid') for i in range(max(1, donors // 2))])
+    cursor.execute("SELECT DonorID, BloodGroup FROM Donor WHERE Name = %s ORDER BY DonorID", [tag])
+    new_donors = cursor.fetchall()
+    cursor.execute("SELECT RecipientID FROM Recipient WHERE Name = %s ORDER BY RecipientID", [tag])
+    recipient_ids = [row['RecipientID'] for row in cursor.fetchall()]
+
+    stock_deltas = {group: 0 for group in BLOOD_GROUPS}
+    donations = []
+    for i in range(donors * 2):
+        donor = new_donors[i % len(new_donors)]
+        donations.append((donor['DonorID'], (start + timedelta(days=i % 2000)).date(), 450, tag))
+        stock_deltas[donor['BloodGroup']] += 450
+    cursor.executemany("INSERT INTO Donation (DonorID, DonationDate, UnitsDonated, DonationCenter) VALUES (%s, %s, %s, %s)",
+                       donations)
+
+    requests_rows, status_counts = [], {}
+    for i in range(donors):
+        group, status = BLOOD_GROUPS[i % 8], statuses[i % 4]
+        day = (start + timedelta(days=i % 2000)).date()
+        requests_rows.append((recipient_ids[i % len(recipient_ids)], group, 300, tag, tag, day, status,
+                              day if status in ('Approved', 'Completed') else None))
+        status_counts[f'requests_{status}'] = status_counts.get(f'requests_{status}', 0) + 1
+        if status in ('Approved', 'Completed'):
+            stock_deltas[group] -= 300
+    cursor.executemany("""
+        INSERT INTO BloodRequest (RecipientID, BloodGroup, RequiredUnits, Hospital, Reason, RequestDate, RequestStatus,
+                                  ApprovedOn)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, requests_rows)
+
+    for group, delta in stock_deltas.items():
+        if not update_blood_stock(group, delta, cursor, conn):
+            raise Exception(f"Seeding would make {group} stock negative.")
+    bump_report_counters(cursor, {'total_donations': 450 * len(donations), **status_counts})
+    bump_data_versions(cursor, 'donors', 'recipients')
+    conn.commit()
+    for table in ('Donor', 'Recipient', 'Donation', 'BloodRequest'):
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+    return tag
+
+@app.cli.command('explain-check')
+@click.option('--seed', default=0, help='Commit this many synthetic donors (plus related rows) first. Scratch databases only.')
+@click.option('--max-rows', default=1000, help='A full scan estimated above this many rows fails the check.')
+def explain_check(seed, max_rows):
+    """EXPLAINs every route query and fails if any of them full-scans a large table."""
+    conn, cursor = open_db()
+    try:
+        if seed:
+            click.confirm(f'Commit {seed} synthetic donors and related rows to {app.config["MYSQL_DB"]}?', abort=True)
+            seed_synthetic_dataset(cursor, conn, seed, tag_prefix='explain')
+
+        failures = []
+        for name, sql, params in ROUTE_QUERIES:
+            cursor.execute("EXPLAIN " + sql, params)
+            for row in cursor.fetchall():
+                scanned = int(row.get('rows') or 0)
+                full_scan = row.get('type') == 'ALL' and scanned > max_rows
+                click.echo(f"{'FULL SCAN' if full_scan else 'ok':>9}  {name:<36} table={row.get('table')} "
+                           f"type={row.get('type')} key={row.get('key')} rows={scanned}")
+                if full_scan:
+                    failures.append(name)
+        if failures:
+            raise click.ClickException(f"Full table scans in: {', '.join(sorted(set(failures)))}")
+        click.echo("No route query full-scans a large table.")
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+# ASGI entry point (optional 'asgiref' package): `uvicorn app:asgi_app`. WsgiToAsgi runs each
+# request in a worker thread, so this serves the same number of concurrent requests as a
+# threaded WSGI server; it is not an async deployment.
+if importlib.util.find_spec('asgiref') is not None:
+    asgi_app = importlib.import_module('asgiref.wsgi').WsgiToAsgi(app)
+
 if __name__ == '__main__':
     # NOTE: In a production environment, use a proper WSGI server (e.g., Gunicorn)
     # and ensure you replace the default database credentials.
+    # Pending migrations are applied on the first request (AUTO_MIGRATE) or via `flask migrate`.
     app.run(debug=True)
\ No newline at end of file
@@ -3,6 +3,13 @@ CREATE DATABASE IF NOT EXISTS blood_donation_db;
 USE blood_donation_db;
 
 -- --- CRITICAL: DROP TABLES TO ALLOW RE-CREATION WITH NEW SCHEMA ---
+DROP TABLE IF EXISTS SchemaMigrations;
+DROP TABLE IF EXISTS RecallEntry;
+DROP TABLE IF EXISTS RecallRun;
+DROP TABLE IF EXISTS DataVersion;
+DROP TABLE IF EXISTS BatchAllocation;
+DROP TABLE IF EXISTS StockBatch;
+DROP TABLE IF EXISTS ReportSummary;
 DROP TABLE IF EXISTS AdminLogin;
 DROP TABLE IF EXISTS BloodStock;
 DROP TABLE IF EXISTS Donation;
@@ -52,6 +59,7 @@ CREATE TABLE BloodRequest (
     RequiredUnits INT NOT NULL,
     Hospital VARCHAR(255) NOT NULL, -- CRITICAL: Added Hospital
     Reason TEXT, -- CRITICAL: Added Reason
+    RequestDate DATE NOT NULL DEFAULT (CURDATE()), -- Used by admin/recipient listings (ORDER BY)
     RequestStatus ENUM('Pending', 'Approved', 'Rejected', 'Completed') DEFAULT 'Pending',
     MatchedDonorID INT DEFAULT NULL,
     FOREIGN KEY (RecipientID) REFERENCES Recipient(RecipientID) ON DELETE CASCADE,
@@ -78,7 +86,14 @@ CREATE TABLE BloodStock (
 CREATE TABLE AdminLogin (
     AdminID INT AUTO_INCREMENT PRIMARY KEY,
     Username VARCHAR(50) UNIQUE NOT NULL,
-    Password VARCHAR(255) NOT NULL  -- Note: Should be hashed in real apps
+    Password VARCHAR(255) NOT NULL  -- werkzeug hash; plaintext sample rows are rehashed on first login
+);
+
+-- ReportSummary Table (Materialized admin report counters, maintained by app.py in the
+-- same transactions as donations and request status changes; `flask rebuild-reports` recounts)
+CREATE TABLE ReportSummary (
+    MetricName VARCHAR(50) PRIMARY KEY, -- 'total_donations' or 'requests_<RequestStatus>'
+    MetricValue BIGINT NOT NULL DEFAULT 0
 );
 
 
@@ -117,12 +132,21 @@ UPDATE BloodStock SET AvailableUnits = AvailableUnits + 450 WHERE BloodGroup = '
 
 -- STEP 9: Insert Admin Users (No changes needed)
 INSERT INTO AdminLogin (Username, Password) VALUES
-('admin1', 'admin@123'), -- For demo; use hashed passwords in production
+('admin1', 'admin@123'), -- For demo; app.py replaces these with hashes on first login
 ('admin2', 'securepass');
 
+-- STEP 10: Seed Report Counters from the sample data
+INSERT INTO ReportSummary (MetricName, MetricValue)
+SELECT 'total_donations', COALESCE(SUM(UnitsDonated), 0) FROM Donation;
+INSERT INTO ReportSummary (MetricName, MetricValue) VALUES
+('requests_Pending', 0), ('requests_Approved', 0), ('requests_Rejected', 0), ('requests_Completed', 0);
+UPDATE ReportSummary rs
+JOIN (SELECT RequestStatus, COUNT(*) AS cnt FROM BloodRequest GROUP BY RequestStatus) c
+    ON rs.MetricName = CONCAT('requests_', c.RequestStatus)
+SET rs.MetricValue = c.cnt;
+
 -- Final Check
 SELECT * FROM BloodStock;
 
--- Add the RequestDate column to the BloodRequest table
-ALTER TABLE BloodRequest
-ADD COLUMN RequestDate DATE NOT NULL DEFAULT (CURDATE()) AFTER Reason;
\ No newline at end of file
+-- NOTE: Indexes and later schema changes are NOT defined here. They are versioned migrations
+-- in app.py (MIGRATIONS), applied on the app's first request or with `flask migrate`.
\ No newline at end of file
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as bloodbank  # noqa: E402
+
+class FakeCursor:
+    """DB-API cursor stand-in: records every statement and answers it with respond(sql, params),
+    which returns (rows, rowcount); the default answers every statement with no rows."""
+    def __init__(self, respond=None):
+        self.respond = respond or (lambda sql, params: ([], 1))
+        self.statements = []
+        self.rowcount = 0
+        self.lastrowid = None
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((' '.join(sql.split()), list(params or [])))
+        self._rows, self.rowcount = self.respond(sql, list(params or []))
+
+    def executemany(self, sql, seq):
+        for params in seq:
+            self.execute(sql, params)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    """Connection stand-in handing out one FakeCursor and counting commits/rollbacks."""
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+class FakeMySQL:
+    """Stands in for the app's `mysql` extension (no replicas)."""
+    def __init__(self, connection):
+        self.connection = connection
+
+@pytest.fixture
+def request_context():
+    with bloodbank.app.test_request_context():
+        yield
@@ -0,0 +1,51 @@
+import app as bloodbank
+from conftest import FakeCursor
+
+def test_fragment_cache_hits_and_misses_by_section():
+    cache = bloodbank.FragmentCache(max_entries=10, max_bytes=1000)
+    key = ('stock', (3,), 1, None)
+    assert cache.get(key) is None
+    cache.set(key, '<table></table>', None, 0.25)
+    assert cache.get(key) == ('<table></table>', None)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+    assert stats['saved_seconds'] == 0.25 and stats['build_seconds'] == 0.25
+    assert stats['sections'] == {'stock': {'hits': 1, 'misses': 1}}
+
+def test_fragment_cache_evicts_least_recently_used_entries():
+    cache = bloodbank.FragmentCache(max_entries=2, max_bytes=1000)
+    cache.set(('a',), 'A', None, 0)
+    cache.set(('b',), 'B', None, 0)
+    cache.get(('a',))
+    cache.set(('c',), 'C', None, 0)
+    assert cache.get(('b',)) is None and cache.get(('a',)) == ('A', None)
+    assert cache.stats()['evictions'] == 1
+
+def test_fragment_cache_byte_bound():
+    cache = bloodbank.FragmentCache(max_entries=10, max_bytes=10)
+    cache.set(('a',), 'x' * 6, None, 0)
+    cache.set(('b',), 'y' * 6, 'next', 0)
+    assert cache.get(('a',)) is None and cache.get(('b',)) == ('y' * 6, 'next')
+    cache.set(('c',), 'z' * 11, None, 0)  # larger than the whole cache: not stored
+    assert cache.get(('c',)) is None
+    cache.set(('b',), 'w' * 4, None, 0)   # replacing an entry releases its bytes
+    assert cache.stats()['bytes'] == 4
+
+def test_in_process_cache_backend_expiry_and_bound():
+    backend = bloodbank.InProcessCacheBackend(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=-1)
+    assert backend.get('a') == 1 and backend.get('b') is None
+    backend.set('c', 3, ttl=60)
+    backend.set('d', 4, ttl=60)
+    assert backend.get('a') is None and backend.get('d') == 4
+
+def test_ttl_cache_loads_read_the_primary():
+    """Shared for their whole TTL, so a lagging replica must never fill them."""
+    cursor = FakeCursor()
+    bloodbank.DonorMatchIndex(300).ensure_loaded(cursor)
+    bloodbank.StockForecaster([7], 300).ensure_loaded(cursor)
+    bloodbank.StockInventory(300).ensure_loaded(cursor)
+    assert len(cursor.statements) == 5
+    for sql, _ in cursor.statements:
+        assert sql.startswith(bloodbank.PRIMARY_READ) and not bloodbank.is_plain_read(sql)
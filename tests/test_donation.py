@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+
+import pytest
+
+import app as bloodbank
+from conftest import FakeConnection, FakeCursor, FakeMySQL
+
+@pytest.fixture
+def donor_client(monkeypatch):
+    app = bloodbank.app
+    for key in ('AUTO_MIGRATE', 'INVENTORY_AUTO_SWEEP', 'RECALL_SCHEDULER'):
+        monkeypatch.setitem(app.config, key, False)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 7
+        sess['user_role'] = 'donor'
+    yield client
+    bloodbank.user_cache.invalidate('donor', 7)
+
+def test_donation_checks_locked_last_donation_not_cached_profile(donor_client, monkeypatch):
+    # The cached profile predates a donation another request just committed.
+    bloodbank.user_cache.set('donor', 7, {
+        'DonorID': 7, 'Name': 'Ravi', 'BloodGroup': 'O+', 'Age': 30, 'Weight': 75,
+        'ChronicDiseases': 'None', 'LastDonationDate': date(2020, 1, 1)})
+    recent = date.today() - timedelta(days=3)
+
+    def respond(sql, params):
+        if 'FOR UPDATE' in sql and 'FROM Donor' in sql:
+            return [{'LastDonationDate': recent}], 1
+        return [], 1
+
+    cursor = FakeCursor(respond)
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(bloodbank, 'mysql', FakeMySQL(conn))
+
+    response = donor_client.post('/donor?view=dashboard', data={
+        'donation_form': '1', 'age': '30', 'weight': '75', 'gender': 'Male', 'blood_group': 'O+',
+        'contact': '9876543210', 'address': 'Pune', 'diseases': 'None',
+        'date': date.today().isoformat(), 'units': '450', 'hospital': 'Ruby Hall'})
+
+    assert response.status_code == 302
+    assert not any(sql.startswith('INSERT INTO Donation') for sql, _ in cursor.statements)
+    assert conn.commits == 0 and conn.rollbacks >= 1
+    with donor_client.session_transaction() as sess:
+        messages = [message for _, message in sess.get('_flashes', [])]
+    assert any('ineligible' in message for message in messages)
+
+@pytest.mark.parametrize('donor_group, eligible_from, matched', [
+    ('O-', date(2026, 5, 1), True),
+    ('B+', date(2026, 5, 1), False),    # cannot give to A+
+    ('A+', date(2026, 7, 1), False),    # still in the 90-day wait
+    ('A+', None, False),                # excluded by a static rule
+])
+def test_match_checks_compatibility_and_eligibility(request_context, donor_group, eligible_from, matched):
+    today = date(2026, 6, 1)
+
+    def respond(sql, params):
+        # What the UPDATE's WHERE clause decides for an A+ Pending request
+        donor_id, req_id, day, *pairs = params
+        allowed = list(zip(pairs[::2], pairs[1::2]))
+        hit = ('A+', donor_group) in allowed and eligible_from is not None and eligible_from <= day
+        return [], int(hit)
+
+    cursor = FakeCursor(respond)
+    assert bloodbank.record_donor_match(7, 3, cursor, today=today) is matched
+    assert cursor.statements[0][0].startswith('UPDATE BloodRequest r JOIN Donor d')
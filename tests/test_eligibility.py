@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import app as bloodbank
+
+TODAY = date.today()
+UPDATE_DETAILS = "Eligible to donate, but please update weight/details."
+
+# (donor fields, expected eligible, expected reason)
+CASES = [
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': None, 'ChronicDiseases': 'None'}, True, "Eligible to donate."),
+    ({'Age': '30', 'Weight': '70.5'}, True, "Eligible to donate."),
+    ({'Age': None, 'Weight': 70}, False, "Invalid age provided."),
+    ({'Age': 'abc', 'Weight': 70}, False, "Invalid age provided."),
+    ({'Weight': 70}, False, "Invalid age provided."),
+    ({'Age': 17, 'Weight': 70}, False, "Age must be between 18 and 65."),
+    ({'Age': 18, 'Weight': 70}, True, "Eligible to donate."),
+    ({'Age': 65, 'Weight': 70}, True, "Eligible to donate."),
+    ({'Age': 66, 'Weight': 70}, False, "Age must be between 18 and 65."),
+    ({'Age': 30, 'Weight': 49.9}, False, "Weight must be over 50 kg."),
+    ({'Age': 30, 'Weight': 50}, True, "Eligible to donate."),
+    ({'Age': 30, 'Weight': 0}, False, "Weight must be over 50 kg."),
+    ({'Age': 30, 'Weight': 'heavy'}, False, "Invalid weight provided."),
+    ({'Age': 30, 'Weight': ''}, False, "Invalid weight provided."),
+    # A missing weight lets the donor through before the date and medical checks
+    ({'Age': 30, 'Weight': None, 'LastDonationDate': TODAY, 'ChronicDiseases': 'Asthma'}, True, UPDATE_DETAILS),
+    ({'Age': 30}, True, UPDATE_DETAILS),
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': TODAY - timedelta(days=89)}, False,
+     "Must wait 1 more days since last donation."),
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': TODAY - timedelta(days=90)}, True, "Eligible to donate."),
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': (TODAY - timedelta(days=10)).isoformat()}, False,
+     "Must wait 80 more days since last donation."),
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': (TODAY - timedelta(days=120)).isoformat()}, True, "Eligible to donate."),
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': datetime.combine(TODAY - timedelta(days=30), datetime.min.time())},
+     False, "Must wait 60 more days since last donation."),
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': ''}, True, "Eligible to donate."),
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': '2025-13-01'}, False, "Error processing last donation date format."),
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': 12345}, False, "Error processing last donation date format."),
+    ({'Age': 30, 'Weight': 70, 'ChronicDiseases': None}, True, "Eligible to donate."),
+    ({'Age': 30, 'Weight': 70, 'ChronicDiseases': ''}, True, "Eligible to donate."),
+    ({'Age': 30, 'Weight': 70, 'ChronicDiseases': 'N/A'}, True, "Eligible to donate."),
+    ({'Age': 30, 'Weight': 70, 'ChronicDiseases': 'NONE'}, True, "Eligible to donate."),
+    ({'Age': 30, 'Weight': 70, 'ChronicDiseases': 'Asthma'}, False, "Medical condition recorded. Please consult a doctor."),
+    # The 90-day wait is reported ahead of a medical condition
+    ({'Age': 30, 'Weight': 70, 'LastDonationDate': TODAY - timedelta(days=1), 'ChronicDiseases': 'Asthma'}, False,
+     "Must wait 89 more days since last donation."),
+]
+
+@pytest.mark.parametrize('donor, eligible, reason', CASES)
+def test_single_donor_verdicts(donor, eligible, reason):
+    assert bloodbank.check_donor_eligibility(donor) == (eligible, reason)
+
+def test_batch_matches_single_donor_verdicts():
+    donors = [donor for donor, _, _ in CASES]
+    # Every row carries every column in a batch; the single-donor defaults fill the gaps
+    eligible, reasons, _ = bloodbank.check_donor_eligibility_batch({
+        'Age': [d.get('Age') for d in donors],
+        'Weight': [d.get('Weight') for d in donors],
+        'LastDonationDate': [d.get('LastDonationDate') for d in donors],
+        'ChronicDiseases': [d.get('ChronicDiseases', 'None') for d in donors],
+    }, today=TODAY)
+    assert list(zip(eligible, reasons)) == [bloodbank.check_donor_eligibility(d) for d in donors]
+
+def test_batch_next_eligible_dates():
+    last = TODAY - timedelta(days=30)
+    _, _, next_dates = bloodbank.check_donor_eligibility_batch({
+        'Age': [30, 30, 30, 70],
+        'Weight': [70, 70, 70, 70],
+        'LastDonationDate': [None, last.isoformat(), last.isoformat(), None],
+        'ChronicDiseases': ['None', 'None', 'Asthma', 'None'],
+    }, today=TODAY)
+    assert next_dates == [TODAY, last + timedelta(days=90), None, None]
+
+def test_batch_missing_columns_use_single_donor_defaults():
+    eligible, reasons, _ = bloodbank.check_donor_eligibility_batch({'Age': [30, 30], 'Weight': [70, 40]}, today=TODAY)
+    assert eligible == [True, False]
+    assert reasons == ["Eligible to donate.", "Weight must be over 50 kg."]
+
+@pytest.mark.parametrize('weight', [None, 0])
+def test_missing_weight_gets_the_same_default_everywhere(weight):
+    donor = {'DonorID': 1, 'Age': 30, 'Weight': weight, 'LastDonationDate': None, 'ChronicDiseases': 'None'}
+    # Admin list, and the NextEligibleDate that matching and recall read
+    assert bloodbank._tag_donor_eligibility([dict(donor)])[0]['EligibilityStatus'] == 'Eligible'
+    assert bloodbank.donor_eligibility_state([donor], today=TODAY) == [(TODAY, None)]
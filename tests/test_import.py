@@ -0,0 +1,52 @@
+from datetime import date
+
+from flask import g
+
+import app as bloodbank
+from conftest import FakeConnection, FakeCursor, FakeMySQL
+
+DONORS = [
+    {'DonorID': 1, 'Email': 'a@x.org', 'BloodGroup': 'O+', 'Age': 30, 'Weight': 70, 'LastDonationDate': None, 'ChronicDiseases': 'None'},
+    {'DonorID': 2, 'Email': 'b@x.org', 'BloodGroup': 'O+', 'Age': 40, 'Weight': 80, 'LastDonationDate': None, 'ChronicDiseases': 'None'},
+    {'DonorID': 3, 'Email': 'c@x.org', 'BloodGroup': 'A+', 'Age': 50, 'Weight': 60, 'LastDonationDate': None, 'ChronicDiseases': 'None'},
+]
+
+def test_import_records_one_batch_per_donation_and_runs_commit_hooks(monkeypatch, request_context):
+    next_id = iter(range(101, 200))
+
+    def respond(sql, params):
+        if 'FROM Donor WHERE Email IN' in sql:
+            return [dict(d) for d in DONORS if d['Email'] in params], len(params)
+        if sql.startswith('INSERT INTO Donation'):
+            cursor.lastrowid = next(next_id)
+        return [], 1
+
+    cursor = FakeCursor(respond)
+    raw = FakeConnection(cursor)
+    monkeypatch.setattr(bloodbank, 'mysql', FakeMySQL(raw))
+    inventory = bloodbank.StockInventory(ttl=300)
+    inventory.load([])
+    monkeypatch.setattr(bloodbank, 'stock_inventory', inventory)
+    published = []
+    monkeypatch.setattr(bloodbank.event_broker, 'publish', published.extend)
+
+    rows = [(n, {'Email': d['Email'], 'DonationDate': '2026-05-0%d' % n, 'UnitsDonated': '450'})
+            for n, d in enumerate(DONORS, start=1)]
+    conn, lazy_cursor = bloodbank.open_db()
+    counts = bloodbank.import_donations(iter(rows), lazy_cursor, conn, on_reject=lambda *a: None)
+
+    assert counts == {'accepted': 3, 'rejected': 0}
+    batches = [params for sql, params in cursor.statements if sql.startswith('INSERT INTO StockBatch')]
+    assert [(b[0], b[1], b[2], b[4]) for b in batches] == [
+        ('O+', 101, date(2026, 5, 1), 450), ('O+', 102, date(2026, 5, 2), 450), ('A+', 103, date(2026, 5, 3), 450)]
+    # One BloodStock statement per group, and no per-group batch on top of the per-donation ones
+    stock = [params for sql, params in cursor.statements if sql.startswith('INSERT INTO BloodStock')]
+    assert sorted(p[0] for p in stock) == ['A+', 'O+'] and len(batches) == 3
+    # The commit went through the request wrapper: hooks ran, events were published
+    assert raw.commits == 1
+    assert sorted((e['group'], e['delta']) for e in published if e['type'] == 'stock') == [('A+', 450), ('O+', 900)]
+    # ...each dated by collection day, so the forecaster books them where they belong
+    assert {e['group']: e['days'] for e in published if e['type'] == 'stock'} == {
+        'A+': {'2026-05-03': 450}, 'O+': {'2026-05-01': 450, '2026-05-02': 450}}
+    assert inventory._loaded_at is None
+    assert 'after_commit' not in g and 'pending_events' not in g
@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+
+import app as bloodbank
+
+TODAY = date(2026, 6, 1)
+
+def donor(donor_id, group, eligible_from):
+    return {'DonorID': donor_id, 'BloodGroup': group, 'NextEligibleDate': eligible_from}
+
+# --- DonorMatchIndex ---
+def test_match_index_orders_by_preference_then_rest():
+    index = bloodbank.DonorMatchIndex(ttl=300)
+    index.load([
+        donor(1, 'O-', TODAY - timedelta(days=110)),
+        donor(2, 'A+', TODAY - timedelta(days=10)),
+        donor(3, 'A+', TODAY - timedelta(days=210)),
+        donor(4, 'A+', TODAY + timedelta(days=80)),    # still waiting
+        donor(5, 'A+', None),                          # excluded by a static rule
+        donor(6, 'A-', TODAY.isoformat()),             # registered today, never donated
+    ])
+    matches = index.find_matches('A+', limit=5, today=TODAY)
+    assert [m[0] for m in matches] == [3, 2, 6, 1]
+    assert matches[0] == (3, 'A+', TODAY - timedelta(days=210))
+    assert index.stats()['donors'] == 5
+
+def test_match_index_limit_and_incompatible_groups():
+    index = bloodbank.DonorMatchIndex(ttl=300)
+    index.load([donor(i, 'O-', TODAY) for i in range(1, 5)] + [donor(9, 'AB+', TODAY)])
+    assert len(index.find_matches('O-', limit=2, today=TODAY)) == 2
+    assert [m[0] for m in index.find_matches('O-', limit=10, today=TODAY)] == [1, 2, 3, 4]
+    assert index.find_matches('B+', limit=5, today=TODAY)[0][1] == 'O-'
+    assert index.find_matches('XX', today=TODAY) == []
+
+def test_match_index_skips_reserved_donors_and_applies_updates():
+    index = bloodbank.DonorMatchIndex(ttl=300)
+    index.load([donor(1, 'B+', TODAY), donor(2, 'B+', TODAY)], reserved_ids=[1])
+    assert [m[0] for m in index.find_matches('B+', today=TODAY)] == [2]
+
+    index.update_donor(2, 'B+', TODAY + timedelta(days=90))  # just donated
+    assert index.find_matches('B+', today=TODAY) == []
+    assert index.find_matches('B+', today=TODAY + timedelta(days=90))[0][0] == 2
+
+    index.update_donor(1, 'B+', TODAY)
+    index.remove_donor(2)
+    assert [m[0] for m in index.find_matches('B+', today=TODAY + timedelta(days=90))] == [1]
+    index.update_donor(1, 'B+', None)
+    assert index.stats()['donors'] == 0
+
+# --- StockInventory ---
+def batch(batch_id, group, expires_in, units):
+    return {'BatchID': batch_id, 'BloodGroup': group, 'ExpiresOn': TODAY + timedelta(days=expires_in),
+            'RemainingUnits': units}
+
+def test_inventory_plans_first_expiring_usable_batches():
+    inventory = bloodbank.StockInventory(ttl=300)
+    inventory.load([batch(1, 'O+', 10, 300), batch(2, 'O+', 2, 200), batch(3, 'O+', -1, 500),
+                    batch(4, 'A+', 1, 100), batch(5, 'O+', 5, 0)])
+    assert inventory.plan('O+', 400, TODAY) == [(2, 200), (1, 200)]
+    assert inventory.plan('O+', 900, TODAY) == [(2, 200), (1, 300)]  # partial: not enough usable units
+    assert inventory.plan('B-', 100, TODAY) == []
+
+def test_inventory_consume_add_and_expire():
+    inventory = bloodbank.StockInventory(ttl=300)
+    inventory.load([batch(1, 'O+', 1, 300), batch(2, 'O+', 5, 200)])
+    inventory.consume([(1, 300), (2, 50)])
+    assert inventory.plan('O+', 1000, TODAY) == [(2, 150)]
+    inventory.add(7, 'O+', TODAY + timedelta(days=3), 100)
+    inventory.add(7, 'O+', TODAY + timedelta(days=3), 100)  # re-adding a known batch is ignored
+    assert inventory.plan('O+', 1000, TODAY) == [(7, 100), (2, 150)]
+    assert inventory.stats()['batches'] == 2
+
+    inventory.remove_expired(TODAY + timedelta(days=4))
+    assert inventory.plan('O+', 1000, TODAY) == [(2, 150)]
+
+def test_inventory_expiry_summary():
+    inventory = bloodbank.StockInventory(ttl=300)
+    inventory.load([batch(1, 'O+', 2, 300), batch(2, 'O+', 6, 200), batch(3, 'O+', 20, 50), batch(4, 'O+', -3, 40)])
+    summary = inventory.expiry_summary(TODAY, within_days=7)
+    assert summary['O+'] == {'next_expiry': TODAY + timedelta(days=2), 'expiring_units': 500, 'batches': 3}
+    assert summary['A-'] == {'next_expiry': None, 'expiring_units': 0, 'batches': 0}
+
+# --- StockForecaster ---
+def flows(group, per_day, days, end=TODAY):
+    return [{'BloodGroup': group, 'Day': end - timedelta(days=i), 'Units': per_day} for i in range(days)]
+
+def test_forecast_rates_per_window():
+    forecaster = bloodbank.StockForecaster((7, 30), ttl=3600)
+    forecaster.load(flows('O+', 70, 7), flows('O+', 100, 30), today=TODAY)
+    rates = forecaster.rates(TODAY)['O+']
+    assert rates[7] == (70.0, 100.0)
+    assert rates[30] == (70 * 7 / 30, 100.0)
+
+def test_forecast_days_to_stockout_uses_fastest_burn():
+    forecaster = bloodbank.StockForecaster((7, 30), ttl=3600)
+    forecaster.load(flows('O+', 70, 7), flows('O+', 100, 30), today=TODAY)
+    rows = {row['BloodGroup']: row for row in forecaster.forecast(
+        [{'BloodGroup': 'O+', 'AvailableUnits': 660}, {'BloodGroup': 'A+', 'AvailableUnits': 100}],
+        alert_days=7, today=TODAY)}
+    o_pos = rows['O+']
+    assert o_pos['net_burn_per_day'] == round(100 - 70 * 7 / 30, 1)
+    assert o_pos['days_to_stockout'] == round(660 / (100 - 70 * 7 / 30), 1)
+    assert not o_pos['alert']
+    assert rows['A+']['days_to_stockout'] is None and rows['A+']['stockout_date'] is None
+
+def test_forecast_records_changes_and_rolls_over_days():
+    forecaster = bloodbank.StockForecaster((7,), ttl=3600)
+    forecaster.load([], [], today=TODAY)
+    forecaster.record('B-', 700, today=TODAY)
+    forecaster.record('B-', -1400, today=TODAY)
+    forecaster.record('ZZ', 100, today=TODAY)  # unknown groups are ignored
+    assert forecaster.rates(TODAY)['B-'][7] == (100.0, 200.0)
+    # A week later the changes have left the window
+    assert forecaster.rates(TODAY + timedelta(days=7))['B-'][7] == (0.0, 0.0)
+
+def test_forecast_books_changes_on_their_own_day():
+    forecaster = bloodbank.StockForecaster((7,), ttl=3600)
+    forecaster.load([], [], today=TODAY)
+    # An import collected 3 days ago leaves the 7-day window 3 days sooner than today's change
+    forecaster.record('O+', 700, day=(TODAY - timedelta(days=3)).isoformat(), today=TODAY)
+    forecaster.record('O+', -700, day=TODAY, today=TODAY)
+    forecaster.record('O+', 700, day=TODAY - timedelta(days=30), today=TODAY)  # before the history
+    assert forecaster.rates(TODAY)['O+'][7] == (100.0, 100.0)
+    assert forecaster.rates(TODAY + timedelta(days=4))['O+'][7] == (0.0, 100.0)
+
+def test_unloaded_forecaster_ignores_changes():
+    forecaster = bloodbank.StockForecaster((7,), ttl=3600)
+    forecaster.record('O+', 100, today=TODAY)
+    assert forecaster.rates(TODAY) == {}
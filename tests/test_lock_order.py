@@ -0,0 +1,255 @@
+import re
+import threading
+import time
+from datetime import date
+
+import pytest
+
+import app as bloodbank
+from conftest import FakeCursor
+
+PRIMARY_KEYS = {'Donor': 'DonorID', 'BloodRequest': 'RequestID', 'BloodStock': 'BloodGroup',
+                'ReportSummary': 'MetricName', 'DataVersion': 'Name'}
+
+class Deadlock(Exception):
+    pass
+
+def rows_locked(sql, params):
+    """The (table, key) rows a statement locks, for the tables transactions contend on."""
+    match = re.match(r'(?:INSERT INTO|UPDATE) (\w+)|SELECT .* FROM (\w+) .*FOR UPDATE', sql)
+    table = match and (match.group(1) or match.group(2))
+    if table not in PRIMARY_KEYS:
+        return []
+    if sql.startswith('INSERT'):  # upserts keyed on the first value
+        return [(table, params[0])]
+    key = PRIMARY_KEYS[table]
+    where = re.search(rf'WHERE {key} (=|IN) ', sql)
+    if where is None:
+        return [(table, value) for value in bloodbank.BLOOD_GROUPS] if table == 'BloodStock' else []
+    first = sql[:where.start()].count('%s')
+    if where.group(1) == '=':
+        return [(table, params[first])]
+    return [(table, value) for value in params[first:first + sql[where.end():].split(')')[0].count('%s')]]
+
+class LockManager:
+    """Exclusive row locks held to commit/rollback. A wait that would close a cycle raises
+    Deadlock instead, as InnoDB rolls one of the transactions back."""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._owner = {}
+        self._waiting_for = {}
+        self.deadlocks = 0
+
+    def acquire(self, txn, row):
+        with self._cond:
+            while self._owner.setdefault(row, txn) is not txn:
+                holder = self._owner[row]
+                while holder is not None:
+                    if holder is txn:
+                        self.deadlocks += 1
+                        raise Deadlock(row)
+                    holder = self._owner.get(self._waiting_for.get(holder))
+                self._waiting_for[txn] = row
+                self._cond.wait(0.05)
+                self._waiting_for.pop(txn, None)
+
+    def release_all(self, txn):
+        with self._cond:
+            for row in [row for row, owner in self._owner.items() if owner is txn]:
+                del self._owner[row]
+            self._cond.notify_all()
+
+class LockingConnection:
+    """One transaction at a time over a FakeCursor that takes row locks before each statement
+    and records the order it first took them in."""
+    def __init__(self, locks, respond, pause=0.0):
+        self.locks = locks
+        self.orders = [[]]
+        self.commits = 0
+        self._pause = pause
+        self._cursor = FakeCursor(respond)
+        execute = self._cursor.execute
+
+        def locking_execute(sql, params=None):
+            for row in rows_locked(' '.join(sql.split()), list(params or [])):
+                if row not in self.orders[-1]:
+                    time.sleep(self._pause)  # let the other threads interleave
+                    self.locks.acquire(self, row)
+                    self.orders[-1].append(row)
+            return execute(sql, params)
+        self._cursor.execute = locking_execute
+
+    def cursor(self):
+        return self._cursor
+
+    def _end(self):
+        self.locks.release_all(self)
+        self.orders.append([])
+
+    def commit(self):
+        self.commits += 1
+        self._end()
+
+    def rollback(self):
+        self._end()
+
+    def close(self):
+        self._end()
+
+class LockingMySQL:
+    def __init__(self, locks, respond, pause=0.0):
+        self.locks, self.respond, self.pause = locks, respond, pause
+        self.connections = []
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        conn = LockingConnection(self.locks, self.respond, self.pause)
+        with self._lock:
+            self.connections.append(conn)
+        return conn
+
+def respond(sql, params):
+    sql = ' '.join(sql.split())
+    if sql.startswith('SELECT RequestID, RecipientID, BloodGroup') and 'FOR UPDATE' in sql:
+        return [{'RequestID': r, 'RecipientID': 1, 'BloodGroup': 'O+', 'RequiredUnits': 10,
+                 'RequestStatus': 'Pending'} for r in params], len(params)
+    if sql.startswith('SELECT BloodGroup, AvailableUnits FROM BloodStock') and 'FOR UPDATE' in sql:
+        return [{'BloodGroup': group, 'AvailableUnits': 10 ** 6} for group in params], len(params)
+    if sql.startswith('SELECT RecipientID, RequiredUnits, BloodGroup FROM BloodRequest'):
+        return [{'RecipientID': 1, 'RequiredUnits': 10, 'BloodGroup': 'O+'}], 1
+    if sql.startswith('SELECT LastDonationDate FROM Donor'):
+        return [{'LastDonationDate': None}], 1
+    if sql.startswith('SELECT BloodGroup, SUM(RemainingUnits)'):
+        return [{'BloodGroup': 'O+', 'Units': 5, 'Batches': 1}], 1
+    if 'FROM Donor WHERE Email IN' in sql:
+        return [{'DonorID': 40 + i, 'Email': email, 'BloodGroup': 'O+', 'Age': 30, 'Weight': 70,
+                 'LastDonationDate': None, 'ChronicDiseases': 'None'} for i, email in enumerate(params)], len(params)
+    return [], 1
+
+@pytest.fixture
+def locking_db(monkeypatch):
+    app = bloodbank.app
+    for key in ('AUTO_MIGRATE', 'INVENTORY_AUTO_SWEEP', 'RECALL_SCHEDULER'):
+        monkeypatch.setitem(app.config, key, False)
+    # Batch rows are per donation/request, not contended; keep the fake to the shared rows
+    monkeypatch.setattr(bloodbank, 'add_stock_batch', lambda *args, **kwargs: None)
+    monkeypatch.setattr(bloodbank, 'add_stock_batches', lambda *args, **kwargs: None)
+    monkeypatch.setattr(bloodbank, 'allocate_stock_batches', lambda *args, **kwargs: [])
+    monkeypatch.setattr(bloodbank.event_broker, 'publish', lambda events: None)
+
+    def install(pause=0.0):
+        db = LockingMySQL(LockManager(), respond, pause)
+        monkeypatch.setattr(bloodbank, 'mysql', db)
+        return db
+    yield install
+    for donor_id in range(1, 20):
+        bloodbank.user_cache.invalidate('donor', donor_id)
+    bloodbank.user_cache.invalidate('admin', 1)
+
+PROFILES = {
+    'donor': lambda user_id: {'DonorID': user_id, 'Name': 'D', 'BloodGroup': 'O+', 'Age': 30, 'Weight': 70,
+                              'ChronicDiseases': 'None', 'LastDonationDate': None},
+    'admin': lambda user_id: {'AdminID': user_id, 'Username': 'admin1'},
+}
+
+def logged_in(role, user_id):
+    client = bloodbank.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['user_role'] = role
+    return client
+
+def post(client, data):
+    # A donation drops the cached profile; put it back rather than faking the profile query
+    with client.session_transaction() as sess:
+        role, user_id = sess['user_role'], sess['user_id']
+    bloodbank.user_cache.set(role, user_id, PROFILES[role](user_id))
+    return client.post(f'/{role}?view=dashboard', data=data)
+
+def donate(client):
+    return post(client, {
+        'donation_form': '1', 'age': '30', 'weight': '70', 'gender': 'Male', 'blood_group': 'O+',
+        'contact': '1', 'address': 'x', 'diseases': 'None', 'date': date.today().isoformat(),
+        'units': '450', 'hospital': 'H'})
+
+def bulk_approve(client, request_ids):
+    return post(client, {'bulk_action': 'Approve', 'request_ids': request_ids})
+
+def run_paths(db):
+    """Every write path that touches stock or the counters, once each."""
+    donate(logged_in('donor', 7))
+    bulk_approve(logged_in('admin', 1), ['3', '5'])
+    post(logged_in('admin', 1), {'request_action': 'Approve', 'request_id': '9'})
+    with bloodbank.app.test_request_context():
+        conn, cursor = bloodbank.open_db()
+        bloodbank.expire_stock_batches(cursor, date(2026, 1, 1))
+        conn.commit()
+        bloodbank.import_donations(iter([(1, {'Email': 'a@x.org', 'DonationDate': '2026-01-01', 'UnitsDonated': '450'})]),
+                                   cursor, conn, on_reject=lambda *args: None)
+        conn.close()
+    return [order for conn in db.connections for order in conn.orders if order]
+
+def find_cycle(orders):
+    """A lock-order cycle across all transactions (row a taken before b in one, b before a via
+    others), or None."""
+    edges = {}
+    for order in orders:
+        for i, first in enumerate(order):
+            edges.setdefault(first, set()).update(order[i + 1:])
+    state = {}
+
+    def visit(row, path):
+        state[row] = 'active'
+        for nxt in edges.get(row, ()):
+            if state.get(nxt) == 'active':
+                return path + [row, nxt]
+            if nxt not in state:
+                found = visit(nxt, path + [row])
+                if found:
+                    return found
+        state[row] = 'done'
+        return None
+
+    for row in list(edges):
+        if row not in state:
+            found = visit(row, [])
+            if found:
+                return found
+    return None
+
+def test_write_paths_take_row_locks_in_one_global_order(locking_db):
+    db = locking_db()
+    orders = run_paths(db)
+    assert len(orders) == 5
+    assert find_cycle(orders) is None
+    for order in orders:
+        # The shared counter rows come last, each table in name order
+        shared = [row for row in order if row[0] in ('ReportSummary', 'DataVersion')]
+        assert order[len(order) - len(shared):] == shared
+        assert shared == sorted(shared, key=lambda row: (row[0] != 'ReportSummary', row[1]))
+
+def test_concurrent_bulk_approvals_and_donations_do_not_deadlock(locking_db):
+    db = locking_db(pause=0.001)
+    statuses, errors = [], []
+
+    def run(action):
+        try:
+            for _ in range(5):
+                statuses.append(action().status_code)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(lambda c=logged_in('donor', 1 + i): donate(c),))
+               for i in range(4)]
+    threads += [threading.Thread(target=run, args=(lambda c=logged_in('admin', 1), i=i:
+                                                   bulk_approve(c, [str(10 * i + 1), str(10 * i + 2)]),))
+                for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert not errors
+    assert db.locks.deadlocks == 0
+    assert statuses == [302] * 40
+    assert sum(conn.commits for conn in db.connections) == 40
@@ -0,0 +1,19 @@
+import sys
+
+import app as bloodbank
+
+def test_sampled_profiler_is_stopped_when_the_view_raises(monkeypatch, caplog):
+    app = bloodbank.app
+    for key in ('AUTO_MIGRATE', 'INVENTORY_AUTO_SWEEP', 'RECALL_SCHEDULER'):
+        monkeypatch.setitem(app.config, key, False)
+    monkeypatch.setitem(app.config, 'PROFILE_SAMPLE_RATE', 1.0)
+
+    def broken():
+        raise RuntimeError('boom')
+
+    monkeypatch.setitem(app.view_functions, 'homepage', broken)
+    monkeypatch.setattr(app, 'testing', False)
+    caplog.set_level('INFO', logger=app.logger.name)
+    assert app.test_client().get('/').status_code == 500
+    assert sys.getprofile() is None
+    assert "Profile for GET / (raised RuntimeError('boom'))" in caplog.text
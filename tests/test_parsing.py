@@ -0,0 +1,79 @@
+import io
+from datetime import date
+
+import pytest
+
+import app as bloodbank
+
+# --- Keyset cursors ---
+@pytest.mark.parametrize('value, expected', [('12', 12), ('', None), (None, None), ('abc', None), ('1.5', None)])
+def test_parse_id_cursor(value, expected):
+    assert bloodbank.parse_id_cursor(value) == expected
+
+@pytest.mark.parametrize('value, expected', [
+    ('2025-01-02_15', (date(2025, 1, 2), 15)),
+    (None, None),
+    ('', None),
+    ('2025-01-02', None),
+    ('2025-13-02_15', None),
+    ('2025-01-02_x', None),
+    ('2025-01-02_1_2', None),
+])
+def test_parse_request_cursor(value, expected):
+    assert bloodbank.parse_request_cursor(value) == expected
+
+def test_requests_page_sql_and_result_round_trip():
+    sql, params = bloodbank._requests_page_sql('Pending', (date(2025, 1, 2), 15), 2)
+    assert 'br.RequestDate < %s OR (br.RequestDate = %s AND br.RequestID < %s)' in sql
+    assert params == ['Pending', date(2025, 1, 2), date(2025, 1, 2), 15, 3]
+
+    rows = [{'RequestID': 9, 'RequestDate': date(2025, 1, 1)}, {'RequestID': 8, 'RequestDate': '2024-12-31'},
+            {'RequestID': 7, 'RequestDate': date(2024, 12, 30)}]
+    page, next_cursor = bloodbank._requests_page_result(rows, 2)
+    assert [r['RequestID'] for r in page] == [9, 8]
+    assert bloodbank.parse_request_cursor(next_cursor) == (date(2024, 12, 31), 8)
+    assert bloodbank._requests_page_result(rows, 3) == (rows, None)
+
+def test_recipients_page_result():
+    rows = [{'RecipientID': i} for i in (1, 2, 3)]
+    assert bloodbank._recipients_page_result(rows, 2) == (rows[:2], 2)
+    assert bloodbank._recipients_page_result(rows, 3) == (rows, None)
+    assert bloodbank._recipients_page_sql(5, 2) == (
+        "SELECT RecipientID, Name, BloodGroup, ContactNumber FROM Recipient WHERE RecipientID > %s "
+        "ORDER BY RecipientID LIMIT %s", [5, 3])
+
+# --- Bulk import rows ---
+def test_iter_import_rows_csv_reports_file_line_numbers():
+    stream = io.StringIO("Email,DonationDate,UnitsDonated,DonationCenter\n"
+                         "a@x.org,2025-01-02,450,Camp A\n"
+                         "b@x.org,2025-01-03,300,\n")
+    rows = list(bloodbank.iter_import_rows(stream, 'csv'))
+    assert [line for line, _ in rows] == [2, 3]
+    assert rows[0][1] == {'Email': 'a@x.org', 'DonationDate': '2025-01-02', 'UnitsDonated': '450', 'DonationCenter': 'Camp A'}
+
+def test_iter_import_rows_jsonl_flags_bad_lines():
+    stream = io.StringIO('{"Email": "a@x.org"}\n\n{not json}\n[1, 2]\n')
+    rows = list(bloodbank.iter_import_rows(stream, 'jsonl'))
+    assert [line for line, _ in rows] == [1, 3, 4]
+    assert rows[0][1] == {'Email': 'a@x.org'}
+    assert rows[1][1]['_error'].startswith('Invalid JSON')
+    assert rows[2][1] == {'_error': 'Expected a JSON object.'}
+
+def test_validate_import_row_accepts_and_normalizes():
+    row = {'Email': ' a@x.org ', 'DonationDate': '2025-01-02 ', 'UnitsDonated': '450', 'DonationCenter': '  '}
+    assert bloodbank._validate_import_row(row) == ('a@x.org', date(2025, 1, 2), 450, None)
+    assert bloodbank._validate_import_row({**row, 'DonationCenter': 'Camp'})[3] == 'Camp'
+
+@pytest.mark.parametrize('row, reason', [
+    ({'_error': 'Invalid JSON: x'}, 'Invalid JSON: x'),
+    ({'Email': '', 'DonationDate': '2025-01-02', 'UnitsDonated': 1}, 'Missing Email.'),
+    ({'Email': 'a@x.org', 'DonationDate': '02/01/2025', 'UnitsDonated': 1}, 'DonationDate must be YYYY-MM-DD.'),
+    ({'Email': 'a@x.org', 'UnitsDonated': 1}, 'DonationDate must be YYYY-MM-DD.'),
+    ({'Email': 'a@x.org', 'DonationDate': '2025-01-02', 'UnitsDonated': 'lots'}, 'UnitsDonated must be a whole number.'),
+    ({'Email': 'a@x.org', 'DonationDate': '2025-01-02'}, 'UnitsDonated must be a whole number.'),
+    ({'Email': 'a@x.org', 'DonationDate': '2025-01-02', 'UnitsDonated': '0'}, 'UnitsDonated must be positive.'),
+])
+def test_validate_import_row_rejects(row, reason):
+    with pytest.raises(ValueError) as excinfo:
+        bloodbank._validate_import_row(row)
+    assert str(excinfo.value) == reason
@@ -0,0 +1,54 @@
+import pytest
+
+import app as bloodbank
+from conftest import FakeCursor
+
+@pytest.fixture(scope='module')
+def hasher():
+    return bloodbank.PasswordHasher('pbkdf2:sha256:1000', workers=2, timeout=5.0)
+
+def test_current_hash_verifies_without_rehash(hasher):
+    stored = hasher.hash('s3cret')
+    assert bloodbank.is_password_hash(stored)
+    assert hasher.verify(stored, 's3cret') == (True, False)
+    assert hasher.verify(stored, 'wrong') == (False, False)
+
+def test_legacy_plaintext_is_flagged_for_rehash(hasher):
+    assert not bloodbank.is_password_hash('admin@123')
+    assert hasher.verify('admin@123', 'admin@123') == (True, True)
+    assert hasher.verify('admin@123', 'admin@124') == (False, False)
+    assert hasher.verify(None, '') == (True, True)
+
+def test_hash_from_an_older_method_is_flagged_for_rehash(hasher):
+    old = bloodbank.PasswordHasher('pbkdf2:sha256:2000', workers=1).hash('s3cret')
+    assert hasher.verify(old, 's3cret') == (True, True)
+    assert hasher.verify(old, 'nope') == (False, False)
+
+def test_verification_counters(hasher):
+    before = hasher.stats()
+    hasher.verify(hasher.hash('x'), 'x')
+    hasher.verify('x', 'x')
+    after = hasher.stats()
+    assert after['verifications'] - before['verifications'] == 1
+    assert after['legacy_verifications'] - before['legacy_verifications'] == 1
+    assert after['hashes'] - before['hashes'] == 1
+
+def test_authenticate_rehashes_a_matching_legacy_password(hasher, monkeypatch, request_context):
+    monkeypatch.setattr(bloodbank, 'password_hasher', hasher)
+
+    def respond(sql, params):
+        if sql.startswith('SELECT'):
+            return [{'AdminID': 7, 'Password': 'admin@123'}], 1
+        return [], 1
+    cursor = FakeCursor(respond)
+    commits = []
+    conn = type('Conn', (), {'commit': lambda self: commits.append(1), 'rollback': lambda self: None})()
+    assert bloodbank.authenticate('admin', 'admin1', 'admin@123', cursor, conn) == (7, True)
+    update_sql, update_params = cursor.statements[1]
+    assert update_sql.startswith('UPDATE AdminLogin SET Password = %s WHERE AdminID = %s AND Password = %s')
+    assert hasher.verify(update_params[0], 'admin@123') == (True, False)
+    assert update_params[1:] == [7, 'admin@123'] and commits == [1]
+
+    cursor = FakeCursor(respond)
+    assert bloodbank.authenticate('admin', 'admin1', 'wrong', cursor, conn) == (None, True)
+    assert len(cursor.statements) == 1
@@ -0,0 +1,194 @@
+import threading
+import time
+
+import pymysql
+import pytest
+
+import app as bloodbank
+
+class FakeRaw:
+    def __init__(self, n):
+        self.n = n
+        self.closed = False
+        self.fail_ping = False
+        self.fail_rollback = False
+
+    def ping(self, reconnect=False):
+        if self.fail_ping:
+            raise pymysql.err.OperationalError("gone away")
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise pymysql.err.OperationalError("gone away")
+
+    def close(self):
+        self.closed = True
+
+def make_pool(**kwargs):
+    created = []
+    def connect():
+        created.append(FakeRaw(len(created)))
+        return created[-1]
+    settings = {'min_size': 0, 'max_size': 2, 'timeout': 0.05, 'recycle': 300}
+    settings.update(kwargs)
+    return bloodbank.ConnectionPool(connect, **settings), created
+
+def test_released_connections_are_reused():
+    pool, created = make_pool()
+    conn = pool.acquire()
+    conn.close()
+    conn.close()  # a second close is a no-op
+    again = pool.acquire()
+    assert again._raw is created[0] and len(created) == 1
+    stats = pool.stats()
+    assert (stats['checkouts'], stats['size'], stats['in_use']) == (2, 1, 1)
+
+def test_closed_proxy_refuses_use():
+    pool, _ = make_pool()
+    conn = pool.acquire()
+    conn.close()
+    with pytest.raises(pymysql.err.InterfaceError):
+        conn.cursor()
+
+def test_checkout_times_out_at_max_size():
+    pool, _ = make_pool(max_size=1)
+    pool.acquire()
+    with pytest.raises(bloodbank.PoolTimeout):
+        pool.acquire()
+    assert pool.stats()['timeouts'] == 1
+
+def test_waiter_gets_the_released_connection():
+    pool, created = make_pool(max_size=1, timeout=2.0)
+    held = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    held.close()
+    waiter.join(2)
+    assert got and got[0]._raw is created[0]
+    assert pool.stats()['waits'] >= 1
+
+def test_idle_connections_past_recycle_are_replaced():
+    pool, created = make_pool(recycle=0)
+    pool.acquire().close()
+    time.sleep(0.01)
+    conn = pool.acquire()
+    assert created[0].closed and conn._raw is created[1]
+    assert pool.stats()['recycled'] == 1
+
+def test_failed_ping_replaces_the_connection():
+    pool, created = make_pool()
+    pool.acquire().close()
+    created[0].fail_ping = True
+    conn = pool.acquire()
+    assert conn._raw is created[1]
+    assert pool.stats()['ping_failures'] == 1
+
+def test_connection_that_cannot_roll_back_is_discarded():
+    pool, created = make_pool()
+    conn = pool.acquire()
+    created[0].fail_rollback = True
+    conn.close()
+    stats = pool.stats()
+    assert created[0].closed and stats['size'] == 0 and stats['reset_failures'] == 1
+
+def test_failed_connect_frees_the_slot():
+    def connect():
+        raise pymysql.err.OperationalError("refused")
+    pool = bloodbank.ConnectionPool(connect, min_size=0, max_size=1, timeout=0.05)
+    with pytest.raises(pymysql.err.OperationalError):
+        pool.acquire()
+    assert pool.stats()['size'] == 0
+
+class StatusPool:
+    """Replica pool stand-in whose SHOW REPLICA STATUS waits for `release` before answering."""
+    def __init__(self, lag):
+        self.lag = lag
+        self.release = threading.Event()
+        self.checks = 0
+
+    def acquire(self):
+        self.release.wait(5)
+        self.checks += 1
+        pool = self
+
+        class Cursor:
+            def execute(self, sql):
+                pass
+            def fetchone(self):
+                return {'Seconds_Behind_Source': pool.lag}
+            def close(self):
+                pass
+
+        class Conn:
+            def cursor(self):
+                return Cursor()
+            def close(self):
+                pass
+
+        return Conn()
+
+    def stats(self):
+        return {}
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return predicate()
+
+def test_replica_check_never_blocks_the_caller():
+    pool = StatusPool(lag=0)
+    replica = bloodbank.ReplicaEndpoint('r1', pool, check_interval=0.01, max_lag=2)
+    started = time.monotonic()
+    assert replica.is_available() is False  # probe still waiting on the replica: use the primary
+    assert time.monotonic() - started < 0.5
+    pool.release.set()
+    assert wait_for(replica.is_available)
+    pool.lag = 30
+    assert wait_for(lambda: not replica.is_available())
+    assert replica.error == 'lag 30s over 2s'
+    replica.stop_probe()
+
+def test_marked_failed_replica_returns_after_a_healthy_probe():
+    pool = StatusPool(lag=0)
+    pool.release.set()
+    replica = bloodbank.ReplicaEndpoint('r1', pool, check_interval=0.01, max_lag=2)
+    assert replica.check()
+    replica.mark_failed('connection refused')
+    assert not replica.healthy and replica.error == 'connection refused'
+    assert wait_for(replica.is_available)  # starts the probe, which finds it healthy again
+    replica.stop_probe()
+
+@pytest.mark.parametrize('statement, plain', [
+    ("SELECT * FROM Donor", True),
+    ("  select 1", True),
+    ("SHOW REPLICA STATUS", True),
+    ("SELECT * FROM BloodStock WHERE BloodGroup = %s FOR UPDATE", False),
+    ("SELECT * FROM BloodStock FOR SHARE", False),
+    ("SELECT * FROM BloodStock LOCK IN SHARE MODE", False),
+    ("SELECT GET_LOCK('bloodbank_migrations', 60)", False),
+    ("UPDATE BloodStock SET AvailableUnits = 0", False),
+    ("INSERT INTO Donation VALUES (1)", False),
+    (bloodbank.PRIMARY_READ + "SELECT BloodGroup FROM BloodStock", False),
+])
+def test_is_plain_read(statement, plain):
+    assert bloodbank.is_plain_read(statement) is plain
+
+@pytest.mark.parametrize('method, pinned_for, wrote, expected', [
+    ('GET', None, False, True),
+    ('GET', 60, False, False),      # read-your-writes pin after a commit
+    ('GET', -60, False, True),      # pin expired
+    ('POST', None, False, False),
+    ('GET', None, True, False),     # uncommitted write on the request's connection
+])
+def test_async_reads_follow_read_your_writes(monkeypatch, method, pinned_for, wrote, expected):
+    monkeypatch.setitem(bloodbank.app.config, 'ASYNC_READS', True)
+    monkeypatch.setattr(bloodbank, 'ASYNC_READS_AVAILABLE', True)
+    with bloodbank.app.test_request_context('/', method=method):
+        if pinned_for is not None:
+            bloodbank.session['db_primary_until'] = time.time() + pinned_for
+        bloodbank.g.conn = bloodbank.LazyConnection(lambda: None)
+        bloodbank.g.conn.wrote = wrote
+        assert bloodbank.async_reads_enabled() is expected
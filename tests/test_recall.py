@@ -0,0 +1,52 @@
+from datetime import date
+
+import app as bloodbank
+from conftest import FakeConnection, FakeCursor, FakeMySQL
+
+DAY = date(2026, 6, 1)
+
+def recall_donor(donor_id, group):
+    return {'DonorID': donor_id, 'Name': f'D{donor_id}', 'BloodGroup': group, 'Email': f'd{donor_id}@x.org',
+            'ContactNumber': None, 'NextEligibleDate': DAY}
+
+def test_recall_lists_are_stored_with_the_claimed_day(monkeypatch):
+    def respond(sql, params):
+        if 'FROM Donor WHERE NextEligibleDate' in ' '.join(sql.split()):
+            return [recall_donor(1, 'O+'), recall_donor(2, 'O-'), recall_donor(3, 'O+')], 3
+        return [], 1
+
+    cursor = FakeCursor(respond)
+    raw = FakeConnection(cursor)
+    monkeypatch.setattr(bloodbank, 'mysql', FakeMySQL(raw))
+    monkeypatch.setattr(bloodbank, 'recall_group_priority', lambda cursor: ['O-', 'O+'])
+    monkeypatch.setitem(bloodbank.app.config, 'RECALL_BATCH_SIZE', 1)
+    published = []
+    monkeypatch.setattr(bloodbank.event_broker, 'publish', published.extend)
+
+    batches = bloodbank.RecallScheduler(bloodbank.app).run_once(DAY)
+
+    # Stored in the transaction that claims the day, so admins who were offline can still read them
+    entries = [params for sql, params in cursor.statements if sql.startswith('INSERT INTO RecallEntry')]
+    assert entries == [[DAY, 2, 'O-', 1, 1], [DAY, 1, 'O+', 2, 1], [DAY, 3, 'O+', 2, 2]]
+    assert raw.commits == 1 and len(published) == len(batches) == 3
+
+def test_load_recall_lists_regroups_stored_batches():
+    rows = [{'Priority': 1, 'Batch': 1, **recall_donor(2, 'O-')},
+            {'Priority': 2, 'Batch': 1, **recall_donor(1, 'O+')},
+            {'Priority': 2, 'Batch': 1, **recall_donor(3, 'O+')}]
+    cursor = FakeCursor(lambda sql, params: (list(rows), 3))
+    batches = bloodbank.load_recall_lists(cursor, DAY)
+    assert [(b['group'], b['priority'], b['batch'], [d['DonorID'] for d in b['donors']]) for b in batches] == [
+        ('O-', 1, 1, [2]), ('O+', 2, 1, [1, 3])]
+
+def test_scheduler_start_is_idempotent(monkeypatch):
+    scheduler = bloodbank.RecallScheduler(bloodbank.app)
+    monkeypatch.setattr(scheduler, 'run_once', lambda: None)
+    assert not scheduler.is_running
+    scheduler.start()
+    thread = scheduler._thread
+    scheduler.start()
+    assert scheduler.is_running and scheduler._thread is thread
+    scheduler.stop()
+    thread.join(1)
+    assert not scheduler.is_running
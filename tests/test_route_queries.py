@@ -0,0 +1,83 @@
+import re
+from datetime import date
+
+import pytest
+
+import app as bloodbank
+from conftest import FakeConnection, FakeCursor, FakeMySQL
+
+PROFILES = {
+    'donor': {'DonorID': 1, 'Name': 'Ravi', 'Email': 'ravi@example.com', 'BloodGroup': 'O+', 'Age': 30,
+              'Weight': 75, 'ChronicDiseases': 'None', 'LastDonationDate': None},
+    'recipient': {'RecipientID': 1, 'Name': 'Anita', 'Email': 'anita@example.com', 'BloodGroup': 'O+'},
+    'admin': {'AdminID': 1, 'Username': 'admin1'},
+}
+
+ROUTES = [
+    (None, '/'),
+    ('donor', '/donor?view=dashboard'),
+    ('recipient', '/recipient?view=dashboard'),
+    ('admin', '/admin?view=dashboard'),
+    ('admin', '/admin?view=dashboard&pending=2025-01-01_9&donors=5&recipients=5'),
+    (None, '/api/stock'),
+    ('admin', '/api/requests'),
+    ('recipient', '/api/requests'),
+    ('admin', '/api/forecast'),
+    ('admin', '/api/donors/1/history'),
+    ('admin', '/admin/recalls'),
+]
+
+def shape(sql):
+    """Statement text with whitespace, the primary-routing prefix and IN-list lengths normalized."""
+    sql = ' '.join(sql.replace(bloodbank.PRIMARY_READ, '').split())
+    return re.sub(r'IN \(%s(, %s)*\)', 'IN (%s)', sql)
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    app = bloodbank.app
+    for key in ('AUTO_MIGRATE', 'INVENTORY_AUTO_SWEEP', 'RECALL_SCHEDULER', 'ASYNC_READS'):
+        monkeypatch.setitem(app.config, key, False)
+    # Fresh indexes and caches, so every loader queries instead of answering from memory
+    monkeypatch.setattr(bloodbank, 'stock_cache', bloodbank.StockCache(bloodbank.InProcessCacheBackend(), 60))
+    monkeypatch.setattr(bloodbank, 'donor_match_index', bloodbank.DonorMatchIndex(300))
+    monkeypatch.setattr(bloodbank, 'stock_forecaster', bloodbank.StockForecaster(app.config['FORECAST_WINDOWS'], 300))
+    monkeypatch.setattr(bloodbank, 'stock_inventory', bloodbank.StockInventory(300))
+    monkeypatch.setattr(bloodbank, 'fragment_cache', bloodbank.FragmentCache(100, 1 << 20))
+    cursor = FakeCursor(lambda sql, params: ([{'id': 1}] if sql.startswith('SELECT 1') else [], 1))
+    monkeypatch.setattr(bloodbank, 'mysql', FakeMySQL(FakeConnection(cursor)))
+    yield cursor
+    for role in PROFILES:
+        bloodbank.user_cache.invalidate(role, 1)
+
+def unlisted_reads(cursor):
+    listed = {shape(sql) for _, sql, _ in bloodbank.ROUTE_QUERIES}
+    return sorted({shape(sql) for sql, _ in cursor.statements
+                   if shape(sql).startswith('SELECT') and shape(sql) not in listed})
+
+def test_route_queries_cover_every_read_the_routes_issue(fake_db):
+    for role, path in ROUTES:
+        client = bloodbank.app.test_client()
+        if role:
+            bloodbank.user_cache.set(role, 1, PROFILES[role])
+            with client.session_transaction() as sess:
+                sess['user_id'] = 1
+                sess['user_role'] = role
+        assert client.get(path).status_code == 200, path
+    assert unlisted_reads(fake_db) == []
+
+def test_route_queries_cover_the_write_paths_and_background_jobs(fake_db, request_context):
+    cursor, conn = fake_db, FakeConnection(fake_db)
+    for role in PROFILES:
+        bloodbank.authenticate(role, 'nobody', 'pw', cursor, conn)
+    bloodbank.approve_blood_request(1, cursor, conn)
+    bloodbank.bulk_request_action([1, 2], 'Approve', cursor, conn)
+    bloodbank.suggest_donor_matches(cursor, [])
+    with pytest.raises(Exception, match='short of AvailableUnits'):
+        bloodbank.allocate_stock_batches(cursor, 'O+', 100, today=date(2025, 1, 1))
+    bloodbank.expire_stock_batches(cursor, date(2025, 1, 1))
+    bloodbank.build_recall_lists(cursor, date(2025, 1, 1))
+    assert unlisted_reads(cursor) == []
+
+def test_route_queries_have_one_param_per_placeholder():
+    for name, sql, params in bloodbank.ROUTE_QUERIES:
+        assert sql.count('%s') == len(params), name
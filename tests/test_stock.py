@@ -0,0 +1,159 @@
+from datetime import date
+import random
+import threading
+
+from flask import get_flashed_messages
+
+import app as bloodbank
+from conftest import FakeCursor
+
+class AtomicStockTable:
+    """One BloodStock row whose statements apply atomically, as InnoDB's row lock makes them."""
+    def __init__(self, units):
+        self.units = units
+        self._lock = threading.Lock()
+
+    def respond(self, sql, params):
+        sql = ' '.join(sql.split())
+        with self._lock:
+            if sql.startswith('INSERT INTO BloodStock'):
+                self.units += params[1]
+                return [], 1
+            if sql.startswith('UPDATE BloodStock'):
+                if self.units + params[0] < 0:
+                    return [], 0
+                self.units += params[0]
+                return [], 1
+            if sql.startswith('SELECT AvailableUnits'):
+                return [{'AvailableUnits': self.units}], 1
+        return [], 1
+
+def test_concurrent_donations_and_deductions_never_oversell(monkeypatch):
+    monkeypatch.setattr(bloodbank, 'add_stock_batch', lambda *args, **kwargs: None)
+    monkeypatch.setattr(bloodbank, 'allocate_stock_batches', lambda *args, **kwargs: [])
+    table = AtomicStockTable(units=500)
+    outcomes = {'added': 0, 'deducted': 0, 'refused': 0}
+    outcomes_lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        with bloodbank.app.test_request_context():
+            cursor = FakeCursor(table.respond)
+            for _ in range(200):
+                units = rng.choice((100, -150))
+                ok = bloodbank.update_blood_stock('O-', units, cursor, None)
+                key = 'refused' if not ok else ('added' if units > 0 else 'deducted')
+                with outcomes_lock:
+                    outcomes[key] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert table.units >= 0
+    assert table.units == 500 + 100 * outcomes['added'] - 150 * outcomes['deducted']
+    assert outcomes['refused'] > 0  # the conditional UPDATE, not a Python-side check, refused them
+
+def test_refused_deduction_explains_shortfall(request_context):
+    table = AtomicStockTable(units=100)
+    cursor = FakeCursor(table.respond)
+    assert not bloodbank.update_blood_stock('A+', -300, cursor, None)
+    assert table.units == 100
+    assert get_flashed_messages() == ['Insufficient stock for A+. Available: 100, required: 300']
+
+def test_commit_stamps_stock_events_with_units_and_version(monkeypatch, request_context):
+    from conftest import FakeConnection, FakeMySQL
+
+    def respond(sql, params):
+        sql = ' '.join(sql.split())
+        if sql.startswith('INSERT INTO DataVersion'):
+            cursor.lastrowid = 42
+        if sql.startswith('SELECT BloodGroup, AvailableUnits FROM BloodStock'):
+            return [{'BloodGroup': 'O+', 'AvailableUnits': 1250}], 1
+        return [], 1
+
+    cursor = FakeCursor(respond)
+    monkeypatch.setattr(bloodbank, 'mysql', FakeMySQL(FakeConnection(cursor)))
+    monkeypatch.setattr(bloodbank, 'add_stock_batch', lambda *a, **k: None)
+    published = []
+    monkeypatch.setattr(bloodbank.event_broker, 'publish', published.extend)
+
+    conn, lazy_cursor = bloodbank.open_db()
+    assert bloodbank.update_blood_stock('O+', 450, lazy_cursor, conn)
+    conn.commit()
+
+    # A client that missed earlier events can still show the right level, and drop stale ones
+    [event] = published
+    assert (event['group'], event['delta'], event['units'], event['version']) == ('O+', 450, 1250, 42)
+
+def test_backfill_dates_batches_by_the_donations_they_came_from(monkeypatch):
+    donations = {
+        'O+': [{'DonationID': 9, 'DonationDate': date(2026, 5, 20), 'UnitsDonated': 450},
+               {'DonationID': 7, 'DonationDate': date(2026, 5, 1), 'UnitsDonated': 450},
+               {'DonationID': 3, 'DonationDate': date(2026, 4, 1), 'UnitsDonated': 450}],
+        'A+': [{'DonationID': 5, 'DonationDate': date(2026, 5, 10), 'UnitsDonated': 450}],
+    }
+
+    def respond(sql, params):
+        if 'COUNT(*) AS batches' in sql:
+            return [{'batches': 0}], 1
+        if 'FROM BloodStock' in sql:
+            return [{'BloodGroup': 'A+', 'AvailableUnits': 600}, {'BloodGroup': 'O+', 'AvailableUnits': 700}], 2
+        if 'FROM Donation' in sql:
+            return list(donations[params[0]]), 1
+        return [], 1
+
+    cursor = FakeCursor(respond)
+    monkeypatch.setattr(bloodbank, 'stock_inventory', bloodbank.StockInventory(ttl=300))
+    bloodbank.backfill_stock_batches(cursor)
+
+    batches = [(p[0], p[1], p[2], p[4], p[5]) for sql, p in cursor.statements if sql.startswith('INSERT INTO StockBatch')]
+    assert batches == [
+        ('A+', 5, date(2026, 5, 10), 450, 450),
+        ('A+', None, date.today(), 150, 150),        # more stock than donations: age unknown, so today
+        ('O+', 9, date(2026, 5, 20), 450, 450),
+        ('O+', 7, date(2026, 5, 1), 450, 250),       # newest first, the oldest taken partly used
+    ]
+
+def test_expiry_sweeper_runs_off_the_request_path_once_a_day(monkeypatch):
+    from conftest import FakeConnection, FakeMySQL
+
+    def respond(sql, params):
+        if 'SUM(RemainingUnits)' in sql:
+            return [{'BloodGroup': 'O+', 'Units': 450, 'Batches': 1}], 1
+        if sql.startswith(bloodbank.STOCK_ROWS_LOCK_SQL):
+            return [{'BloodGroup': 'O+', 'AvailableUnits': 900}], 1
+        return [], 1
+
+    cursor = FakeCursor(respond)
+    raw = FakeConnection(cursor)
+    monkeypatch.setattr(bloodbank, 'mysql', FakeMySQL(raw))
+    published = []
+    monkeypatch.setattr(bloodbank.event_broker, 'publish', published.extend)
+    sweeper = bloodbank.ExpirySweeper(bloodbank.app)
+
+    today = date(2026, 6, 1)
+    assert sweeper.run_once(today) == {'O+': (450, 1)}
+    assert sweeper.run_once(today) is None
+    assert raw.commits == 1 and sweeper.stats()['runs'] == 1
+    assert [(e['group'], e['days']) for e in published] == [('O+', {'2026-06-01': -450})]
+    expire = next(p for sql, p in cursor.statements if sql.startswith('UPDATE StockBatch'))
+    assert expire == [today, today]
+
+def test_expiry_never_takes_stock_below_zero(request_context, caplog):
+    def respond(sql, params):
+        if 'SUM(RemainingUnits)' in sql:
+            return [{'BloodGroup': 'O+', 'Units': 450, 'Batches': 1}, {'BloodGroup': 'A-', 'Units': 200, 'Batches': 1}], 2
+        if sql.startswith(bloodbank.STOCK_ROWS_LOCK_SQL):
+            return [{'BloodGroup': 'A-', 'AvailableUnits': 0}, {'BloodGroup': 'O+', 'AvailableUnits': 300}], 2
+        return [], 1
+
+    cursor = FakeCursor(respond)
+    bloodbank.expire_stock_batches(cursor, date(2026, 6, 1))
+
+    # Drifted counts: remove only what is there, and say so
+    decrements = [p for sql, p in cursor.statements if sql.startswith('UPDATE BloodStock')]
+    assert decrements == [[300, 'O+', 300]]
+    assert 'O+ AvailableUnits is 150mL short' in caplog.text and 'A- AvailableUnits is 200mL short' in caplog.text
@@ -0,0 +1,39 @@
+import pymysql
+import pytest
+
+import app as bloodbank
+
+class DownMySQL:
+    """`mysql` whose every connection attempt fails, as when the server is down."""
+    replicas = []
+
+    @property
+    def connection(self):
+        raise pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+
+@pytest.fixture
+def db_down(monkeypatch):
+    for key in ('AUTO_MIGRATE', 'INVENTORY_AUTO_SWEEP', 'RECALL_SCHEDULER', 'ASYNC_READS'):
+        monkeypatch.setitem(bloodbank.app.config, key, False)
+    monkeypatch.setattr(bloodbank, 'mysql', DownMySQL())
+    monkeypatch.setattr(bloodbank, 'stock_cache', bloodbank.StockCache(bloodbank.InProcessCacheBackend(), 60))
+    bloodbank.user_cache.invalidate('donor', 1)
+
+@pytest.mark.parametrize('role', [None, 'donor'])
+def test_homepage_renders_when_the_database_is_down(db_down, role):
+    client = bloodbank.app.test_client()
+    if role:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['user_role'] = role
+    response = client.get('/')
+    assert response.status_code == 200
+
+def test_views_needing_the_database_fall_back_to_the_homepage(db_down):
+    client = bloodbank.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['user_role'] = 'donor'
+    response = client.get('/donor?view=dashboard', follow_redirects=True)
+    assert response.status_code == 200 and response.request.path == '/'
+    assert response.get_data(as_text=True).count('Database connection failed') == 1